@@ -2,10 +2,15 @@
 Serializers for the alert APIs.
 """
 from rest_framework import serializers
-from core.models import Alert, Symbol
+from core.models import Alert, CoreSettings, Symbol
+from core import symbol_registry
 from decimal import Decimal
 
 
+# Longest window of percent change alerts, a day in minutes.
+MAX_WINDOW = 1440
+
+
 class SymbolFieldSerializer(serializers.Field):
     def to_representation(self, instance) -> str:
         # This function is for the direction: Instance -> Dict
@@ -40,6 +45,15 @@ class SymbolSerializer(serializers.ModelSerializer):
         ]
         read_only_fileds = ['id']
 
+    def to_representation(self, instance):
+        """Use cached last price if the view provided it."""
+        data = super().to_representation(instance)
+        prices = self.context.get('prices', {})
+        if instance.name in prices:
+            data['last_price'] = self.fields['last_price'].to_representation(
+                prices[instance.name])
+        return data
+
     def create(self, validated_data):
         """Override create method."""
         validated_data['name'] = validated_data['name'].upper()
@@ -61,6 +75,7 @@ class AlertSerializer(serializers.ModelSerializer):
             'symbol',
             'price',
             'condition',
+            'window',
             'is_active',
         ]
         read_only_fileds = ['id']
@@ -72,9 +87,35 @@ class AlertSerializer(serializers.ModelSerializer):
         if value.upper() != value:
             raise serializers.ValidationError(
                 'The symbol has to be in upper case.')
+        if not symbol_registry.is_known(value):
+            raise serializers.ValidationError(
+                'The symbol is not traded on the exchange.')
 
         return value
 
+    def validate(self, attrs):
+        """Check window and percent of percent change conditions."""
+        condition = attrs.get('condition', getattr(self.instance, 'condition', None))
+        window = attrs.get('window', getattr(self.instance, 'window', None))
+        price = attrs.get('price', getattr(self.instance, 'price', None))
+        if condition in Alert.change_conditions:
+            # Only the resident alert engine evaluates percent changes.
+            if 'condition' in attrs and not CoreSettings.objects.filter(alert_engine=True).exists():
+                raise serializers.ValidationError(
+                    {'condition': 'Percent change alerts need the alert engine, which is disabled.'})
+            if not window or window > MAX_WINDOW:
+                raise serializers.ValidationError(
+                    {'window': f'The window has to be from 1 to {MAX_WINDOW} minutes.'})
+            if price is None or price <= 0:
+                raise serializers.ValidationError(
+                    {'price': 'The percent change has to be positive.'})
+        elif attrs.get('window') is not None:
+            raise serializers.ValidationError(
+                {'window': 'The window is used only by percent change conditions.'})
+        elif 'condition' in attrs:
+            attrs['window'] = None
+        return attrs
+
     def create(self, validated_data):
         """Override create method."""
         symbol_obj, _ = Symbol.objects.get_or_create(
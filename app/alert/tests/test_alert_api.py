@@ -2,6 +2,7 @@
 Tests for recipe APIs.
 """
 from decimal import Decimal
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
 from django.test import TestCase
@@ -10,7 +11,9 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Alert, Symbol, User
+from core.models import Alert, CoreSettings, Symbol, User
+from core import price_cache, symbol_registry
+from core.tests.mixins import FakeRedisMixin
 from alert.serializers import (
     AlertSerializer,
     SymbolSerializer,
@@ -66,10 +69,11 @@ class PublicSymbolAPITests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateSymbolAPITests(TestCase):
+class PrivateSymbolAPITests(FakeRedisMixin, TestCase):
     """Tests authenticated API requests."""
 
     def setUp(self) -> None:
+        super().setUp()
         self.client = APIClient()
         self.user = create_user(email='user@example.com', password='testpas14')
         self.client.force_authenticate(self.user)
@@ -87,6 +91,16 @@ class PrivateSymbolAPITests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)  # type: ignore
 
+    def test_retrieve_symbols_cached_price(self) -> None:
+        """Test symbols are listed with cached last prices."""
+        create_symbol(name='LINKBTC', last_price=Decimal('0.0003'))
+        price_cache.set_prices({'LINKBTC': Decimal('0.00031000')})
+
+        res = self.client.get(SYMBOLS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['last_price'], '0.00031')  # type: ignore
+
     def test_create_symbol(self) -> None:
         """Test creating a symbol via API"""
         payload = {
@@ -121,10 +135,11 @@ class PublicAlertAPITests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateAlertAPITests(TestCase):
+class PrivateAlertAPITests(FakeRedisMixin, TestCase):
     """Tests authenticated API requests."""
 
     def setUp(self) -> None:
+        super().setUp()
         self.client = APIClient()
         self.user = create_user(email='user@example.com', password='testpas14')
         self.client.force_authenticate(self.user)
@@ -175,6 +190,64 @@ class PrivateAlertAPITests(TestCase):
                 self.assertEqual(getattr(alert, k), v)
         self.assertEqual(alert.user, self.user)
 
+    def test_create_alert_unknown_symbol(self) -> None:
+        """Test creating an alert for a symbol not traded on the exchange fails."""
+        self.redis.sadd(symbol_registry.REGISTRY_KEY, 'BTCUSDT')
+        payload = {
+            'symbol': 'BTCUSTD',
+            'price': Decimal('25000'),
+            'condition': 'above',
+        }
+        res = self.client.post(ALERTS_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Alert.objects.exists())
+
+    def test_create_percent_change_alert(self) -> None:
+        """Test creating a percent change alert with a window."""
+        CoreSettings.objects.create(alert_engine=True)
+        payload = {
+            'symbol': 'BTCUSDT',
+            'price': Decimal('3'),
+            'condition': 'move',
+            'window': 15,
+        }
+        res = self.client.post(ALERTS_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        alert = Alert.objects.get(id=res.data['id'])  # type: ignore
+        self.assertEqual(alert.window, 15)
+        self.assertEqual(alert.title, 'BTCUSDT move 3% in 15 min')
+
+    def test_create_percent_change_alert_engine_disabled(self) -> None:
+        """Test percent change alerts are refused while the alert engine is disabled."""
+        CoreSettings.objects.create(alert_engine=False)
+        payload = {
+            'symbol': 'BTCUSDT',
+            'price': Decimal('3'),
+            'condition': 'move',
+            'window': 15,
+        }
+        res = self.client.post(ALERTS_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('condition', res.data)
+        self.assertFalse(Alert.objects.exists())
+
+    def test_create_percent_change_alert_invalid(self) -> None:
+        """Test percent change alerts need a window and threshold ones refuse it."""
+        CoreSettings.objects.create(alert_engine=True)
+        for payload in (
+            {'symbol': 'BTCUSDT', 'price': Decimal('3'), 'condition': 'rise'},
+            {'symbol': 'BTCUSDT', 'price': Decimal('3'), 'condition': 'fall', 'window': 100000},
+            {'symbol': 'BTCUSDT', 'price': Decimal('0'), 'condition': 'fall', 'window': 15},
+            {'symbol': 'BTCUSDT', 'price': Decimal('25000'), 'condition': 'above', 'window': 15},
+        ):
+            res = self.client.post(ALERTS_URL, payload)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Alert.objects.exists())
+
     def test_partial_update(self) -> None:
         """Test partial uptade of an alert."""
         alert = create_alert(
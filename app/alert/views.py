@@ -18,6 +18,7 @@ from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
 from core.models import Alert, Symbol
+from core import price_cache
 from alert import serializers
 
 
@@ -97,5 +98,11 @@ class SymbolViewSet(viewsets.ModelViewSet):
         """Return the serializer class for request."""
         return self.serializer_class
 
+    def get_serializer_context(self):
+        """Provide cached last prices to the serializer."""
+        context = super().get_serializer_context()
+        context['prices'] = price_cache.get_prices()
+        return context
+
     def perform_create(self, serializer):
         serializer.save()
@@ -161,13 +161,36 @@ CELERY_BROKER_URL = f'redis://{REDIS_HOST}:{REDIS_PORT}/0'
 CELERY_RESULT_BACKEND = f'redis://{REDIS_HOST}:{REDIS_PORT}/0'
 BROKER_TRANSPORT_OPTIONS = {'visibility_timeout': 3600}
 
+# Latest prices and other hot data
+REDIS_CACHE_URL = f'redis://{REDIS_HOST}:{REDIS_PORT}/1'
+
 CELERY_BEAT_SCHEDULE = {
     "get_last_prices": {
         "task": "core.tasks.get_and_save_last_prices",
         "schedule": crontab(minute="*/1"),
     },
+    "poll_due_prices": {
+        "task": "core.tasks.poll_due_prices",
+        "schedule": timedelta(seconds=5),
+    },
+    "flush_last_prices": {
+        "task": "core.tasks.flush_last_prices",
+        "schedule": crontab(minute="*/1"),
+    },
+    "refresh_exchange_symbols": {
+        "task": "core.tasks.refresh_exchange_symbols",
+        "schedule": crontab(minute=30),
+    },
+    "rebuild_watched_symbols": {
+        "task": "core.tasks.rebuild_watched_symbols",
+        "schedule": crontab(minute=0),
+    },
     "send_alerts": {
         "task": "core.tasks.send_alerts",
-        "schedule": timedelta(seconds=30),
+        "schedule": timedelta(minutes=5),
+    },
+    "dispatch_notifications": {
+        "task": "core.tasks.dispatch_notifications",
+        "schedule": crontab(minute="*/1"),
     },
 }
\ No newline at end of file
@@ -11,7 +11,7 @@ class UserAdmin(BaseUserAdmin):
     list_display = ['email', 'name']
     fieldsets = (
         (None, {
-            'fields': ('email', 'password', 'telegram_id')
+            'fields': ('email', 'password', 'telegram_id', 'webhook_url', 'webhook_secret')
         }),
         (_('Personal Info'), {
             'fields': ('name', )
@@ -43,7 +43,23 @@ class UserAdmin(BaseUserAdmin):
     }), )
 
 
+@admin.action(description=_('Retry selected notifications'))
+def retry_notifications(modeladmin, request, queryset):
+    """Put notifications back to the outbox with fresh attempts."""
+    queryset.exclude(status='sent').update(
+        status='pending', attempts=0, next_attempt_at=None, claimed_at=None)
+
+
+class NotificationAdmin(admin.ModelAdmin):
+    """Outbox with failed deliveries as the dead letter list."""
+    ordering = ['-id']
+    list_display = ['user', 'channel', 'status', 'attempts', 'next_attempt_at', 'created_at']
+    list_filter = ['status', 'channel']
+    actions = [retry_notifications]
+
+
 admin.site.register(models.User, UserAdmin)
 admin.site.register(models.Alert)
 admin.site.register(models.Symbol)
-admin.site.register(models.CoreSettings)
\ No newline at end of file
+admin.site.register(models.CoreSettings)
+admin.site.register(models.Notification, NotificationAdmin)
\ No newline at end of file
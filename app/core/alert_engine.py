@@ -0,0 +1,187 @@
+"""
+Resident alert engine.
+
+Keeps an index of active alerts and last prices in memory and evaluates
+alerts on price change events instead of reloading them from the
+database on every evaluation.
+"""
+import time
+from decimal import Decimal
+from typing import Iterable
+
+import redis
+from celery.utils.log import get_task_logger
+from django.db import Error as DatabaseError, close_old_connections
+
+from core import redis_client, price_cache, alert_events
+from core.alert_index import AlertIndex
+from core.rolling_window import ChangeIndex
+from core.models import Alert, CoreSettings
+from core.tasks import send_triggered_alerts
+
+
+logger = get_task_logger(__name__)
+
+# Seconds between full reloads of alerts from the database. Reloads heal
+# events missed while the engine or Redis was down.
+RECONCILE_INTERVAL = 60.0
+
+
+def _active_alerts(alerts=None):
+    if alerts is None:
+        alerts = Alert.objects.all()
+    return alerts.filter(is_active=True).values_list(
+        'id', 'symbol__name', 'condition', 'price', 'window', 'symbol__last_price')
+
+
+class AlertEngine:
+    """Evaluate alerts from price and alert change events.
+
+    Alert changes come as ids on `alert_events.ALERTS_CHANNEL` and are
+    reloaded from the database, price changes come on
+    `price_cache.PRICES_CHANNEL`. The whole state is rebuilt every
+    reconcile_interval seconds, except the price history and the rolling
+    windows of percent change alerts. Alerts are evaluated only while
+    `CoreSettings.alert_engine` is enabled.
+    """
+
+    def __init__(self, reconcile_interval: float = RECONCILE_INTERVAL, clock=time.monotonic) -> None:
+        self.reconcile_interval = reconcile_interval
+        self.clock = clock
+        self.index = AlertIndex()
+        self.changes = ChangeIndex()
+        self.prices: dict[str, Decimal] = {}
+        self.core_settings = None
+        self.reconciled_at = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.core_settings is not None and self.core_settings.alert_engine
+
+    def _add(self, alert_id: int, symbol: str, condition: str, price: Decimal, window: int | None) -> None:
+        if condition in Alert.change_conditions:
+            self.changes.add(alert_id, symbol, condition, price, (window or 0) * 60)
+        else:
+            self.index.add(alert_id, symbol, condition, price)
+
+    def _remove(self, alert_id: int) -> None:
+        self.index.remove(alert_id)
+        self.changes.remove(alert_id)
+
+    def load(self) -> None:
+        """Rebuild the state from the database and evaluate it."""
+        alerts = list(_active_alerts())
+        self.index = AlertIndex.from_alerts(
+            alert[:4] for alert in alerts if alert[2] not in Alert.change_conditions)
+        # windows of percent change alerts hold more than the history
+        self.changes.replace(
+            (alert_id, symbol, condition, price, (window or 0) * 60)
+            for alert_id, symbol, condition, price, window, _ in alerts
+            if condition in Alert.change_conditions
+        )
+        prices = {symbol: last_price for _, symbol, _, _, _, last_price in alerts}
+        prices = price_cache.current_prices(prices)
+        self.prices = prices
+        self.core_settings = CoreSettings.objects.get()
+        self.reconciled_at = self.clock()
+        logger.info('Alert engine loaded %s alerts.', len(self.index) + len(self.changes))
+        self.evaluate(prices, price_cache.get_ranges(prices))
+
+    def apply_alerts(self, alert_ids: Iterable[int]) -> None:
+        """Reload changed alerts and evaluate them at current prices.
+
+        Symbols without a real price yet are evaluated on their first
+        price event.
+        """
+        alert_ids = set(alert_ids)
+        for alert_id in alert_ids:
+            self._remove(alert_id)
+        symbols = set()
+        new_symbols = {}
+        for alert_id, symbol, condition, price, window, last_price in _active_alerts(
+                Alert.objects.filter(id__in=alert_ids)):
+            self._add(alert_id, symbol, condition, price, window)
+            symbols.add(symbol)
+            if symbol not in self.prices:
+                new_symbols[symbol] = last_price
+        self.prices.update(price_cache.current_prices(new_symbols))
+        self.evaluate({symbol: self.prices[symbol] for symbol in symbols if symbol in self.prices})
+
+    def apply_prices(self, prices: dict[str, Decimal], ranges: dict | None = None) -> None:
+        """Remember changed prices and evaluate alerts of their symbols.
+
+        Prices and ranges are pushed to the rolling windows of percent
+        change alerts.
+        """
+        ranges = ranges or {}
+        self.prices.update(prices)
+        now = self.clock()
+        triggered = []
+        for symbol, price in prices.items():
+            triggered.extend(self.changes.update(symbol, now, [*ranges.get(symbol, ()), price]))
+        self.evaluate(prices, ranges, triggered)
+
+    def evaluate(self, prices: dict[str, Decimal], ranges: dict | None = None,
+                 triggered: list[int] | None = None) -> list[Alert]:
+        """Send alerts triggered by prices and (low, high) ranges.
+
+        Ids of already triggered percent change alerts are sent along.
+        Return claimed alerts, their notifications are queued.
+        """
+        if not self.enabled or not prices:
+            return []
+        index_triggered, flipped = self.index.evaluate(prices, ranges)
+        triggered = [*index_triggered, *(triggered or ())]
+        if not triggered and not flipped:
+            return []
+        claimed = send_triggered_alerts(triggered, flipped, self.core_settings)
+        for alert in claimed:
+            self._remove(alert.id)
+        return claimed
+
+    def handle_message(self, message: dict) -> None:
+        """Apply a published event."""
+        if message['channel'] == alert_events.ALERTS_CHANNEL:
+            self.apply_alerts(alert_events.parse(message['data']))
+        elif message['channel'] == price_cache.PRICES_CHANNEL:
+            self.apply_prices(*price_cache.parse_prices(message['data']))
+
+    def subscribe(self):
+        """Return pubsub subscribed to alert and price events."""
+        pubsub = redis_client.get_redis().pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(alert_events.ALERTS_CHANNEL, price_cache.PRICES_CHANNEL)
+        return pubsub
+
+    def step(self, pubsub, timeout: float = 1.0) -> None:
+        """Handle the next event and reconcile when it is due."""
+        message = pubsub.get_message(timeout=timeout)
+        close_old_connections()
+        if message is not None:
+            try:
+                self.handle_message(message)
+            except Exception as ex:
+                logger.error(ex)
+        if self.clock() - self.reconciled_at >= self.reconcile_interval:
+            self.load()
+
+    def run(self, min_backoff: float = 1.0, max_backoff: float = 60.0) -> None:
+        """Handle events forever, resubscribing after Redis and database errors.
+
+        The state is reloaded after every error, so a reconcile failed by a
+        database outage is retried with the backoff.
+        """
+        backoff = min_backoff
+        while True:
+            try:
+                # subscribe before loading, so no change is lost in between
+                pubsub = self.subscribe()
+                self.load()
+                backoff = min_backoff
+                while True:
+                    self.step(pubsub)
+            except (redis.RedisError, DatabaseError) as ex:
+                logger.error(ex)
+                close_old_connections()
+            logger.info('Resubscribing in %.1f sec.', backoff)
+            time.sleep(backoff)
+            backoff = min(backoff * 2, max_backoff)
@@ -0,0 +1,49 @@
+"""
+Alert change events for the resident alert engine.
+
+Changed alert ids are published to a Redis channel after the
+transaction is committed. Events carry ids only, the engine reloads
+those alerts from the database, so repeated or reordered events are
+harmless. Bulk `update()` calls do not send model signals and have to
+publish their ids explicitly.
+"""
+import json
+from typing import Iterable
+
+import redis
+from celery.utils.log import get_task_logger
+from django.db import transaction
+
+from core import redis_client
+
+
+logger = get_task_logger(__name__)
+
+ALERTS_CHANNEL = 'alerts:changed'
+
+
+def publish(alert_ids: Iterable[int]) -> None:
+    """Publish ids of changed alerts."""
+    alert_ids = sorted(set(filter(None, alert_ids)))
+    if alert_ids:
+        redis_client.get_redis().publish(ALERTS_CHANNEL, json.dumps(alert_ids))
+
+
+def publish_on_commit(alert_ids: Iterable[int]) -> None:
+    """Publish ids of changed alerts after the current transaction is committed.
+
+    Redis errors are logged, the engine reconciliation heals missed events.
+    """
+    alert_ids = set(alert_ids)
+
+    def call():
+        try:
+            publish(alert_ids)
+        except redis.RedisError as ex:
+            logger.error(ex)
+    transaction.on_commit(call)
+
+
+def parse(data: str) -> list[int]:
+    """Return alert ids of a published event."""
+    return json.loads(data)
@@ -0,0 +1,180 @@
+"""
+Per-symbol index of alert thresholds and the linear scan of stateless
+evaluations.
+"""
+from bisect import bisect_left, bisect_right, insort
+from decimal import Decimal
+from operator import itemgetter
+from typing import Iterable
+
+
+_price = itemgetter(0)
+
+
+def scan_alerts(
+    alerts: Iterable[tuple[int, str, str, Decimal]],
+    prices: dict[str, Decimal],
+    ranges: dict[str, tuple[Decimal, Decimal]] | None = None,
+) -> tuple[list[int], dict[int, str]]:
+    """Evaluate (id, symbol, condition, price) tuples one by one.
+
+    Same result as AlertIndex.evaluate() in one O(n) pass, which is
+    cheaper than building an index queried only once.
+    """
+    ranges = ranges or {}
+    triggered = []
+    flipped = {}
+    for alert_id, symbol, condition, price in alerts:
+        last_price = prices.get(symbol)
+        if last_price is None:
+            continue
+        low, high = ranges.get(symbol, (last_price, last_price))
+        match condition:
+            case 'above':
+                if max(high, last_price) > price:
+                    triggered.append(alert_id)
+            case 'below':
+                if min(low, last_price) < price:
+                    triggered.append(alert_id)
+            case 'cross':
+                if last_price > price:
+                    flipped[alert_id] = 'below'
+                elif last_price < price:
+                    flipped[alert_id] = 'above'
+    return triggered, flipped
+
+
+class AlertIndex:
+    """Sorted thresholds of active alerts per symbol.
+
+    An `above` alert fires when the last price is higher than its price
+    and a `below` alert when it is lower. So for a given last price the
+    triggered alerts of a symbol are a prefix of its sorted `above`
+    thresholds and a suffix of its sorted `below` thresholds, found by
+    binary search in O(log n + k). A `cross` alert waits for a price
+    different from its own and is flipped to the opposite side of it.
+
+    Building the index costs O(n log n), more than one linear scan of the
+    alerts, so the binary search pays off when the index stays resident
+    and sees many price updates, as in the alert engine.
+    """
+
+    def __init__(self) -> None:
+        self._above: dict[str, list[tuple[Decimal, int]]] = {}
+        self._below: dict[str, list[tuple[Decimal, int]]] = {}
+        self._cross: dict[str, dict[int, Decimal]] = {}
+        self._alerts: dict[int, tuple[str, str, Decimal]] = {}
+
+    @classmethod
+    def from_alerts(cls, alerts: Iterable[tuple[int, str, str, Decimal]]) -> 'AlertIndex':
+        """Build index from (id, symbol, condition, price) tuples with unique ids.
+
+        Thresholds are collected and sorted once per symbol instead of
+        inserted one by one.
+        """
+        index = cls()
+        above, below = {}, {}
+        for alert_id, symbol, condition, price in alerts:
+            match condition:
+                case 'above':
+                    above.setdefault(symbol, []).append((price, alert_id))
+                case 'below':
+                    below.setdefault(symbol, []).append((price, alert_id))
+                case 'cross':
+                    index._cross.setdefault(symbol, {})[alert_id] = price
+                case _:
+                    continue
+            index._alerts[alert_id] = (symbol, condition, price)
+        index._above = {symbol: sorted(thresholds, key=_price) for symbol, thresholds in above.items()}
+        index._below = {symbol: sorted(thresholds, key=_price) for symbol, thresholds in below.items()}
+        return index
+
+    def __len__(self) -> int:
+        return len(self._alerts)
+
+    def __contains__(self, alert_id: int) -> bool:
+        return alert_id in self._alerts
+
+    def symbols(self) -> set[str]:
+        """Return symbols with indexed alerts."""
+        return {symbol for symbol, _, _ in self._alerts.values()}
+
+    def add(self, alert_id: int, symbol: str, condition: str, price: Decimal) -> None:
+        """Add or replace alert."""
+        self.remove(alert_id)
+        self._alerts[alert_id] = (symbol, condition, price)
+        match condition:
+            case 'above':
+                insort(self._above.setdefault(symbol, []), (price, alert_id), key=_price)
+            case 'below':
+                insort(self._below.setdefault(symbol, []), (price, alert_id), key=_price)
+            case 'cross':
+                self._cross.setdefault(symbol, {})[alert_id] = price
+            case _:
+                del self._alerts[alert_id]
+
+    def remove(self, alert_id: int) -> None:
+        """Remove alert if it is indexed."""
+        if alert_id not in self._alerts:
+            return
+        symbol, condition, price = self._alerts.pop(alert_id)
+        match condition:
+            case 'above' | 'below':
+                thresholds = (self._above if condition == 'above' else self._below)[symbol]
+                i = bisect_left(thresholds, price, key=_price)
+                while thresholds[i][1] != alert_id:
+                    i += 1
+                del thresholds[i]
+            case 'cross':
+                del self._cross[symbol][alert_id]
+
+    def update(
+        self,
+        symbol: str,
+        last_price: Decimal,
+        low: Decimal | None = None,
+        high: Decimal | None = None,
+    ) -> tuple[list[int], dict[int, str]]:
+        """Apply last price of symbol.
+
+        Low and high prices since the previous update, when known, make
+        `above` alerts fire on the high and `below` ones on the low, so a
+        spike between two updates is not missed.
+
+        Return ids of triggered alerts and new conditions of flipped
+        `cross` alerts. Flipped alerts are moved to their new side,
+        triggered ones stay indexed until they are removed.
+        """
+        high = last_price if high is None else max(high, last_price)
+        low = last_price if low is None else min(low, last_price)
+        triggered = []
+        above = self._above.get(symbol, [])
+        triggered.extend(alert_id for _, alert_id in above[:bisect_left(above, high, key=_price)])
+        below = self._below.get(symbol, [])
+        triggered.extend(alert_id for _, alert_id in below[bisect_right(below, low, key=_price):])
+
+        flipped = {}
+        for alert_id, price in list(self._cross.get(symbol, {}).items()):
+            if last_price > price:
+                flipped[alert_id] = 'below'
+            elif last_price < price:
+                flipped[alert_id] = 'above'
+            else:
+                continue
+            self.add(alert_id, symbol, flipped[alert_id], price)
+        return triggered, flipped
+
+    def evaluate(
+        self,
+        prices: dict[str, Decimal],
+        ranges: dict[str, tuple[Decimal, Decimal]] | None = None,
+    ) -> tuple[list[int], dict[int, str]]:
+        """Apply last prices and (low, high) ranges of symbols, see update()."""
+        ranges = ranges or {}
+        triggered = []
+        flipped = {}
+        for symbol, last_price in prices.items():
+            symbol_triggered, symbol_flipped = self.update(symbol, last_price, *ranges.get(symbol, ()))
+            triggered.extend(symbol_triggered)
+            flipped.update(symbol_flipped)
+        return triggered, flipped
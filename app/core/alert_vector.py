@@ -0,0 +1,133 @@
+"""
+Vectorized evaluation of alerts with NumPy.
+"""
+from decimal import Decimal, ROUND_CEILING, ROUND_FLOOR
+from itertools import repeat
+from typing import Iterable, Sequence
+
+import numpy as np
+from django.db.models import BigIntegerField, F
+from django.db.models.functions import Cast, Round
+
+
+# Alert.price has 8 decimal places, so scaled by 10 ** 8 it is an exact
+# integer and fits into int64 (max_digits=15).
+DECIMAL_PLACES = 8
+ABOVE, BELOW, CROSS = 0, 1, 2
+CONDITION_CODES = {'above': ABOVE, 'below': BELOW, 'cross': CROSS}
+
+
+def to_scaled(price: Decimal, rounding: str = ROUND_FLOOR) -> int:
+    """Return price in units of 10 ** -8, rounded if it is more precise."""
+    return int(price.scaleb(DECIMAL_PLACES).to_integral_value(rounding))
+
+
+def scaled_expression(field: str):
+    """Return database expression of a decimal field in units of 10 ** -8."""
+    return Cast(Round(F(field) * 10 ** DECIMAL_PLACES), BigIntegerField())
+
+
+class VectorAlertBook:
+    """Active alerts in columnar arrays.
+
+    Every alert is a row of symbol index, scaled integer price and
+    condition code, so all alerts are evaluated against a price vector
+    in one pass. Semantics are the same as AlertIndex: `above` fires when
+    last price (or the high of its range) > price, `below` when last
+    price (or the low of its range) < price, and `cross` is flipped to
+    the opposite side of a differing last price.
+    """
+
+    def __init__(self, ids: np.ndarray, symbols: list[str], symbol_idx: np.ndarray,
+                 prices: np.ndarray, conditions: np.ndarray) -> None:
+        self.ids = ids
+        self.symbols = symbols
+        self.symbol_pos = {symbol: i for i, symbol in enumerate(symbols)}
+        self.symbol_idx = symbol_idx
+        self.prices = prices
+        self.conditions = conditions
+
+    @classmethod
+    def from_alerts(cls, alerts: Iterable[tuple[int, str, str, Decimal]]) -> 'VectorAlertBook':
+        """Build book from (id, symbol, condition, price) tuples."""
+        symbol_pos = {}
+        ids, symbol_idx, prices, conditions = [], [], [], []
+        for alert_id, symbol, condition, price in alerts:
+            if condition not in CONDITION_CODES:
+                continue
+            ids.append(alert_id)
+            symbol_idx.append(symbol_pos.setdefault(symbol, len(symbol_pos)))
+            prices.append(to_scaled(price))
+            conditions.append(CONDITION_CODES[condition])
+        return cls(
+            np.array(ids, dtype=np.int64),
+            list(symbol_pos),
+            np.array(symbol_idx, dtype=np.int32),
+            np.array(prices, dtype=np.int64),
+            np.array(conditions, dtype=np.int8),
+        )
+
+    @classmethod
+    def from_columns(cls, ids: Sequence[int], symbols: Sequence[str], conditions: Sequence[str],
+                     prices: Sequence[int]) -> 'VectorAlertBook':
+        """Build book from columns of alerts with prices already scaled.
+
+        Prices scaled by the database (see scaled_expression()) go into
+        the arrays without converting a Decimal per alert.
+        """
+        symbol_pos = {symbol: i for i, symbol in enumerate(dict.fromkeys(symbols))}
+        symbol_idx = np.fromiter(map(symbol_pos.__getitem__, symbols), dtype=np.int32, count=len(symbols))
+        codes = np.fromiter(map(CONDITION_CODES.get, conditions, repeat(-1)), dtype=np.int8, count=len(conditions))
+        known = codes >= 0
+        return cls(
+            np.fromiter(ids, dtype=np.int64, count=len(ids))[known],
+            list(symbol_pos),
+            symbol_idx[known],
+            np.fromiter(prices, dtype=np.int64, count=len(prices))[known],
+            codes[known],
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _scaled(self, prices: dict[str, Decimal], rounding: str) -> tuple[np.ndarray, np.ndarray]:
+        """Return scaled prices per alert and a mask of alerts with a price."""
+        scaled = np.zeros(len(self.symbols), dtype=np.int64)
+        known = np.zeros(len(self.symbols), dtype=bool)
+        for symbol, price in prices.items():
+            i = self.symbol_pos.get(symbol)
+            if i is not None:
+                scaled[i] = to_scaled(price, rounding)
+                known[i] = True
+        return scaled[self.symbol_idx], known[self.symbol_idx]
+
+    def evaluate(
+        self,
+        prices: dict[str, Decimal],
+        ranges: dict[str, tuple[Decimal, Decimal]] | None = None,
+    ) -> tuple[list[int], dict[int, str]]:
+        """Return ids of triggered alerts and new conditions of flipped ones."""
+        # For an integer threshold t: p > t <=> ceil(p) > t and
+        # p < t <=> floor(p) < t, so comparisons stay exact for last
+        # prices with more than 8 decimal places.
+        ranges = ranges or {}
+        floor, has_price = self._scaled(prices, ROUND_FLOOR)
+        ceil, _ = self._scaled(prices, ROUND_CEILING)
+        lows = {symbol: min(ranges[symbol][0], price) for symbol, price in prices.items() if symbol in ranges}
+        highs = {symbol: max(ranges[symbol][1], price) for symbol, price in prices.items() if symbol in ranges}
+        low, has_range = self._scaled(lows, ROUND_FLOOR)
+        high, _ = self._scaled(highs, ROUND_CEILING)
+        low = np.where(has_range, low, floor)
+        high = np.where(has_range, high, ceil)
+
+        higher = has_price & (ceil > self.prices)
+        lower = has_price & (floor < self.prices)
+        triggered = (
+            ((self.conditions == ABOVE) & has_price & (high > self.prices))
+            | ((self.conditions == BELOW) & has_price & (low < self.prices))
+        )
+        cross = self.conditions == CROSS
+
+        flipped = {int(alert_id): 'below' for alert_id in self.ids[cross & higher]}
+        flipped.update({int(alert_id): 'above' for alert_id in self.ids[cross & lower]})
+        return self.ids[triggered].tolist(), flipped
@@ -1,15 +1,416 @@
+import asyncio
+import json
+import math
+import os
+import time
 from decimal import Decimal
+from functools import partial
+from typing import Any, Awaitable, Callable
+
+import aiohttp
+import redis
 from celery.utils.log import get_task_logger
 
+from core import redis_client
+from core.event_loop import run
+
 
 logger = get_task_logger(__name__)
 
+BASE_URL = 'https://api.binance.com'
+# Max symbols in one ticker request. Keeps the query string well under
+# the exchange URL limit and a bad chunk cheap to retry symbol by symbol.
+BATCH_SIZE = 100
+REQUEST_TIMEOUT = 10
+MAX_CONNECTIONS = 10
+MAX_IN_FLIGHT = 10
+# Request weight per minute allowed by the exchange for one IP and the
+# share of it ingestion may use. The rest is left for other processes.
+WEIGHT_LIMIT = 6000
+WEIGHT_BUDGET = 0.8
+WEIGHT_HEADER = 'X-MBX-USED-WEIGHT-1M'
+# Shared used weight of a minute and the end of a pause.
+WEIGHT_KEY = 'exchange:weight:{minute}'
+PAUSE_KEY = 'exchange:paused_until'
+TICKER_PRICE_WEIGHT = 2
+TICKER_PRICE_BATCH_WEIGHT = 4
+EXCHANGE_INFO_WEIGHT = 20
+# Rolling window ticker costs 4 per symbol, capped at 200 per request.
+TICKER_WINDOW_WEIGHT = 4
+TICKER_WINDOW_MAX_WEIGHT = 200
+# Window of the low and high prices fetched with the last price. It
+# matches the interval of get_and_save_last_prices, see range_window()
+# for symbols polled less often.
+RANGE_WINDOW = '1m'
+# Longest window in minutes, an hour is the next window size unit.
+MAX_RANGE_MINUTES = 59
+# Error code of requests for a symbol unknown to the exchange.
+INVALID_SYMBOL = -1121
+
+
+def range_window(seconds: float) -> str:
+    """Return the shortest window size covering seconds since the last poll."""
+    minutes = min(max(math.ceil(seconds / 60), 1), MAX_RANGE_MINUTES)
+    return f'{minutes}m'
+
+
+class BinanceAPIError(Exception):
+    """Error response of the exchange API."""
+
+    def __init__(self, status: int, code: int | None = None, message: str = '') -> None:
+        super().__init__(f'{status} {code}: {message}')
+        self.status = status
+        self.code = code
+        self.message = message
+
+
+class RateLimitError(BinanceAPIError):
+    """Request weight budget is exhausted or the exchange asked to back off."""
+
+    def __init__(self, retry_after: float, status: int = 429) -> None:
+        super().__init__(status, message=f'Retry after {retry_after:.0f} sec.')
+        self.retry_after = retry_after
+
+
+class RequestWeightTracker:
+    """Track request weight used in the current minute.
+
+    Weight of every request is reserved before it is sent and the used
+    weight reported by the exchange in response headers (it includes
+    requests of other processes from the same IP) replaces the estimate
+    when it is higher. Requests wait for the next minute if the budget
+    is spent. After a 429 or 418 response all requests are refused until
+    the Retry-After time passes.
+
+    The used weight and the pause are kept in Redis, so every worker and
+    the price stream share them. Without Redis the tracker counts on its
+    own.
+    """
+
+    def __init__(self, limit: int = WEIGHT_LIMIT, budget: float = WEIGHT_BUDGET, clock=time.time) -> None:
+        self.limit = limit
+        self.budget = int(limit * budget)
+        self.clock = clock
+        self.used = 0
+        self.paused_until = 0.0
+        self._minute = int(clock() // 60)
+
+    def _roll(self, now: float) -> None:
+        minute = int(now // 60)
+        if minute != self._minute:
+            self._minute = minute
+            self.used = 0
+
+    def _weight_key(self) -> str:
+        return WEIGHT_KEY.format(minute=self._minute)
+
+    def _add_shared(self, weight: int) -> int | None:
+        """Add weight to the shared counter of the minute and return it."""
+        try:
+            pipe = redis_client.get_redis().pipeline()
+            pipe.incrby(self._weight_key(), weight)
+            pipe.expire(self._weight_key(), 120)
+            return pipe.execute()[0]
+        except redis.RedisError as ex:
+            logger.error(ex)
+            return None
 
-def get_last_price(client, symbol: str) -> Decimal:
-    """Get last price for symbol"""
+    def _sync(self) -> None:
+        """Take the shared used weight and pause."""
+        try:
+            pipe = redis_client.get_redis().pipeline()
+            pipe.get(self._weight_key())
+            pipe.get(PAUSE_KEY)
+            used, paused_until = pipe.execute()
+        except redis.RedisError as ex:
+            logger.error(ex)
+            return
+        self.used = max(self.used, int(used or 0))
+        self.paused_until = max(self.paused_until, float(paused_until or 0))
+
+    async def acquire(self, weight: int) -> None:
+        """Reserve weight, waiting for the next minute if it does not fit."""
+        while True:
+            now = self.clock()
+            self._roll(now)
+            self._sync()
+            if now < self.paused_until:
+                raise RateLimitError(self.paused_until - now)
+            if self.used + weight <= self.budget:
+                used = self._add_shared(weight)
+                if used is None:
+                    self.used += weight
+                    return
+                if used <= self.budget:
+                    self.used = used
+                    return
+                # another process took the rest of the budget
+                self._add_shared(-weight)
+            await asyncio.sleep(60 - now % 60)
+
+    def update(self, headers) -> None:
+        """Take used weight from response headers."""
+        value = headers.get(WEIGHT_HEADER)
+        if value is None:
+            return
+        self._roll(self.clock())
+        value = int(value)
+        if value > self.used:
+            # raises the shared counter to the reported weight unless
+            # another process did it meanwhile, then it overshoots a bit
+            self._add_shared(value - self.used)
+            self.used = value
+
+    def pause(self, seconds: float) -> None:
+        """Refuse requests for seconds."""
+        self.paused_until = max(self.paused_until, self.clock() + seconds)
+        try:
+            client = redis_client.get_redis()
+            if self.paused_until > float(client.get(PAUSE_KEY) or 0):
+                client.set(PAUSE_KEY, self.paused_until, ex=math.ceil(seconds) + 1)
+        except redis.RedisError as ex:
+            logger.error(ex)
+        logger.warning('Exchange requests are paused for %.0f sec.', seconds)
+
+    def usage(self) -> dict:
+        """Return current usage of the request weight."""
+        self._roll(self.clock())
+        self._sync()
+        return {
+            'used': self.used,
+            'budget': self.budget,
+            'limit': self.limit,
+            'paused_for': max(0.0, self.paused_until - self.clock()),
+        }
+
+
+class AsyncSpot:
+    """Asyncio client for the exchange spot API.
+
+    Keeps a persistent connection pool, applies a timeout to every request
+    and limits the number of requests in flight and their weight per
+    minute. The client has to be used from a single event loop.
+    """
+
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        timeout: float = REQUEST_TIMEOUT,
+        max_connections: int = MAX_CONNECTIONS,
+        max_in_flight: int = MAX_IN_FLIGHT,
+    ) -> None:
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_in_flight = max_in_flight
+        self.weights = RequestWeightTracker()
+        self._session: aiohttp.ClientSession | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self._session
+
+    async def request(self, path: str, params: dict | None = None, weight: int = 1) -> Any:
+        """Make GET request and return decoded response."""
+        session = self._get_session()
+        async with self._semaphore:
+            await self.weights.acquire(weight)
+            async with session.get(self.base_url + path, params=params) as response:
+                self.weights.update(response.headers)
+                if response.status in (418, 429):
+                    retry_after = float(response.headers.get('Retry-After', 60))
+                    self.weights.pause(retry_after)
+                    raise RateLimitError(retry_after, response.status)
+                data = await response.json(content_type=None)
+                if response.status >= 400:
+                    data = data if isinstance(data, dict) else {}
+                    raise BinanceAPIError(response.status, data.get('code'), data.get('msg', ''))
+                return data
+
+    async def ticker_price(self, symbol: str | None = None, symbols: list[str] | None = None) -> Any:
+        """Latest price for a symbol or symbols."""
+        params = {}
+        weight = TICKER_PRICE_BATCH_WEIGHT
+        if symbol is not None:
+            params['symbol'] = symbol
+            weight = TICKER_PRICE_WEIGHT
+        if symbols is not None:
+            params['symbols'] = json.dumps(symbols, separators=(',', ':'))
+        return await self.request('/api/v3/ticker/price', params, weight)
+
+    async def ticker(self, symbol: str | None = None, symbols: list[str] | None = None,
+                     window_size: str = RANGE_WINDOW) -> Any:
+        """Rolling window price change statistics for a symbol or symbols."""
+        params = {'windowSize': window_size, 'type': 'MINI'}
+        weight = TICKER_WINDOW_WEIGHT
+        if symbol is not None:
+            params['symbol'] = symbol
+        if symbols is not None:
+            params['symbols'] = json.dumps(symbols, separators=(',', ':'))
+            weight = min(TICKER_WINDOW_WEIGHT * len(symbols), TICKER_WINDOW_MAX_WEIGHT)
+        return await self.request('/api/v3/ticker', params, weight)
+
+    async def exchange_info(self) -> Any:
+        """Trading rules and symbols of the exchange."""
+        return await self.request('/api/v3/exchangeInfo', weight=EXCHANGE_INFO_WEIGHT)
+
+    async def close(self) -> None:
+        """Close the connection pool."""
+        if self._session is not None:
+            await self._session.close()
+
+
+async def _get_symbol(fetch_symbol: Callable[[str], Awaitable], symbol: str, invalid: set[str] | None) -> Any:
+    """Return await fetch_symbol(symbol) or None if it fails.
+
+    Symbols unknown to the exchange are added to invalid.
+    """
     try:
-        response = client.ticker_price(symbol)
-        return Decimal(response.get('price', '0'))
+        return await fetch_symbol(symbol)
+    except RateLimitError:
+        raise
+    except BinanceAPIError as ex:
+        logger.error(ex)
+        if ex.code == INVALID_SYMBOL and invalid is not None:
+            invalid.add(symbol)
     except Exception as ex:
         logger.error(ex)
-        return Decimal('0')
+    return None
+
+
+async def _get_batched(
+    fetch_chunk: Callable[[list[str]], Awaitable[dict]],
+    fetch_symbol: Callable[[str], Awaitable],
+    symbols: list[str],
+    invalid: set[str] | None,
+) -> dict:
+    """Fetch values of symbols with concurrent chunked batch requests.
+
+    If a batch request fails (e.g. one of the symbols is invalid), that
+    chunk is fetched symbol by symbol. Symbols without a value are left
+    out and the ones unknown to the exchange are added to invalid.
+    RateLimitError is raised if requests have to be paused.
+    """
+    async def get_chunk(chunk: list[str]) -> dict:
+        try:
+            return await fetch_chunk(chunk)
+        except RateLimitError:
+            raise
+        except Exception as ex:
+            logger.error(ex)
+            values = await asyncio.gather(*(_get_symbol(fetch_symbol, symbol, invalid) for symbol in chunk))
+            return {symbol: value for symbol, value in zip(chunk, values) if value is not None}
+
+    chunks = [symbols[i:i + BATCH_SIZE] for i in range(0, len(symbols), BATCH_SIZE)]
+    values = {}
+    for chunk_values in await asyncio.gather(*(get_chunk(chunk) for chunk in chunks)):
+        values.update(chunk_values)
+    return values
+
+
+def _price_range(item: dict) -> tuple[Decimal, Decimal, Decimal]:
+    return Decimal(item['lastPrice']), Decimal(item['lowPrice']), Decimal(item['highPrice'])
+
+
+async def _fetch_last_price(client, symbol: str) -> Decimal:
+    return Decimal((await client.ticker_price(symbol))['price'])
+
+
+async def _fetch_price_range(client, symbol: str, window_size: str = RANGE_WINDOW) -> tuple[Decimal, Decimal, Decimal]:
+    return _price_range(await client.ticker(symbol, window_size=window_size))
+
+
+async def get_last_price(client, symbol: str, invalid: set[str] | None = None) -> Decimal | None:
+    """Get last price for symbol.
+
+    Return None if the price is not available. Symbols unknown to the
+    exchange are added to invalid.
+    """
+    return await _get_symbol(partial(_fetch_last_price, client), symbol, invalid)
+
+
+async def get_last_prices(client, symbols: list[str], invalid: set[str] | None = None) -> dict[str, Decimal]:
+    """Get last prices for symbols, see _get_batched()."""
+    async def fetch_chunk(chunk: list[str]) -> dict[str, Decimal]:
+        return {item['symbol']: Decimal(item['price']) for item in await client.ticker_price(symbols=chunk)}
+
+    return await _get_batched(fetch_chunk, partial(_fetch_last_price, client), symbols, invalid)
+
+
+async def get_price_range(
+    client,
+    symbol: str,
+    invalid: set[str] | None = None,
+    window_size: str = RANGE_WINDOW,
+) -> tuple | None:
+    """Get last, low and high price of the range window for symbol.
+
+    Return None if the prices are not available. Symbols unknown to the
+    exchange are added to invalid.
+    """
+    return await _get_symbol(partial(_fetch_price_range, client, window_size=window_size), symbol, invalid)
+
+
+async def get_price_ranges(
+    client,
+    symbols: list[str],
+    invalid: set[str] | None = None,
+    window_size: str = RANGE_WINDOW,
+) -> dict[str, tuple[Decimal, Decimal, Decimal]]:
+    """Get (last, low, high) prices of the range window for symbols, see _get_batched()."""
+    async def fetch_chunk(chunk: list[str]) -> dict[str, tuple]:
+        return {
+            item['symbol']: _price_range(item)
+            for item in await client.ticker(symbols=chunk, window_size=window_size)
+        }
+
+    return await _get_batched(
+        fetch_chunk, partial(_fetch_price_range, client, window_size=window_size), symbols, invalid)
+
+
+async def get_trading_symbols(client) -> set[str]:
+    """Get names of symbols trading on the exchange."""
+    response = await client.exchange_info()
+    return {item['symbol'] for item in response['symbols'] if item['status'] == 'TRADING'}
+
+
+_client: AsyncSpot | None = None
+_pid: int | None = None
+
+
+def get_client() -> AsyncSpot:
+    """Return the client of this process.
+
+    It is used on the event loop of this process and lives as long as the
+    worker process. A forked child gets its own client.
+    """
+    global _client, _pid
+    if _pid != os.getpid():
+        _client = AsyncSpot()
+        _pid = os.getpid()
+    return _client
+
+
+def fetch_last_prices(symbols: list[str], invalid: set[str] | None = None) -> dict[str, Decimal]:
+    """Get last prices for symbols with the client of this process."""
+    return run(get_last_prices(get_client(), symbols, invalid))
+
+
+def fetch_price_ranges(
+    symbols: list[str],
+    invalid: set[str] | None = None,
+    window_size: str = RANGE_WINDOW,
+) -> dict[str, tuple]:
+    """Get (last, low, high) prices for symbols with the client of this process."""
+    return run(get_price_ranges(get_client(), symbols, invalid, window_size))
+
+
+def fetch_trading_symbols() -> set[str]:
+    """Get names of trading symbols with the client of this process."""
+    return run(get_trading_symbols(get_client()))
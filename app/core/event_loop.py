@@ -0,0 +1,28 @@
+"""
+Event loop of the worker process.
+"""
+import asyncio
+import os
+
+
+_loop: asyncio.AbstractEventLoop | None = None
+_pid: int | None = None
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Return the event loop of this process.
+
+    It lives as long as the worker process, so async clients created on
+    it reuse their connections between task runs. A forked child gets
+    its own loop.
+    """
+    global _loop, _pid
+    if _pid != os.getpid():
+        _loop = asyncio.new_event_loop()
+        _pid = os.getpid()
+    return _loop
+
+
+def run(coro):
+    """Run coroutine on the event loop of this process."""
+    return get_loop().run_until_complete(coro)
@@ -0,0 +1,21 @@
+"""Django command to run the resident alert engine"""
+from django.core.management.base import BaseCommand
+
+from core.alert_engine import AlertEngine, RECONCILE_INTERVAL
+
+
+class Command(BaseCommand):
+    """Django command to run the resident alert engine"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reconcile-interval',
+            type=float,
+            default=RECONCILE_INTERVAL,
+            help='Seconds between full reloads of alerts from the database.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        self.stdout.write('Running alert engine...')
+        AlertEngine(reconcile_interval=options['reconcile_interval']).run()
@@ -0,0 +1,36 @@
+"""Django command to stream last prices from the exchange"""
+import asyncio
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.models import CoreSettings
+from core.price_stream import PriceStream
+from core import price_cache, watched_symbols, symbol_registry
+from core.tasks import dispatch_evaluation
+
+
+class Command(BaseCommand):
+    """Django command to stream last prices from the exchange"""
+
+    def get_symbols(self) -> list[str]:
+        """Return names of known symbols with active alerts."""
+        close_old_connections()
+        return symbol_registry.filter_known(watched_symbols.get_watched())
+
+    def save_prices(self, prices) -> None:
+        """Save last prices and evaluate alerts of changed ones."""
+        close_old_connections()
+        if CoreSettings.objects.get().update_last_prices:
+            changed = price_cache.save_prices(prices)
+            if changed:
+                dispatch_evaluation(changed)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        self.stdout.write('Streaming last prices...')
+        stream = PriceStream(
+            get_symbols=self.get_symbols,
+            save_prices=self.save_prices,
+        )
+        asyncio.run(stream.run())
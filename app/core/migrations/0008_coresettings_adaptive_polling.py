@@ -0,0 +1,18 @@
+# Generated by Django 4.1.6 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_alter_symbol_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coresettings',
+            name='adaptive_polling',
+            field=models.BooleanField(default=False, verbose_name='Poll symbols near alert prices more often'),
+        ),
+    ]
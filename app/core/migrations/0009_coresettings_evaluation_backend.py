@@ -0,0 +1,18 @@
+# Generated by Django 4.1.6 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_coresettings_adaptive_polling'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coresettings',
+            name='evaluation_backend',
+            field=models.CharField(choices=[('index', 'Sorted thresholds index'), ('numpy', 'NumPy vectors')], default='index', max_length=5, verbose_name='Alert evaluation backend'),
+        ),
+    ]
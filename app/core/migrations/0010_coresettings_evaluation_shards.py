@@ -0,0 +1,18 @@
+# Generated by Django 4.1.6 on 2026-10-18 12:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_coresettings_evaluation_backend'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coresettings',
+            name='evaluation_shards',
+            field=models.PositiveSmallIntegerField(default=1, verbose_name='Alert evaluation shards'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.6 on 2026-10-18 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_coresettings_evaluation_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coresettings',
+            name='alert_engine',
+            field=models.BooleanField(default=False, verbose_name='Evaluate alerts in the resident alert engine'),
+        ),
+    ]
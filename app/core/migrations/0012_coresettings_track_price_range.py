@@ -0,0 +1,18 @@
+# Generated by Django 4.1.6 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_coresettings_alert_engine'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coresettings',
+            name='track_price_range',
+            field=models.BooleanField(default=False, verbose_name='Trigger alerts on low and high prices between polls'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.1.6 on 2026-10-18 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_coresettings_track_price_range'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='window',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Window, minutes'),
+        ),
+        migrations.AlterField(
+            model_name='alert',
+            name='condition',
+            field=models.CharField(choices=[('above', 'above'), ('below', 'below'), ('cross', 'cross'), ('rise', 'rise'), ('fall', 'fall'), ('move', 'move')], max_length=5),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.6 on 2026-10-18 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_notification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coresettings',
+            name='digest_window',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Group notifications of a user into digests, seconds'),
+        ),
+    ]
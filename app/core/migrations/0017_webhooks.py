@@ -0,0 +1,33 @@
+# Generated by Django 4.1.6 on 2026-10-18 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_notification_retries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='webhook_url',
+            field=models.URLField(blank=True, default='', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='webhook_secret',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='coresettings',
+            name='send_alert_via_webhook',
+            field=models.BooleanField(default=True, verbose_name='Send alerts via webhooks'),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='channel',
+            field=models.CharField(choices=[('telegram', 'Telegram'), ('email', 'E-mail'), ('webhook', 'Webhook')], max_length=8),
+        ),
+    ]
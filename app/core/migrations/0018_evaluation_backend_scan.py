@@ -0,0 +1,26 @@
+# Generated by Django 4.1.6 on 2026-10-18 21:10
+
+from django.db import migrations, models
+
+
+def rename_backend(old, new):
+    def rename(apps, schema_editor):
+        CoreSettings = apps.get_model('core', 'CoreSettings')
+        CoreSettings.objects.filter(evaluation_backend=old).update(evaluation_backend=new)
+    return rename
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_webhooks'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='coresettings',
+            name='evaluation_backend',
+            field=models.CharField(choices=[('scan', 'Linear scan'), ('numpy', 'NumPy vectors')], default='scan', max_length=5, verbose_name='Alert evaluation backend'),
+        ),
+        migrations.RunPython(rename_backend('index', 'scan'), rename_backend('scan', 'index')),
+    ]
@@ -6,7 +6,7 @@ import os
 
 from django.conf import settings
 
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -44,6 +44,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     email = models.EmailField(max_length=255, unique=True)
     name = models.CharField(max_length=255)
     telegram_id = models.CharField(max_length=12, default='')
+    webhook_url = models.URLField(max_length=500, blank=True, default='')
+    webhook_secret = models.CharField(max_length=64, blank=True, default='')
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
 
@@ -52,11 +54,35 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
 
 
+class SymbolManager(models.Manager):
+    """Manager for symbols."""
+
+    def update_last_prices(self, prices: dict[str, Decimal]) -> list[str]:
+        """Save changed last prices with one bulk update.
+
+        Return names of symbols whose price was changed.
+        """
+        symbols = self.filter(name__in=prices.keys()).only('id', 'name', 'last_price')
+        changed = []
+        for symbol in symbols:
+            price = prices[symbol.name]
+            if price != symbol.last_price:
+                symbol.last_price = price
+                changed.append(symbol)
+        if changed:
+            with transaction.atomic():
+                self.bulk_update(changed, ['last_price'])
+
+        return [symbol.name for symbol in changed]
+
+
 class Symbol(models.Model):
     """Symbol object"""
     name = models.CharField(max_length=15, unique=True)
     last_price = models.DecimalField(max_digits=15, decimal_places=8, default=Decimal('0'))
 
+    objects = SymbolManager()
+
     def __str__(self) -> str:
         return self.name
 
@@ -66,8 +92,14 @@ class Alert(models.Model):
     conditions = (
         ('above', 'above'),
         ('below', 'below'),
-        ('cross', 'cross')
+        ('cross', 'cross'),
+        ('rise', 'rise'),
+        ('fall', 'fall'),
+        ('move', 'move'),
     )
+    # Percent change conditions. For them price is the change in percent
+    # and window is the period in minutes it has to happen within.
+    change_conditions = ('rise', 'fall', 'move')
 
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -77,16 +109,92 @@ class Alert(models.Model):
     price = models.DecimalField(max_digits=15, decimal_places=8)
     is_active = models.BooleanField(default=True)
     condition = models.CharField(max_length=5, choices=conditions)
+    window = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name='Window, minutes')
 
     @property
     def title(self) -> str:
+        if self.condition in self.change_conditions:
+            return f'{self.symbol} {self.condition} {"{:f}".format(self.price.normalize())}% in {self.window} min'
         return f'{self.symbol} {self.condition} {"{:f}".format(self.price.normalize())}'
     
     def __str__(self) -> str:
         return self.title
 
+
+class Notification(models.Model):
+    """Outbox of alert notifications.
+
+    Rows are written in the transaction that deactivates triggered
+    alerts and delivered by dispatcher tasks. Failed deliveries are
+    retried with backoff and end up `failed`, the dead letters.
+    """
+    channels = (
+        ('telegram', 'Telegram'),
+        ('email', 'E-mail'),
+        ('webhook', 'Webhook'),
+    )
+    statuses = (
+        ('pending', 'pending'),
+        ('sending', 'sending'),
+        ('sent', 'sent'),
+        ('failed', 'failed (dead letter)'),
+    )
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+    alert = models.ForeignKey(Alert, on_delete=models.SET_NULL, null=True, blank=True)
+    channel = models.CharField(max_length=8, choices=channels)
+    message = models.TextField()
+    status = models.CharField(max_length=7, choices=statuses, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['channel', 'status'])]
+
+    def __str__(self) -> str:
+        return f'{self.channel} to {self.user}: {self.message}'
+
+
 class CoreSettings(models.Model):
     """Core settings model"""
+    evaluation_backends = (
+        ('scan', 'Linear scan'),
+        ('numpy', 'NumPy vectors'),
+    )
+
     update_last_prices = models.BooleanField(default=True, verbose_name='Update last price') 
     send_alert_via_telegram = models.BooleanField(default=True, verbose_name=' Send alerts via Telegram')
-    send_alert_via_email = models.BooleanField(default=True, verbose_name='Send alerts via E-mail')
\ No newline at end of file
+    send_alert_via_email = models.BooleanField(default=True, verbose_name='Send alerts via E-mail')
+    send_alert_via_webhook = models.BooleanField(default=True, verbose_name='Send alerts via webhooks')
+    adaptive_polling = models.BooleanField(
+        default=False,
+        verbose_name='Poll symbols near alert prices more often',
+    )
+    evaluation_backend = models.CharField(
+        max_length=5,
+        choices=evaluation_backends,
+        default='scan',
+        verbose_name='Alert evaluation backend',
+    )
+    evaluation_shards = models.PositiveSmallIntegerField(
+        default=1,
+        verbose_name='Alert evaluation shards',
+    )
+    alert_engine = models.BooleanField(
+        default=False,
+        verbose_name='Evaluate alerts in the resident alert engine',
+    )
+    track_price_range = models.BooleanField(
+        default=False,
+        verbose_name='Trigger alerts on low and high prices between polls',
+    )
+    digest_window = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Group notifications of a user into digests, seconds',
+    )
\ No newline at end of file
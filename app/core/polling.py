@@ -0,0 +1,155 @@
+"""
+Proximity-aware polling schedule.
+
+Each symbol is polled again after the time its price needs to plausibly
+reach the nearest active alert threshold. The price is treated as a
+random walk, so a move of relative distance d takes about
+(d / (K * sigma)) ** 2 seconds, where sigma is the recent volatility per
+square root of a second.
+"""
+import math
+import time
+from decimal import Decimal
+from typing import Iterable
+
+import redis
+from celery.utils.log import get_task_logger
+from django.db import transaction
+
+from core import redis_client
+from core.models import Alert, Symbol
+
+
+logger = get_task_logger(__name__)
+
+
+DUE_KEY = 'polling:due'
+STATE_KEY = 'polling:state'
+MIN_INTERVAL = 5
+MAX_INTERVAL = 300
+# Number of standard deviations a price should not be able to move
+# between two polls.
+K = 4
+# Weight of the latest observation in the volatility estimate.
+ALPHA = 0.1
+# Variance (per second) used until a symbol has price history.
+DEFAULT_VARIANCE = 1e-7
+
+
+def update_variance(variance: float, prev_price: Decimal, prev_time: float, price: Decimal, now: float) -> float:
+    """Return exponentially weighted variance of log returns per second."""
+    elapsed = now - prev_time
+    if elapsed <= 0 or prev_price <= 0 or price <= 0:
+        return variance
+    log_return = math.log(float(price) / float(prev_price))
+    return ALPHA * log_return ** 2 / elapsed + (1 - ALPHA) * variance
+
+
+def next_interval(price: Decimal, thresholds: Iterable[Decimal], variance: float) -> float:
+    """Return seconds until symbol has to be polled again."""
+    if price <= 0:
+        return MIN_INTERVAL
+    distances = [abs(float(threshold - price) / float(price)) for threshold in thresholds]
+    if not distances:
+        return MAX_INTERVAL
+    sigma = math.sqrt(max(variance, 1e-12))
+    interval = (min(distances) / (K * sigma)) ** 2
+    return min(max(interval, MIN_INTERVAL), MAX_INTERVAL)
+
+
+def get_due(symbols: Iterable[str], now: float | None = None) -> list[str]:
+    """Return symbols which have to be polled now.
+
+    Symbols not scheduled yet are due, unwatched symbols are unscheduled.
+    Without Redis all symbols are due.
+    """
+    if now is None:
+        now = time.time()
+    symbols = set(symbols)
+    try:
+        client = redis_client.get_redis()
+        scheduled = dict(client.zrange(DUE_KEY, 0, -1, withscores=True))
+        dropped = set(scheduled) - symbols
+        if dropped:
+            pipe = client.pipeline()
+            pipe.zrem(DUE_KEY, *dropped)
+            pipe.hdel(STATE_KEY, *dropped)
+            pipe.execute()
+    except redis.RedisError as ex:
+        logger.error(ex)
+        return sorted(symbols)
+    return sorted(
+        symbol for symbol in symbols
+        if symbol not in scheduled or scheduled[symbol] <= now
+    )
+
+
+def get_thresholds(symbols: Iterable[str]) -> dict[str, list[Decimal]]:
+    """Return prices of active threshold alerts per symbol."""
+    thresholds = {}
+    alerts = Alert.objects.filter(
+        is_active=True, symbol__name__in=list(symbols),
+    ).exclude(condition__in=Alert.change_conditions).values_list('symbol__name', 'price')
+    for symbol, price in alerts:
+        thresholds.setdefault(symbol, []).append(price)
+    return thresholds
+
+
+def schedule(prices: dict[str, Decimal], thresholds: dict[str, list[Decimal]], now: float | None = None) -> dict[str, float]:
+    """Update volatility of polled symbols and schedule their next poll.
+
+    Return intervals until the next poll. Redis errors are logged and
+    nothing is scheduled, so the symbols stay due.
+    """
+    if not prices:
+        return {}
+    if now is None:
+        now = time.time()
+    client = redis_client.get_redis()
+    symbols = list(prices)
+    try:
+        states = dict(zip(symbols, client.hmget(STATE_KEY, symbols)))
+    except redis.RedisError as ex:
+        logger.error(ex)
+        return {}
+    intervals = {}
+    new_states = {}
+    for symbol, price in prices.items():
+        variance = DEFAULT_VARIANCE
+        if states[symbol]:
+            prev_price, prev_time, variance = states[symbol].split('|')
+            variance = update_variance(
+                float(variance), Decimal(prev_price), float(prev_time), price, now)
+        intervals[symbol] = next_interval(price, thresholds.get(symbol, []), variance)
+        new_states[symbol] = f'{price}|{now}|{variance}'
+
+    pipe = client.pipeline()
+    pipe.hset(STATE_KEY, mapping=new_states)
+    pipe.zadd(DUE_KEY, {symbol: now + interval for symbol, interval in intervals.items()})
+    try:
+        pipe.execute()
+    except redis.RedisError as ex:
+        logger.error(ex)
+        return {}
+    return intervals
+
+
+def reschedule_on_commit(symbol_ids: Iterable[int]) -> None:
+    """Make symbols due after the current transaction is committed.
+
+    Used when alerts change, a new threshold may be close to the price.
+    The volatility state is kept.
+    """
+    symbol_ids = set(filter(None, symbol_ids))
+    if not symbol_ids:
+        return
+
+    def call():
+        names = list(Symbol.objects.filter(id__in=symbol_ids).values_list('name', flat=True))
+        if not names:
+            return
+        try:
+            redis_client.get_redis().zrem(DUE_KEY, *names)
+        except redis.RedisError as ex:
+            logger.error(ex)
+    transaction.on_commit(call)
@@ -0,0 +1,199 @@
+"""
+Latest prices cache in Redis.
+
+Prices are kept in one hash of symbol name to `<price>|<update timestamp>`.
+Ingestion writes there and the database is updated by periodic flushes.
+Low and high prices since the previous poll, when they are fetched, are
+kept in another hash as `<low>|<high>|<update timestamp>`. Changed prices
+are also published for the resident alert engine.
+"""
+import json
+import time
+from decimal import Decimal
+from typing import Iterable
+
+import redis
+from celery.utils.log import get_task_logger
+
+from core import redis_client
+from core.models import Symbol
+
+
+logger = get_task_logger(__name__)
+
+PRICES_KEY = 'prices:last'
+RANGES_KEY = 'prices:range'
+PRICES_CHANNEL = 'prices:changed'
+# Ranges older than this are not used for evaluation, so a spike is
+# applied by the evaluations right after the poll which saw it and not
+# on every later evaluation. Alerts created meanwhile can still be
+# triggered by it.
+RANGE_MAX_AGE = 90
+
+
+def set_prices(
+    prices: dict[str, Decimal],
+    timestamp: float | None = None,
+    ranges: dict[str, tuple[Decimal, Decimal]] | None = None,
+) -> list[str]:
+    """Save last prices and their (low, high) ranges to the cache.
+
+    Return names of symbols whose price was changed or moved within the
+    range.
+    """
+    if not prices:
+        return []
+    if timestamp is None:
+        timestamp = time.time()
+    ranges = ranges or {}
+    client = redis_client.get_redis()
+    symbols = list(prices)
+    previous = client.hmget(PRICES_KEY, symbols)
+    client.hset(PRICES_KEY, mapping={
+        symbol: f'{price}|{timestamp}' for symbol, price in prices.items()
+    })
+    if ranges:
+        client.hset(RANGES_KEY, mapping={
+            symbol: f'{low}|{high}|{timestamp}' for symbol, (low, high) in ranges.items()
+        })
+    changed = [
+        symbol for symbol, value in zip(symbols, previous)
+        if value is None
+        or Decimal(value.split('|')[0]) != prices[symbol]
+        or _moved(prices[symbol], ranges.get(symbol))
+    ]
+    if changed:
+        client.publish(PRICES_CHANNEL, json.dumps({
+            symbol: '|'.join(map(str, (prices[symbol], *ranges.get(symbol, ()))))
+            for symbol in changed
+        }))
+    return changed
+
+
+def _moved(price: Decimal, price_range: tuple[Decimal, Decimal] | None) -> bool:
+    return price_range is not None and (price_range[0] < price or price_range[1] > price)
+
+
+def parse_prices(data: str) -> tuple[dict[str, Decimal], dict[str, tuple[Decimal, Decimal]]]:
+    """Return prices and ranges of a published price change event."""
+    prices = {}
+    ranges = {}
+    for symbol, value in json.loads(data).items():
+        price, *price_range = map(Decimal, value.split('|'))
+        prices[symbol] = price
+        if price_range:
+            ranges[symbol] = tuple(price_range)
+    return prices, ranges
+
+
+def get_prices(symbols: Iterable[str] | None = None, max_age: float | None = None) -> dict[str, Decimal]:
+    """Return cached last prices.
+
+    Prices older than max_age seconds are skipped. If the cache is
+    unavailable an empty dict is returned, so callers fall back to
+    Symbol.last_price.
+    """
+    try:
+        client = redis_client.get_redis()
+        if symbols is None:
+            values = client.hgetall(PRICES_KEY)
+        else:
+            symbols = list(symbols)
+            values = dict(zip(symbols, client.hmget(PRICES_KEY, symbols))) if symbols else {}
+    except redis.RedisError as ex:
+        logger.error(ex)
+        return {}
+
+    now = time.time()
+    prices = {}
+    for symbol, value in values.items():
+        if value is None:
+            continue
+        price, timestamp = value.split('|')
+        if max_age is not None and now - float(timestamp) > max_age:
+            continue
+        prices[symbol] = Decimal(price)
+    return prices
+
+
+def get_updated_at(symbols: Iterable[str]) -> dict[str, float]:
+    """Return timestamps of the last cached prices of symbols.
+
+    Symbols never cached are left out. If the cache is unavailable an
+    empty dict is returned.
+    """
+    symbols = list(symbols)
+    if not symbols:
+        return {}
+    try:
+        values = redis_client.get_redis().hmget(PRICES_KEY, symbols)
+    except redis.RedisError as ex:
+        logger.error(ex)
+        return {}
+    return {
+        symbol: float(value.split('|')[1])
+        for symbol, value in zip(symbols, values)
+        if value is not None
+    }
+
+
+def current_prices(saved: dict[str, Decimal]) -> dict[str, Decimal]:
+    """Return saved last prices updated with cached ones.
+
+    Symbols without a real price are left out: a symbol that was never
+    priced (e.g. a typo accepted while the symbol registry was not
+    loaded) keeps the default Symbol.last_price of 0.
+    """
+    prices = {**saved, **get_prices(saved)}
+    return {symbol: price for symbol, price in prices.items() if price > 0}
+
+
+def get_ranges(symbols: Iterable[str], max_age: float | None = RANGE_MAX_AGE) -> dict[str, tuple[Decimal, Decimal]]:
+    """Return cached (low, high) ranges of symbols.
+
+    Ranges older than max_age seconds are skipped. If the cache is
+    unavailable an empty dict is returned.
+    """
+    symbols = list(symbols)
+    if not symbols:
+        return {}
+    try:
+        values = redis_client.get_redis().hmget(RANGES_KEY, symbols)
+    except redis.RedisError as ex:
+        logger.error(ex)
+        return {}
+
+    now = time.time()
+    ranges = {}
+    for symbol, value in zip(symbols, values):
+        if value is None:
+            continue
+        low, high, timestamp = value.split('|')
+        if max_age is not None and now - float(timestamp) > max_age:
+            continue
+        ranges[symbol] = (Decimal(low), Decimal(high))
+    return ranges
+
+
+def save_prices(
+    prices: dict[str, Decimal],
+    ranges: dict[str, tuple[Decimal, Decimal]] | None = None,
+) -> list[str]:
+    """Save last prices to the cache or to the database if cache is unavailable.
+
+    Ranges are kept in the cache only. Return names of symbols whose
+    price was changed.
+    """
+    try:
+        return set_prices(prices, ranges=ranges)
+    except redis.RedisError as ex:
+        logger.error(ex)
+        return Symbol.objects.update_last_prices(prices)
+
+
+def flush_prices() -> list[str]:
+    """Save cached prices to the database.
+
+    Return names of symbols whose price was changed.
+    """
+    return Symbol.objects.update_last_prices(get_prices())
@@ -0,0 +1,200 @@
+"""
+Streaming of last prices from the exchange WebSocket streams.
+"""
+import asyncio
+import json
+import random
+from decimal import Decimal
+from typing import Callable, Iterable
+
+import aiohttp
+from asgiref.sync import sync_to_async
+from celery.utils.log import get_task_logger
+
+
+logger = get_task_logger(__name__)
+
+STREAM_URL = 'wss://stream.binance.com:9443/stream'
+# The exchange accepts up to 5 control messages per second on a connection.
+STREAMS_PER_MESSAGE = 200
+MESSAGE_INTERVAL = 0.25
+# Streams the exchange allows on one connection.
+MAX_STREAMS = 1024
+
+
+def stream_name(symbol: str) -> str:
+    """Return the mini ticker stream name for symbol"""
+    return f'{symbol.lower()}@miniTicker'
+
+
+class StreamConnection:
+    """A WebSocket connection with its share of the streams."""
+
+    def __init__(self) -> None:
+        # assigned symbols and the ones subscribed on the current socket
+        self.symbols: set[str] = set()
+        self.subscribed: set[str] = set()
+        self.ws: aiohttp.ClientWebSocketResponse | None = None
+
+
+class PriceStream:
+    """Keep last prices current from combined mini ticker streams.
+
+    `get_symbols` returns names of symbols to follow and `save_prices`
+    takes a dict of changed last prices. Both are synchronous (they
+    usually touch the database) and are run outside the event loop.
+    Symbols are spread over as many connections as the per-connection
+    stream limit requires, each reconnecting on its own.
+    """
+
+    def __init__(
+        self,
+        get_symbols: Callable[[], Iterable[str]],
+        save_prices: Callable[[dict[str, Decimal]], object],
+        url: str = STREAM_URL,
+        sync_interval: float = 5.0,
+        flush_interval: float = 1.0,
+        min_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+    ) -> None:
+        self.get_symbols = sync_to_async(get_symbols)
+        self.save_prices = sync_to_async(save_prices)
+        self.url = url
+        self.sync_interval = sync_interval
+        self.flush_interval = flush_interval
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.symbols: set[str] = set()
+        self.connections: list[StreamConnection] = []
+        self.prices: dict[str, Decimal] = {}
+        self._request_id = 0
+
+    async def run(self) -> None:
+        """Stream prices forever, following the symbols to watch."""
+        async with aiohttp.ClientSession() as session:
+            tasks = [asyncio.create_task(self._every(self.flush_interval, self.flush))]
+            try:
+                while True:
+                    try:
+                        self.assign(await self.get_symbols())
+                    except Exception as ex:
+                        logger.error(ex)
+                    for connection in self.connections[len(tasks) - 1:]:
+                        tasks.append(asyncio.create_task(self._connect(session, connection)))
+                    for connection in self.connections:
+                        await self.sync_subscriptions(connection)
+                    await asyncio.sleep(self.sync_interval)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                await self.flush()
+
+    def assign(self, symbols: Iterable[str]) -> None:
+        """Spread symbols over connections, opening new ones when all are full.
+
+        Symbols stay on their connection while they are watched, so only
+        added and dropped ones cause (un)subscriptions.
+        """
+        symbols = set(symbols)
+        for symbol in self.symbols - symbols:
+            self.prices.pop(symbol, None)
+        added = sorted(symbols - self.symbols)
+        self.symbols = symbols
+        for connection in self.connections:
+            connection.symbols &= symbols
+            room = MAX_STREAMS - len(connection.symbols)
+            connection.symbols.update(added[:room])
+            added = added[room:]
+        while added:
+            connection = StreamConnection()
+            connection.symbols.update(added[:MAX_STREAMS])
+            added = added[MAX_STREAMS:]
+            self.connections.append(connection)
+
+    async def _connect(self, session: aiohttp.ClientSession, connection: StreamConnection) -> None:
+        """Keep connection open, reconnecting with exponential backoff."""
+        backoff = self.min_backoff
+        while True:
+            try:
+                async with session.ws_connect(self.url, heartbeat=30) as ws:
+                    logger.info('Connected to %s', self.url)
+                    backoff = self.min_backoff
+                    await self._consume(ws, connection)
+                logger.warning('Price stream is closed by server.')
+            except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+                logger.error(ex)
+            delay = backoff * random.uniform(0.5, 1.0)
+            backoff = min(backoff * 2, self.max_backoff)
+            logger.info('Reconnecting in %.1f sec.', delay)
+            await asyncio.sleep(delay)
+
+    async def _consume(self, ws: aiohttp.ClientWebSocketResponse, connection: StreamConnection) -> None:
+        """Subscribe and handle messages until the connection is closed."""
+        connection.ws = ws
+        connection.subscribed = set()
+        try:
+            await self.sync_subscriptions(connection)
+            async for msg in ws:
+                if msg.type == aiohttp.WSMsgType.TEXT:
+                    self.handle_message(msg.data)
+                elif msg.type == aiohttp.WSMsgType.ERROR:
+                    break
+        finally:
+            connection.ws = None
+
+    async def _every(self, interval: float, func, *args) -> None:
+        """Call coroutine function every interval seconds."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await func(*args)
+            except Exception as ex:
+                logger.error(ex)
+
+    async def sync_subscriptions(self, connection: StreamConnection) -> None:
+        """Subscribe connection to new symbols and unsubscribe from dropped ones."""
+        ws = connection.ws
+        if ws is None or ws.closed:
+            return
+        added = connection.symbols - connection.subscribed
+        dropped = connection.subscribed - connection.symbols
+        connection.subscribed = set(connection.symbols)
+        try:
+            await self._send(ws, 'SUBSCRIBE', added)
+            await self._send(ws, 'UNSUBSCRIBE', dropped)
+        except (aiohttp.ClientError, ConnectionError) as ex:
+            logger.error(ex)
+            # the connection subscribes from scratch when it is back
+            await ws.close()
+
+    async def _send(self, ws: aiohttp.ClientWebSocketResponse, method: str, symbols: set[str]) -> None:
+        streams = [stream_name(symbol) for symbol in sorted(symbols)]
+        for i in range(0, len(streams), STREAMS_PER_MESSAGE):
+            self._request_id += 1
+            await ws.send_json({
+                'method': method,
+                'params': streams[i:i + STREAMS_PER_MESSAGE],
+                'id': self._request_id,
+            })
+            await asyncio.sleep(MESSAGE_INTERVAL)
+
+    def handle_message(self, data: str) -> None:
+        """Remember last price from a combined stream message."""
+        message = json.loads(data)
+        ticker = message.get('data')
+        if not ticker or 's' not in ticker:
+            # subscription responses and other service messages
+            return
+        if ticker['s'] in self.symbols:
+            self.prices[ticker['s']] = Decimal(ticker['c'])
+
+    async def flush(self) -> None:
+        """Save prices received since the last flush."""
+        if not self.prices:
+            return
+        prices, self.prices = self.prices, {}
+        try:
+            await self.save_prices(prices)
+        except Exception as ex:
+            logger.error(ex)
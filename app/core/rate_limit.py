@@ -0,0 +1,125 @@
+"""
+Token buckets for rate limited APIs.
+"""
+import asyncio
+import math
+import time
+
+import redis
+from celery.utils.log import get_task_logger
+
+from core import redis_client
+
+logger = get_task_logger(__name__)
+
+
+class TokenBucket:
+    """Allow `rate` acquisitions per second with bursts up to `capacity`.
+
+    A bucket can be paused, e.g. when the API asks to retry after some
+    time, and all acquisitions wait until the pause is over.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None, clock=time.monotonic) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> float:
+        """Take a token if there is one.
+
+        Return 0 on success or seconds to wait before trying again.
+        """
+        now = self.clock()
+        if now < self.paused_until:
+            return self.paused_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self) -> None:
+        """Wait for a token."""
+        while wait := self.try_acquire():
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Refuse tokens for seconds."""
+        self.paused_until = max(self.paused_until, self.clock() + seconds)
+
+    @property
+    def idle(self) -> bool:
+        """The bucket is full and not paused, so it can be dropped."""
+        now = self.clock()
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.paused_until
+
+
+class SharedTokenBucket(TokenBucket):
+    """Token bucket kept in Redis and shared by all processes using key.
+
+    Tokens are taken in a transaction watching the key, so concurrent
+    workers never take the same token. Waiters of a process queue on a
+    lock, so only one of them polls Redis. Without Redis the bucket
+    counts on its own like a TokenBucket. A bucket has to be used from
+    a single event loop.
+    """
+
+    def __init__(self, key: str, rate: float, capacity: float | None = None, clock=time.time) -> None:
+        super().__init__(rate, capacity, clock)
+        self.key = key
+        self._lock: asyncio.Lock | None = None
+
+    def _ttl(self, paused_until: float, now: float) -> int:
+        return math.ceil(max(self.capacity / self.rate, paused_until - now)) + 1
+
+    def _take(self, pipe) -> float:
+        tokens, updated, paused_until = pipe.hmget(self.key, 'tokens', 'updated', 'paused_until')
+        now = self.clock()
+        paused_until = float(paused_until or 0)
+        if now < paused_until:
+            return paused_until - now
+        tokens = self.capacity if tokens is None else min(
+            self.capacity, float(tokens) + (now - float(updated)) * self.rate)
+        wait = 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+        if not wait:
+            tokens -= 1
+        pipe.multi()
+        pipe.hset(self.key, mapping={'tokens': tokens, 'updated': now})
+        pipe.expire(self.key, self._ttl(paused_until, now))
+        return wait
+
+    def try_acquire(self) -> float:
+        try:
+            return redis_client.get_redis().transaction(self._take, self.key, value_from_callable=True)
+        except redis.RedisError as ex:
+            logger.error(ex)
+            return super().try_acquire()
+
+    async def acquire(self) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            await super().acquire()
+
+    def _pause(self, pipe) -> None:
+        now = self.clock()
+        if self.paused_until > float(pipe.hget(self.key, 'paused_until') or 0):
+            pipe.multi()
+            pipe.hset(self.key, 'paused_until', self.paused_until)
+            pipe.expire(self.key, self._ttl(self.paused_until, now))
+
+    def pause(self, seconds: float) -> None:
+        super().pause(seconds)
+        try:
+            redis_client.get_redis().transaction(self._pause, self.key)
+        except redis.RedisError as ex:
+            logger.error(ex)
@@ -0,0 +1,17 @@
+"""
+Redis client for hot data shared between processes.
+"""
+import redis
+from django.conf import settings
+
+
+_client = None
+
+
+def get_redis() -> redis.Redis:
+    """Return the shared Redis client."""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.REDIS_CACHE_URL, decode_responses=True)
+    return _client
@@ -0,0 +1,163 @@
+"""
+Rolling window price changes for percent change alerts.
+"""
+import math
+from collections import deque
+from decimal import Decimal
+from typing import Iterable
+
+
+# Samples of recent prices kept per symbol to seed new windows.
+HISTORY_SIZE = 4096
+
+
+class RollingWindow:
+    """Min and max price over the last `length` seconds.
+
+    Monotonic deques keep the candidates for the minimum (increasing
+    prices) and the maximum (decreasing prices). Every sample is pushed
+    and popped at most once, so a push is amortized O(1) whatever the
+    window length. Prices are sampled when they change, so a sample is
+    in the window until the sample after it is older than the window:
+    samples are kept with the timestamp when they were replaced.
+    """
+
+    def __init__(self, length: float) -> None:
+        self.length = length
+        self._min: deque[tuple[float, Decimal]] = deque()
+        self._max: deque[tuple[float, Decimal]] = deque()
+
+    def push(self, timestamp: float, price: Decimal) -> None:
+        """Add price sample and drop the ones out of the window."""
+        # the last sample is the newest one in both deques
+        if self._min:
+            self._min[-1] = (timestamp, self._min[-1][1])
+            self._max[-1] = (timestamp, self._max[-1][1])
+        while self._min and self._min[-1][1] >= price:
+            self._min.pop()
+        self._min.append((math.inf, price))
+        while self._max and self._max[-1][1] <= price:
+            self._max.pop()
+        self._max.append((math.inf, price))
+        start = timestamp - self.length
+        while self._min[0][0] <= start:
+            self._min.popleft()
+        while self._max[0][0] <= start:
+            self._max.popleft()
+
+    @property
+    def min(self) -> Decimal:
+        return self._min[0][1]
+
+    @property
+    def max(self) -> Decimal:
+        return self._max[0][1]
+
+
+def change_percent(condition: str, window: RollingWindow, last_price: Decimal) -> Decimal:
+    """Return the percent change of last price for condition.
+
+    `rise` is the change from the window low, `fall` the change from the
+    window high and `move` the larger of both.
+    """
+    rise = (last_price - window.min) / window.min * 100 if window.min else Decimal(0)
+    fall = (window.max - last_price) / window.max * 100 if window.max else Decimal(0)
+    match condition:
+        case 'rise':
+            return rise
+        case 'fall':
+            return fall
+        case _:
+            return max(rise, fall)
+
+
+class ChangeIndex:
+    """Active percent change alerts with rolling windows per symbol.
+
+    Alerts of a symbol with the same window length share one
+    RollingWindow. A ring buffer of recent samples per symbol seeds
+    windows of new alerts, so they see prices from before they were
+    added. The buffer covers a limited time, windows of indexed alerts
+    are kept when the alerts are reloaded with replace().
+    """
+
+    def __init__(self, history: dict[str, deque] | None = None) -> None:
+        self.history: dict[str, deque[tuple[float, Decimal]]] = history if history is not None else {}
+        self._windows: dict[str, dict[float, RollingWindow]] = {}
+        self._alerts: dict[int, tuple[str, str, Decimal, float]] = {}
+        self._by_symbol: dict[str, set[int]] = {}
+
+    @classmethod
+    def from_alerts(
+        cls,
+        alerts: Iterable[tuple[int, str, str, Decimal, float]],
+        history: dict[str, deque] | None = None,
+    ) -> 'ChangeIndex':
+        """Build index from (id, symbol, condition, percent, window seconds) tuples."""
+        index = cls(history)
+        for alert in alerts:
+            index.add(*alert)
+        return index
+
+    def replace(self, alerts: Iterable[tuple[int, str, str, Decimal, float]]) -> None:
+        """Index (id, symbol, condition, percent, window seconds) tuples instead of the current alerts.
+
+        Windows still used by the new alerts keep their samples.
+        """
+        windows = self._windows
+        self._windows, self._alerts, self._by_symbol = {}, {}, {}
+        for alert_id, symbol, condition, percent, length in alerts:
+            window = windows.get(symbol, {}).get(length)
+            if window is not None:
+                self._windows.setdefault(symbol, {})[length] = window
+            self.add(alert_id, symbol, condition, percent, length)
+
+    def __len__(self) -> int:
+        return len(self._alerts)
+
+    def __contains__(self, alert_id: int) -> bool:
+        return alert_id in self._alerts
+
+    def add(self, alert_id: int, symbol: str, condition: str, percent: Decimal, length: float) -> None:
+        """Add or replace alert."""
+        self.remove(alert_id)
+        self._alerts[alert_id] = (symbol, condition, percent, length)
+        self._by_symbol.setdefault(symbol, set()).add(alert_id)
+        windows = self._windows.setdefault(symbol, {})
+        if length not in windows:
+            window = RollingWindow(length)
+            for timestamp, price in self.history.get(symbol, ()):
+                window.push(timestamp, price)
+            windows[length] = window
+
+    def remove(self, alert_id: int) -> None:
+        """Remove alert if it is indexed."""
+        if alert_id not in self._alerts:
+            return
+        symbol, _, _, length = self._alerts.pop(alert_id)
+        self._by_symbol[symbol].discard(alert_id)
+        if not any(self._alerts[other][3] == length for other in self._by_symbol[symbol]):
+            del self._windows[symbol][length]
+
+    def update(self, symbol: str, timestamp: float, prices: Iterable[Decimal]) -> list[int]:
+        """Push price samples of symbol, the last one is the last price.
+
+        Return ids of triggered alerts, they stay indexed until removed.
+        """
+        prices = list(prices)
+        history = self.history.setdefault(symbol, deque(maxlen=HISTORY_SIZE))
+        for price in prices:
+            history.append((timestamp, price))
+        alert_ids = self._by_symbol.get(symbol)
+        if not alert_ids:
+            return []
+        windows = self._windows[symbol]
+        for window in windows.values():
+            for price in prices:
+                window.push(timestamp, price)
+        triggered = []
+        for alert_id in alert_ids:
+            _, condition, percent, length = self._alerts[alert_id]
+            if change_percent(condition, windows[length], prices[-1]) >= percent:
+                triggered.append(alert_id)
+        return triggered
@@ -1,28 +1,166 @@
 import smtplib
 import ssl
-from celery.utils.log import get_task_logger
 import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from celery.utils.log import get_task_logger
 
 logger = get_task_logger(__name__)
 
+POOL_SIZE = 4
+# Seconds a connection may stay idle before it is checked with NOOP.
+IDLE_CHECK = 30
+TIMEOUT = 30
+# Replies refusing a message, the dialog is reset after them.
+REFUSALS = (smtplib.SMTPSenderRefused, smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError)
 
-def send_mail(emails, subject, content) -> bool:
-    try:
-        port = int(os.environ.get('EMAIL_SERVER_PORT', 465))
-        smtp_server_domain_name = os.environ.get('EMAIL_SERVER', '')
-        sender_mail = os.environ.get('EMAIL_ACCOUNT', '')
-        password = os.environ.get('EMAIL_PASSWORD', '')
 
-        ssl_context = ssl.create_default_context()
-        service = smtplib.SMTP_SSL(
-            smtp_server_domain_name, port, context=ssl_context)
-        service.login(sender_mail, password)
+class SMTPPool:
+    """Pool of logged in SMTP connections.
 
-        for email in emails:
-            result = service.sendmail(
-                sender_mail, email, f"Subject: {subject}\n{content}")
+    Connections are opened on demand up to `size`, reused across messages
+    and dropped when the server closes them or a command fails. A
+    connection idle for more than `idle_check` seconds is checked with
+    NOOP before it is used again. The pool is thread safe.
+    """
+
+    def __init__(self, host: str, port: int, user: str, password: str,
+                 use_ssl: bool = True, size: int = POOL_SIZE,
+                 idle_check: float = IDLE_CHECK, timeout: float = TIMEOUT) -> None:
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_ssl = use_ssl
+        self.size = size
+        self.idle_check = idle_check
+        self.timeout = timeout
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self.connects = 0
+
+    def _connect(self) -> smtplib.SMTP:
+        if self.use_ssl:
+            service = smtplib.SMTP_SSL(
+                self.host, self.port, timeout=self.timeout, context=ssl.create_default_context())
+        else:
+            service = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.user:
+            service.login(self.user, self.password)
+        self.connects += 1
+        return service
+
+    def _get(self) -> smtplib.SMTP:
+        while True:
+            try:
+                service, used_at = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - used_at < self.idle_check:
+                return service
+            try:
+                if service.noop()[0] == 250:
+                    return service
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close(service)
+
+    @staticmethod
+    def _close(service: smtplib.SMTP) -> None:
+        try:
+            service.quit()
+        except (smtplib.SMTPException, OSError):
+            service.close()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection, it is dropped if the block raises.
+
+        Messages refused by the server leave the connection usable.
+        """
+        with self._slots:
+            service = self._get()
+            try:
+                yield service
+            except REFUSALS:
+                self._idle.put((service, time.monotonic()))
+                raise
+            except BaseException:
+                self._close(service)
+                raise
+            self._idle.put((service, time.monotonic()))
 
-        service.quit()
+    def sendmail(self, sender: str, recipients: list[str], message: str) -> None:
+        """Send message, reconnecting once if the connection is broken.
+
+        The dialog of SMTP.sendmail() is run step by step, so the message
+        is sent again only if the connection broke before DATA. Once the
+        message is handed over it may be delivered, any error is raised.
+        """
+        for attempt in range(2):
+            handed_over = False
+            try:
+                with self.connection() as service:
+                    service.ehlo_or_helo_if_needed()
+                    code, response = service.mail(sender)
+                    if code != 250:
+                        service.rset()
+                        raise smtplib.SMTPSenderRefused(code, response, sender)
+                    refused = {}
+                    for recipient in recipients:
+                        code, response = service.rcpt(recipient)
+                        if code not in (250, 251):
+                            refused[recipient] = (code, response)
+                    if len(refused) == len(recipients):
+                        service.rset()
+                        raise smtplib.SMTPRecipientsRefused(refused)
+                    handed_over = True
+                    code, response = service.data(message)
+                    if code != 250:
+                        service.rset()
+                        raise smtplib.SMTPDataError(code, response)
+                return
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                if attempt or handed_over:
+                    raise
+
+    def close(self) -> None:
+        """Close idle connections."""
+        while True:
+            try:
+                service, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(service)
+
+
+_pool: SMTPPool | None = None
+_pid: int | None = None
+_lock = threading.Lock()
+
+
+def get_pool() -> SMTPPool:
+    """Return the SMTP pool of this process, a forked child gets its own."""
+    global _pool, _pid
+    with _lock:
+        if _pid != os.getpid():
+            _pool = SMTPPool(
+                host=os.environ.get('EMAIL_SERVER', ''),
+                port=int(os.environ.get('EMAIL_SERVER_PORT', 465)),
+                user=os.environ.get('EMAIL_ACCOUNT', ''),
+                password=os.environ.get('EMAIL_PASSWORD', ''),
+            )
+            _pid = os.getpid()
+        return _pool
+
+
+def send_mail(emails, subject, content) -> bool:
+    try:
+        pool = get_pool()
+        for email in emails:
+            pool.sendmail(pool.user, [email], f"Subject: {subject}\n{content}")
         return True
     except Exception as ex:
         logger.error(ex)
@@ -0,0 +1,39 @@
+"""
+Signal handlers of core models.
+"""
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from core.models import Alert, Symbol
+from core import watched_symbols, alert_events, polling
+
+
+@receiver(post_init, sender=Alert)
+def remember_alert_symbol(sender, instance, **kwargs):
+    """Remember symbol of loaded alert to notice its change."""
+    instance._loaded_symbol_id = instance.symbol_id
+
+
+@receiver(post_save, sender=Alert)
+@receiver(post_delete, sender=Alert)
+def update_watched_symbols(sender, instance, **kwargs):
+    """Update watched symbols and their polling schedule after alert changes."""
+    symbol_ids = {instance.symbol_id, instance._loaded_symbol_id}
+    watched_symbols.refresh_on_commit(symbol_ids)
+    polling.reschedule_on_commit(symbol_ids)
+    instance._loaded_symbol_id = instance.symbol_id
+
+
+@receiver(post_save, sender=Alert)
+@receiver(post_delete, sender=Alert)
+def publish_alert_event(sender, instance, **kwargs):
+    """Tell the alert engine about alert changes."""
+    alert_events.publish_on_commit([instance.id])
+
+
+@receiver(post_save, sender=Symbol)
+@receiver(post_delete, sender=Symbol)
+def rebuild_watched_symbols(sender, instance, created=False, **kwargs):
+    """Rebuild watched symbols after symbol is renamed or deleted."""
+    if not created:
+        watched_symbols.rebuild_on_commit()
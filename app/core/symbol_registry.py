@@ -0,0 +1,104 @@
+"""
+Registry of symbols trading on the exchange.
+
+Names of trading symbols are cached in Redis and refreshed on schedule,
+a missing registry (e.g. after a deploy or a Redis flush) is loaded on
+first use. Symbols missing from the registry, or reported invalid by the
+exchange since the last refresh, are never fetched.
+"""
+from typing import Iterable
+
+import redis
+from celery.utils.log import get_task_logger
+
+from core import redis_client
+from core.binance_api import fetch_trading_symbols
+
+
+logger = get_task_logger(__name__)
+
+REGISTRY_KEY = 'exchange:symbols'
+INVALID_KEY = 'exchange:invalid'
+LOADING_KEY = 'exchange:symbols:loading'
+# Seconds between attempts to load a missing registry.
+LOAD_INTERVAL = 60
+
+
+def refresh() -> int:
+    """Load trading symbols from the exchange.
+
+    Return number of trading symbols.
+    """
+    symbols = fetch_trading_symbols()
+    if not symbols:
+        return 0
+    tmp_key = f'{REGISTRY_KEY}:tmp'
+    pipe = redis_client.get_redis().pipeline()
+    pipe.delete(tmp_key)
+    pipe.sadd(tmp_key, *symbols)
+    pipe.rename(tmp_key, REGISTRY_KEY)
+    pipe.delete(INVALID_KEY)
+    pipe.execute()
+    return len(symbols)
+
+
+def mark_invalid(symbols: Iterable[str]) -> None:
+    """Remember symbols reported invalid by the exchange."""
+    symbols = list(symbols)
+    if symbols:
+        logger.warning('Invalid symbols: %s', ', '.join(symbols))
+        try:
+            redis_client.get_redis().sadd(INVALID_KEY, *symbols)
+        except redis.RedisError as ex:
+            logger.error(ex)
+
+
+def _load() -> bool:
+    """Load the missing registry, one process tries every LOAD_INTERVAL seconds.
+
+    Return whether it is loaded.
+    """
+    if not redis_client.get_redis().set(LOADING_KEY, 1, nx=True, ex=LOAD_INTERVAL):
+        return False
+    try:
+        return bool(refresh())
+    except redis.RedisError:
+        raise
+    except Exception as ex:
+        logger.error('Symbol registry is not loaded: %r', ex)
+        return False
+
+
+def _lookup(symbols: list[str]) -> tuple[bool, list, list]:
+    pipe = redis_client.get_redis().pipeline()
+    pipe.exists(REGISTRY_KEY)
+    pipe.smismember(REGISTRY_KEY, symbols)
+    pipe.smismember(INVALID_KEY, symbols)
+    return pipe.execute()
+
+
+def filter_known(symbols: Iterable[str]) -> list[str]:
+    """Return symbols which may be fetched from the exchange.
+
+    A missing registry is loaded first. All symbols are returned while
+    the registry can not be loaded or is unavailable.
+    """
+    symbols = list(symbols)
+    if not symbols:
+        return symbols
+    try:
+        loaded, known, invalid = _lookup(symbols)
+        if not loaded and _load():
+            loaded, known, invalid = _lookup(symbols)
+    except redis.RedisError as ex:
+        logger.error(ex)
+        return symbols
+    return [
+        symbol for symbol, is_known, is_invalid in zip(symbols, known, invalid)
+        if (is_known or not loaded) and not is_invalid
+    ]
+
+
+def is_known(symbol: str) -> bool:
+    """Return whether symbol may be fetched from the exchange."""
+    return bool(filter_known([symbol]))
@@ -1,63 +1,373 @@
-from celery import shared_task
+import random
+import time
+import zlib
+from datetime import timedelta
+from decimal import Decimal
+
+from celery import shared_task, chord
 from celery.utils.log import get_task_logger
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
 
-from core.models import Symbol, Alert, CoreSettings
-from core.binance_api import get_last_price
-from core.telegram_bot import send_message as send_telegram_message 
-from core.send_email import send_mail
-from binance.spot import Spot
+from core.models import Alert, Symbol, CoreSettings, Notification
+from core.binance_api import fetch_last_prices, fetch_price_ranges, get_client, range_window, RateLimitError
+from core import price_cache, watched_symbols, polling, symbol_registry, alert_events, channels
+from core.alert_index import scan_alerts
+from core.alert_vector import VectorAlertBook, scaled_expression
 
 
 logger = get_task_logger(__name__)
 
+NOTIFICATION_BATCH_SIZE = 100
+# Seconds after which a claimed but unfinished notification is claimed again.
+NOTIFICATION_CLAIM_TIMEOUT = 300
+# Failed deliveries are retried after about 60, 120, 240 and 480 seconds,
+# then the notification is left failed as a dead letter.
+NOTIFICATION_MAX_ATTEMPTS = 5
+NOTIFICATION_RETRY_DELAY = 60
+NOTIFICATION_MAX_RETRY_DELAY = 3600
+
+
+def _range_windows(names: list[str]) -> dict[str, list[str]]:
+    """Group symbols by the range window covering the time since their last poll."""
+    now = time.time()
+    updated_at = price_cache.get_updated_at(names)
+    groups = {}
+    for name in names:
+        groups.setdefault(range_window(now - updated_at.get(name, now)), []).append(name)
+    return groups
+
+
+def _ingest_prices(names: list[str], track_price_range: bool = False) -> dict[str, Decimal]:
+    """Get and cache last prices for symbols known to the exchange.
+
+    With track_price_range low and high prices since the last poll of
+    every symbol are fetched in the same batched requests, one batch per
+    window size. Alerts of symbols whose price was changed are evaluated
+    right away.
+    """
+    invalid = set()
+    ranges = {}
+    try:
+        if track_price_range:
+            windows = {}
+            for window_size, group in _range_windows(symbol_registry.filter_known(names)).items():
+                windows.update(fetch_price_ranges(group, invalid, window_size))
+            prices = {symbol: last for symbol, (last, _, _) in windows.items()}
+            ranges = {symbol: (low, high) for symbol, (_, low, high) in windows.items()}
+        else:
+            prices = fetch_last_prices(symbol_registry.filter_known(names), invalid)
+    except RateLimitError as ex:
+        logger.warning('Prices are not updated: %s', ex)
+        return {}
+    symbol_registry.mark_invalid(invalid)
+    changed = price_cache.save_prices(prices, ranges)
+    if changed:
+        dispatch_evaluation(changed)
+    return prices
+
 
 @shared_task
-def get_and_save_last_prices() -> None:
-    """Get and save last prices for all symbols"""
+def get_and_save_last_prices() -> dict | None:
+    """Get and save last prices for symbols with active alerts.
+
+    Return request weight usage of the exchange API.
+    """
     core_settings = CoreSettings.objects.get()
-    if not core_settings.update_last_prices:
-        return
-    client = Spot()
+    if not core_settings.update_last_prices or core_settings.adaptive_polling:
+        return None
+
+    _ingest_prices(watched_symbols.get_watched(), core_settings.track_price_range)
+    usage = get_client().weights.usage()
+    logger.info('Exchange request weight usage: %s', usage)
+    return usage
+
+
+@shared_task
+def poll_due_prices() -> dict | None:
+    """Get and save last prices for symbols due by the adaptive schedule.
+
+    Return request weight usage of the exchange API.
+    """
+    core_settings = CoreSettings.objects.get()
+    if not core_settings.update_last_prices or not core_settings.adaptive_polling:
+        return None
+
+    now = time.time()
+    names = polling.get_due(watched_symbols.get_watched(), now)
+    if names:
+        prices = _ingest_prices(names, core_settings.track_price_range)
+        polling.schedule(prices, polling.get_thresholds(prices), now)
+    return get_client().weights.usage()
+
+
+@shared_task
+def flush_last_prices() -> None:
+    """Save cached last prices to the database"""
+    price_cache.flush_prices()
+
+
+@shared_task
+def refresh_exchange_symbols() -> None:
+    """Refresh the registry of symbols trading on the exchange"""
+    logger.info('Trading symbols: %s', symbol_registry.refresh())
+
+
+@shared_task
+def rebuild_watched_symbols() -> None:
+    """Rebuild the set of symbols with active alerts"""
+    watched_symbols.rebuild()
+
+
+def _alert_message(alert: Alert) -> str:
+    if alert.condition in Alert.change_conditions:
+        return alert.title
+    return f'{alert.symbol} is {alert.condition} {alert.price}'
+
+
+def send_triggered_alerts(triggered: list[int], flipped: dict[int, str], core_settings=None) -> list[Alert]:
+    """Queue notifications of triggered alerts and save the outcome.
+
+    Alerts are claimed atomically: locked rows are skipped, claimed ones
+    are deactivated and their notifications are written to the outbox in
+    the same transaction, so overlapping evaluations never notify twice.
+    Alerts of users no enabled channel accepts are not claimed, they stay
+    active until they can be sent. Flipped `cross` alerts get their new condition unless they changed
+    since they were read. Return claimed alerts.
+    """
+    if core_settings is None:
+        core_settings = CoreSettings.objects.get()
+    enabled = channels.enabled_channels(core_settings)
+    flips = {}
+    for alert_id, condition in flipped.items():
+        flips.setdefault(condition, []).append(alert_id)
+
+    with transaction.atomic():
+        locked = list(
+            Alert.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(id__in=triggered, is_active=True)
+            .select_related('symbol', 'user')
+        ) if triggered else []
+        claimed, notifications = [], []
+        for alert in locked:
+            accepted = [channel for channel in enabled if channel.accepts(alert.user)]
+            if accepted:
+                claimed.append(alert)
+                notifications.extend(
+                    Notification(user=alert.user, alert=alert, channel=channel.name, message=_alert_message(alert))
+                    for channel in accepted
+                )
+        if claimed:
+            Alert.objects.filter(id__in=[alert.id for alert in claimed]).update(is_active=False)
+            notifications = Notification.objects.bulk_create(notifications)
+            watched_symbols.refresh_on_commit(alert.symbol_id for alert in claimed)
+            # channels are delivered by their own dispatchers concurrently,
+            # with digests they run when the window is over
+            for channel in dict.fromkeys(notification.channel for notification in notifications):
+                transaction.on_commit(lambda channel=channel: send_notifications.apply_async(
+                    (channel,), countdown=core_settings.digest_window))
+        # only alerts still waiting to cross, a stale evaluation must not
+        # overwrite an alert flipped, edited or deactivated meanwhile
+        for condition, ids in flips.items():
+            Alert.objects.filter(id__in=ids, condition='cross', is_active=True).update(condition=condition)
+        if claimed or flips:
+            alert_events.publish_on_commit([*flipped, *(alert.id for alert in claimed)])
+    return claimed
+
+
+def _digest(messages: list[str]) -> str:
+    """Join messages of one user into a single one."""
+    if len(messages) == 1:
+        return messages[0]
+    return '\n'.join([f'{len(messages)} alerts triggered:', *messages])
 
-    symbols = Symbol.objects.all()
+
+def retry_delay(attempts: int) -> float:
+    """Return seconds to wait before the next attempt.
+
+    The delay doubles with every attempt and half of it is random, so
+    notifications failed together do not retry together.
+    """
+    delay = min(NOTIFICATION_MAX_RETRY_DELAY, NOTIFICATION_RETRY_DELAY * 2 ** (attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _claim_notifications(channel: str, limit: int, digest_window: int = 0) -> list[Notification]:
+    """Claim a batch of pending notifications of channel.
+
+    Retries are claimed when their next attempt is due. With a digest
+    window, notifications of a user are claimed together once the oldest
+    of them has waited for the window. Notifications
+    claimed by a dispatcher that did not finish them in
+    NOTIFICATION_CLAIM_TIMEOUT seconds (e.g. its worker crashed) are
+    claimed again.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=NOTIFICATION_CLAIM_TIMEOUT)
+    pending = Q(status='pending') & (Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+    if digest_window:
+        due = Notification.objects.filter(
+            pending, channel=channel, created_at__lte=now - timedelta(seconds=digest_window),
+        ).values('user_id')
+        pending &= Q(user_id__in=due)
+    with transaction.atomic():
+        batch = list(
+            Notification.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(channel=channel)
+            .filter(pending | Q(status='sending', claimed_at__lt=stale))
+            .select_related('user')
+            .order_by('user_id', 'id')[:limit]
+        )
+        Notification.objects.filter(id__in=[item.id for item in batch]).update(
+            status='sending', claimed_at=now)
+    return batch
+
+
+@shared_task
+def dispatch_notifications() -> None:
+    """Start a dispatcher for every channel, e.g. for due retries."""
+    for channel in channels.CHANNELS:
+        send_notifications.delay(channel)
+
+
+@shared_task
+def send_notifications(channel: str) -> int:
+    """Deliver pending notifications of channel from the outbox.
+
+    Any number of dispatchers can drain the outbox at the same time.
+    With a digest window, notifications of a user claimed together are
+    sent as one message. Failed ones are scheduled for a retry with
+    backoff, the beat sweep picks them up when they are due. Return
+    number of delivered notifications.
+    """
+    digest_window = CoreSettings.objects.get().digest_window
+    delivered = 0
+    while batch := _claim_notifications(channel, NOTIFICATION_BATCH_SIZE, digest_window):
+        digests = {}
+        for notification in batch:
+            key = notification.user_id if digest_window else notification.id
+            digests.setdefault(key, []).append(notification)
+        messages = [
+            (items[0].user, _digest([item.message for item in items])) for items in digests.values()
+        ]
+        try:
+            results = channels.get_channel(channel).send(messages)
+        except Exception as ex:
+            # the claimed rows must not stay in sending, retry the batch
+            logger.error('%s channel failed: %r', channel, ex)
+            results = [False] * len(messages)
+        sent, failed = [], []
+        for items, ok in zip(digests.values(), results):
+            (sent if ok else failed).extend(items)
+        now = timezone.now()
+        if sent:
+            Notification.objects.filter(id__in=[item.id for item in sent]).update(
+                status='sent', sent_at=now, attempts=F('attempts') + 1)
+        for item in failed:
+            item.attempts += 1
+            if item.attempts < NOTIFICATION_MAX_ATTEMPTS:
+                item.status = 'pending'
+                item.next_attempt_at = now + timedelta(seconds=retry_delay(item.attempts))
+            else:
+                item.status = 'failed'
+                item.next_attempt_at = None
+        Notification.objects.bulk_update(failed, ['status', 'attempts', 'next_attempt_at'])
+        if failed:
+            logger.warning('%s %s notifications failed.', len(failed), channel)
+        delivered += len(sent)
+    return delivered
+
+
+def _evaluate_alerts(alerts) -> dict:
+    """Send triggered alerts of queryset to users.
+
+    Return evaluation counters.
+    """
+    core_settings = CoreSettings.objects.get()
+    alerts = alerts.filter(is_active=True)
+    if core_settings.evaluation_backend == 'numpy':
+        # prices are scaled to integers by the database
+        rows = list(alerts.annotate(scaled_price=scaled_expression('price')).values_list(
+            'id', 'symbol__name', 'condition', 'scaled_price', 'symbol__last_price'))
+        ids, symbols, conditions, scaled, last_prices = zip(*rows) if rows else ((),) * 5
+        book = VectorAlertBook.from_columns(ids, symbols, conditions, scaled)
+        prices = price_cache.current_prices(dict(zip(symbols, last_prices)))
+        ranges = price_cache.get_ranges(prices) if core_settings.track_price_range else {}
+        triggered, flipped = book.evaluate(prices, ranges)
+    else:
+        # the alerts are evaluated once, an index would not pay off
+        rows = list(alerts.values_list('id', 'symbol__name', 'condition', 'price', 'symbol__last_price'))
+        prices = price_cache.current_prices({row[1]: row[4] for row in rows})
+        ranges = price_cache.get_ranges(prices) if core_settings.track_price_range else {}
+        triggered, flipped = scan_alerts((row[:4] for row in rows), prices, ranges)
+
+    claimed = send_triggered_alerts(triggered, flipped, core_settings)
+    return {
+        'alerts': len(rows),
+        'triggered': len(triggered),
+        'claimed': len(claimed),
+        'flipped': len(flipped),
+    }
+
+
+def shard_of(symbol: str, shards: int) -> int:
+    """Return evaluation shard of symbol"""
+    return zlib.crc32(symbol.encode()) % shards
+
+
+def dispatch_evaluation(symbols: list[str]) -> None:
+    """Evaluate alerts of symbols in the background.
+
+    With more than one evaluation shard, symbols are split by hash and
+    each shard is evaluated by its own task. Nothing is dispatched when
+    the resident alert engine evaluates alerts from price events.
+    """
+    core_settings = CoreSettings.objects.get()
+    if core_settings.alert_engine:
+        return
+    shards = core_settings.evaluation_shards
+    if shards <= 1:
+        evaluate_symbols.delay(symbols)
+        return
+    parts = [[] for _ in range(shards)]
     for symbol in symbols:
-        symbol.last_price = get_last_price(client, symbol.name)
-        symbol.save()
+        parts[shard_of(symbol, shards)].append(symbol)
+    chord(evaluate_symbols.s(part) for part in parts if part)(log_evaluation.s())
+
 
 @shared_task
-def send_alerts() -> None:
-    """Send alert to users"""
+def send_alerts() -> dict | None:
+    """Send alert to users.
+
+    Alerts are evaluated on price changes by evaluate_symbols, this
+    periodic sweep over all alerts is a safety net. The resident alert
+    engine reconciles with the database on its own, so the sweep is
+    skipped while it is enabled.
+    """
     core_settings = CoreSettings.objects.get()
-    alerts = Alert.objects.filter(is_active=True)
-
-    def send_alert(alert, message) -> None:
-        alert_sended = False
-        if core_settings.send_alert_via_telegram:
-            if send_telegram_message(alert.user.telegram_id, message):
-                alert_sended = True
-        if core_settings.send_alert_via_email:
-            if alert.user.telegram_id == 'test' or send_mail(
-                emails=[alert.user.email], 
-                subject='Crypto alert!',
-                content=message,
-                ):
-                alert_sended = True
-        if alert_sended:
-            alert.is_active = False
-            alert.save()
-
-    for alert in alerts:
-        match alert.condition:
-            case 'above':
-                if alert.symbol.last_price > alert.price:
-                    send_alert(alert, f'{alert.symbol} is above {alert.price}')
-            case 'below':
-                if alert.symbol.last_price < alert.price:
-                    send_alert(alert, f'{alert.symbol} is below {alert.price}')
-            case 'cross':
-                if alert.symbol.last_price > alert.price:
-                    alert.condition = 'below'
-                    alert.save()
-                elif alert.symbol.last_price < alert.price:
-                    alert.condition = 'above'
-                    alert.save()
+    if core_settings.alert_engine:
+        return None
+    if core_settings.evaluation_shards > 1:
+        dispatch_evaluation(list(
+            Symbol.objects.filter(alert__is_active=True).values_list('name', flat=True).distinct()))
+        return None
+    return _evaluate_alerts(Alert.objects.all())
+
+
+@shared_task
+def evaluate_symbols(symbols: list[str]) -> dict:
+    """Send alerts of symbols to users"""
+    return _evaluate_alerts(Alert.objects.filter(symbol__name__in=symbols))
+
+
+@shared_task
+def log_evaluation(results: list[dict]) -> dict:
+    """Log summed counters of evaluation shards"""
+    total = {}
+    for result in results:
+        for key, value in result.items():
+            total[key] = total.get(key, 0) + value
+    total['shards'] = len(results)
+    logger.info('Alerts evaluated: %s', total)
+    return total
@@ -1,19 +1,131 @@
-from celery.utils.log import get_task_logger
-import telebot
+import asyncio
 import os
 
+import aiohttp
+from celery.utils.log import get_task_logger
+
+from core.event_loop import run
+from core.rate_limit import SharedTokenBucket
+
 logger = get_task_logger(__name__)
 
 TOKEN = os.environ.get('TELEGRAM_TOKEN', '')
-# You can set parse_mode by default. HTML or MARKDOWN
-bot = telebot.TeleBot(TOKEN, parse_mode=None)
-
-def send_message(user_id:str, message: str) -> bool:
-    if user_id == 'test':
-        return True
-    try:
-        bot.send_message(int(user_id), message)
-    except Exception as ex:
-        logger.error(ex)
+API_URL = 'https://api.telegram.org'
+# Bot API limits: about 30 messages per second in total and one message
+# per second to the same chat.
+GLOBAL_RATE = 30
+CHAT_RATE = 1
+MAX_IN_FLIGHT = 30
+MAX_RETRIES = 3
+REQUEST_TIMEOUT = 10
+# Per-chat buckets are dropped when there are more idle ones than this.
+MAX_CHAT_BUCKETS = 10000
+# Redis keys of the buckets shared by the dispatchers of all workers.
+GLOBAL_BUCKET_KEY = 'telegram:bucket'
+CHAT_BUCKET_KEY = 'telegram:bucket:{chat_id}'
+
+
+class TelegramDispatcher:
+    """Send bot messages concurrently within the Bot API rate limits.
+
+    Every message takes a token from its chat bucket and from the global
+    bucket. A 429 response pauses the global bucket for its retry_after
+    and the message is sent again. The buckets are kept in Redis, so the
+    limits hold for all workers sending at the same time. The dispatcher
+    has to be used from a single event loop.
+    """
+
+    def __init__(
+        self,
+        token: str = TOKEN,
+        api_url: str = API_URL,
+        global_rate: float = GLOBAL_RATE,
+        chat_rate: float = CHAT_RATE,
+        max_in_flight: int = MAX_IN_FLIGHT,
+        timeout: float = REQUEST_TIMEOUT,
+    ) -> None:
+        self.url = f'{api_url}/bot{token}/sendMessage'
+        self.chat_rate = chat_rate
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.global_bucket = SharedTokenBucket(GLOBAL_BUCKET_KEY, global_rate)
+        self.chat_buckets: dict[str, SharedTokenBucket] = {}
+        self._session: aiohttp.ClientSession | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_in_flight),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self._session
+
+    def _chat_bucket(self, chat_id: str) -> SharedTokenBucket:
+        if chat_id not in self.chat_buckets:
+            if len(self.chat_buckets) >= MAX_CHAT_BUCKETS:
+                self.chat_buckets = {
+                    key: bucket for key, bucket in self.chat_buckets.items() if not bucket.idle}
+            self.chat_buckets[chat_id] = SharedTokenBucket(CHAT_BUCKET_KEY.format(chat_id=chat_id), self.chat_rate, 1)
+        return self.chat_buckets[chat_id]
+
+    async def send(self, chat_id: str, text: str) -> bool:
+        """Send message to chat. Return True if it is delivered."""
+        if chat_id == 'test':
+            return True
+        session = self._get_session()
+        chat_bucket = self._chat_bucket(chat_id)
+        for _ in range(MAX_RETRIES + 1):
+            await chat_bucket.acquire()
+            await self.global_bucket.acquire()
+            try:
+                async with self._semaphore:
+                    async with session.post(self.url, json={'chat_id': chat_id, 'text': text}) as response:
+                        data = await response.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as ex:
+                logger.error(ex)
+                return False
+            if not isinstance(data, dict):
+                logger.error('Telegram %s: unexpected reply %r', response.status, data)
+                return False
+            if data.get('ok'):
+                return True
+            retry_after = data.get('parameters', {}).get('retry_after')
+            if response.status != 429 or retry_after is None:
+                logger.error('Telegram %s: %s', response.status, data.get('description'))
+                return False
+            logger.warning('Telegram asked to retry after %s sec.', retry_after)
+            self.global_bucket.pause(retry_after)
         return False
-    return True
+
+    async def send_many(self, messages: list[tuple[str, str]]) -> list[bool]:
+        """Send (chat id, text) messages concurrently."""
+        return list(await asyncio.gather(*(self.send(chat_id, text) for chat_id, text in messages)))
+
+    async def close(self) -> None:
+        """Close the connection pool."""
+        if self._session is not None:
+            await self._session.close()
+
+
+_dispatcher: TelegramDispatcher | None = None
+_pid: int | None = None
+
+
+def get_dispatcher() -> TelegramDispatcher:
+    """Return the dispatcher of this process, a forked child gets its own."""
+    global _dispatcher, _pid
+    if _pid != os.getpid():
+        _dispatcher = TelegramDispatcher()
+        _pid = os.getpid()
+    return _dispatcher
+
+
+def send_messages(messages: list[tuple[str, str]]) -> list[bool]:
+    """Send (user id, message) pairs, return which ones are delivered."""
+    return run(get_dispatcher().send_many(messages))
+
+
+def send_message(user_id: str, message: str) -> bool:
+    return send_messages([(user_id, message)])[0]
@@ -0,0 +1,25 @@
+"""
+Shared test helpers
+"""
+from unittest.mock import patch
+
+import fakeredis
+
+
+class FakeRedisMixin:
+    """Replace the shared Redis client with an in-memory one in every test.
+
+    The symbol registry is not loaded from the exchange, so every symbol
+    is known unless a test fills the registry.
+    """
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.redis = fakeredis.FakeRedis(decode_responses=True)
+        for target, kwargs in (
+            ('core.redis_client.get_redis', {'return_value': self.redis}),
+            ('core.symbol_registry.fetch_trading_symbols', {'return_value': set()}),
+        ):
+            patcher = patch(target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
@@ -3,6 +3,8 @@ from django.test import TestCase, Client
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
+from core.models import Notification
+
 
 class AdminSiteTests(TestCase):
     """Tests for Django admin."""
@@ -38,3 +40,16 @@ class AdminSiteTests(TestCase):
         url = reverse('admin:core_user_add')
         res = self.client.get(url)
         self.assertEqual(res.status_code, 200)
+
+    def test_notification_dead_letters(self):
+        """Test failed notifications are listed and can be retried."""
+        notification = Notification.objects.create(
+            user=self.user, channel='email', message='alert', status='failed', attempts=5)
+        url = reverse('admin:core_notification_changelist')
+
+        res = self.client.get(url, {'status__exact': 'failed'})
+        self.assertContains(res, 'failed (dead letter)')
+
+        self.client.post(url, {'action': 'retry_notifications', '_selected_action': [notification.id]})
+        notification.refresh_from_db()
+        self.assertEqual((notification.status, notification.attempts), ('pending', 0))
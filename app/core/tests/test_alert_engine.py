@@ -0,0 +1,197 @@
+"""
+Tests for the resident alert engine
+"""
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.db import OperationalError
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+
+from core import models, price_cache
+from core.alert_engine import AlertEngine
+from core.tests.mixins import FakeRedisMixin
+
+
+class AlertEngineTests(FakeRedisMixin, TestCase):
+    """Test resident alert engine."""
+
+    def setUp(self) -> None:
+        super().setUp()
+        models.CoreSettings.objects.create(alert_engine=True)
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123', telegram_id='test')
+        self.btc = models.Symbol.objects.create(name='BTCUSDT', last_price=Decimal('25000'))
+        self.now = 0.0
+        self.engine = AlertEngine(reconcile_interval=60, clock=lambda: self.now)
+        self.pubsub = self.engine.subscribe()
+
+    def create_alert(self, **params):
+        with self.captureOnCommitCallbacks(execute=True):
+            return models.Alert.objects.create(user=self.user, symbol=self.btc, **params)
+
+    def step_all(self) -> None:
+        """Handle published events."""
+        for _ in range(10):
+            self.engine.step(self.pubsub, timeout=0.01)
+
+    def test_load(self):
+        """Test active alerts are loaded once and triggered ones sent."""
+        waiting = models.Alert.objects.create(
+            user=self.user, symbol=self.btc, price=Decimal('30000'), condition='above')
+        triggered = models.Alert.objects.create(
+            user=self.user, symbol=self.btc, price=Decimal('20000'), condition='above')
+        models.Alert.objects.create(
+            user=self.user, symbol=self.btc, price=Decimal('1'), condition='above',
+            is_active=False)
+
+        self.engine.load()
+
+        self.assertEqual(len(self.engine.index), 1)
+        self.assertIn(waiting.id, self.engine.index)
+        triggered.refresh_from_db()
+        self.assertFalse(triggered.is_active)
+
+    def test_price_events(self):
+        """Test published price changes are evaluated without reloading alerts."""
+        alert = self.create_alert(price=Decimal('26000'), condition='above')
+        self.engine.load()
+        self.step_all()
+
+        price_cache.set_prices({'BTCUSDT': Decimal('26500')})
+        # the triggered alert is claimed and queued, active alerts are not reloaded
+        with self.assertNumQueries(5):
+            self.engine.step(self.pubsub, timeout=0.01)
+
+        alert.refresh_from_db()
+        self.assertFalse(alert.is_active)
+        self.assertNotIn(alert.id, self.engine.index)
+
+    def test_alert_events(self):
+        """Test created, changed and deleted alerts are applied."""
+        self.engine.load()
+
+        alert = self.create_alert(price=Decimal('26000'), condition='above')
+        self.step_all()
+        self.assertIn(alert.id, self.engine.index)
+
+        alert.price = Decimal('24000')
+        with self.captureOnCommitCallbacks(execute=True):
+            alert.save()
+        self.step_all()
+        alert.refresh_from_db()
+        self.assertFalse(alert.is_active)
+        self.assertNotIn(alert.id, self.engine.index)
+
+        alert = self.create_alert(price=Decimal('26000'), condition='above')
+        self.step_all()
+        with self.captureOnCommitCallbacks(execute=True):
+            alert.delete()
+        self.step_all()
+        self.assertEqual(len(self.engine.index), 0)
+
+    def test_new_symbol_waits_for_price(self):
+        """Test alerts of a symbol without a real price wait for its first price."""
+        self.engine.load()
+        eth = models.Symbol.objects.create(name='ETHUSDT')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            alert = models.Alert.objects.create(
+                user=self.user, symbol=eth, price=Decimal('1500'), condition='below')
+        self.step_all()
+        alert.refresh_from_db()
+        self.assertTrue(alert.is_active)
+        self.assertNotIn('ETHUSDT', self.engine.prices)
+
+        price_cache.set_prices({'ETHUSDT': Decimal('1400')})
+        self.step_all()
+        alert.refresh_from_db()
+        self.assertFalse(alert.is_active)
+
+    def test_cross_alert_is_flipped(self):
+        """Test flipped cross alert is saved and kept in the index."""
+        alert = self.create_alert(price=Decimal('26000'), condition='cross')
+        self.engine.load()
+        self.step_all()
+
+        alert.refresh_from_db()
+        self.assertEqual(alert.condition, 'above')
+        self.assertIn(alert.id, self.engine.index)
+
+    def test_reconcile(self):
+        """Test missed changes are picked up by the periodic reload."""
+        self.engine.load()
+        alert = models.Alert.objects.create(
+            user=self.user, symbol=self.btc, price=Decimal('26000'), condition='above')
+
+        self.engine.step(self.pubsub, timeout=0.01)
+        self.assertNotIn(alert.id, self.engine.index)
+
+        self.now += 60
+        self.engine.step(self.pubsub, timeout=0.01)
+        self.assertIn(alert.id, self.engine.index)
+
+    def test_disabled(self):
+        """Test alerts are not evaluated while the engine is disabled."""
+        models.CoreSettings.objects.update(alert_engine=False)
+        alert = self.create_alert(price=Decimal('20000'), condition='above')
+
+        self.engine.load()
+
+        alert.refresh_from_db()
+        self.assertTrue(alert.is_active)
+
+    def test_percent_change_alert(self):
+        """Test percent change alerts are evaluated on rolling windows."""
+        alert = self.create_alert(price=Decimal('2'), condition='rise', window=15)
+        self.engine.load()
+        self.step_all()
+
+        price_cache.set_prices({'BTCUSDT': Decimal('25000')})
+        self.step_all()
+        self.now += 60
+        price_cache.set_prices({'BTCUSDT': Decimal('25400')})
+        self.step_all()
+        alert.refresh_from_db()
+        self.assertTrue(alert.is_active)
+
+        self.now += 60
+        price_cache.set_prices({'BTCUSDT': Decimal('25600')})
+        self.step_all()
+        alert.refresh_from_db()
+        self.assertFalse(alert.is_active)
+        self.assertNotIn(alert.id, self.engine.changes)
+
+    @patch('core.rolling_window.HISTORY_SIZE', 2)
+    def test_reload_keeps_windows(self):
+        """Test windows longer than the price history survive reloads."""
+        alert = self.create_alert(price=Decimal('5'), condition='fall', window=1440)
+        self.engine.load()
+        self.step_all()
+
+        for price in ('25000', '24900', '24800', '24700'):
+            self.now += 1
+            price_cache.set_prices({'BTCUSDT': Decimal(price)})
+            self.step_all()
+        self.now += 60
+        self.step_all()
+        self.assertEqual(len(self.engine.changes.history['BTCUSDT']), 2)
+
+        price_cache.set_prices({'BTCUSDT': Decimal('23700')})
+        self.step_all()
+        alert.refresh_from_db()
+        self.assertFalse(alert.is_active)
+
+    def test_database_errors_are_retried(self):
+        """Test a failed reconcile is retried with backoff instead of stopping the engine."""
+        class Stop(Exception):
+            pass
+
+        with patch.object(self.engine, 'load', side_effect=[OperationalError, OperationalError, None]) as load, \
+                patch.object(self.engine, 'step', side_effect=Stop), \
+                patch('core.alert_engine.time.sleep') as sleep:
+            with self.assertRaises(Stop):
+                self.engine.run(min_backoff=1, max_backoff=60)
+
+        self.assertEqual(load.call_count, 3)
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [1, 2])
@@ -0,0 +1,157 @@
+"""
+Tests for the alert thresholds index
+"""
+import random
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+
+from core.alert_index import AlertIndex, scan_alerts
+
+
+def evaluate_loop(alerts, prices, ranges=None):
+    """Reference evaluation, one alert at a time."""
+    ranges = ranges or {}
+    triggered = []
+    flipped = {}
+    for alert_id, symbol, condition, price in alerts:
+        if symbol not in prices:
+            continue
+        last_price = prices[symbol]
+        low, high = ranges.get(symbol, (last_price, last_price))
+        match condition:
+            case 'above':
+                if max(high, last_price) > price:
+                    triggered.append(alert_id)
+            case 'below':
+                if min(low, last_price) < price:
+                    triggered.append(alert_id)
+            case 'cross':
+                if last_price > price:
+                    flipped[alert_id] = 'below'
+                elif last_price < price:
+                    flipped[alert_id] = 'above'
+    return triggered, flipped
+
+
+class AlertIndexTests(SimpleTestCase):
+    """Test alert thresholds index."""
+
+    def test_update(self):
+        """Test triggered alerts are found on both sides of the price."""
+        index = AlertIndex.from_alerts([
+            (1, 'BTCUSDT', 'above', Decimal('24000')),
+            (2, 'BTCUSDT', 'above', Decimal('25000')),
+            (3, 'BTCUSDT', 'above', Decimal('26000')),
+            (4, 'BTCUSDT', 'below', Decimal('24000')),
+            (5, 'BTCUSDT', 'below', Decimal('25000')),
+            (6, 'BTCUSDT', 'below', Decimal('26000')),
+            (7, 'ETHUSDT', 'above', Decimal('1000')),
+        ])
+
+        triggered, flipped = index.update('BTCUSDT', Decimal('25000'))
+
+        self.assertEqual(sorted(triggered), [1, 6])
+        self.assertEqual(flipped, {})
+
+    def test_cross_flips(self):
+        """Test cross alerts flip to the opposite side of the price."""
+        index = AlertIndex.from_alerts([
+            (1, 'BTCUSDT', 'cross', Decimal('26000')),
+            (2, 'BTCUSDT', 'cross', Decimal('24000')),
+            (3, 'BTCUSDT', 'cross', Decimal('25000')),
+        ])
+
+        triggered, flipped = index.update('BTCUSDT', Decimal('25000'))
+        self.assertEqual(triggered, [])
+        self.assertEqual(flipped, {1: 'above', 2: 'below'})
+
+        triggered, flipped = index.update('BTCUSDT', Decimal('27000'))
+        self.assertEqual(triggered, [1])
+        self.assertEqual(flipped, {3: 'below'})
+
+    def test_remove(self):
+        """Test removed alerts are not triggered."""
+        index = AlertIndex.from_alerts([
+            (1, 'BTCUSDT', 'above', Decimal('24000')),
+            (2, 'BTCUSDT', 'above', Decimal('24000')),
+            (3, 'BTCUSDT', 'cross', Decimal('24000')),
+        ])
+
+        index.remove(2)
+        index.remove(3)
+        index.remove(4)
+
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.update('BTCUSDT', Decimal('25000')), ([1], {}))
+
+    def test_parity_with_loop(self):
+        """Test index finds the same alerts as one-by-one evaluation."""
+        rnd = random.Random(42)
+        symbols = ['BTCUSDT', 'ETHUSDT', 'LTCBTC']
+        alerts = [
+            (i, rnd.choice(symbols), rnd.choice(['above', 'below', 'cross']),
+             Decimal(rnd.randint(90, 110)))
+            for i in range(500)
+        ]
+        prices = {symbol: Decimal(rnd.randint(90, 110)) for symbol in symbols[:2]}
+
+        triggered, flipped = AlertIndex.from_alerts(alerts).evaluate(prices)
+        expected_triggered, expected_flipped = evaluate_loop(alerts, prices)
+
+        self.assertEqual(sorted(triggered), sorted(expected_triggered))
+        self.assertEqual(flipped, expected_flipped)
+
+    def test_scan_matches_index(self):
+        """Test the linear scan finds the same alerts as the index."""
+        rnd = random.Random(11)
+        symbols = ['BTCUSDT', 'ETHUSDT', 'LTCBTC']
+        alerts = [
+            (i, rnd.choice(symbols), rnd.choice(['above', 'below', 'cross']),
+             Decimal(rnd.randint(90, 110)))
+            for i in range(500)
+        ]
+        prices = {symbol: Decimal(rnd.randint(95, 105)) for symbol in symbols[:2]}
+        ranges = {'BTCUSDT': (Decimal(92), Decimal(108))}
+
+        triggered, flipped = scan_alerts(alerts, prices, ranges)
+        expected_triggered, expected_flipped = AlertIndex.from_alerts(alerts).evaluate(prices, ranges)
+
+        self.assertEqual(sorted(triggered), sorted(expected_triggered))
+        self.assertEqual(flipped, expected_flipped)
+
+    def test_from_alerts_matches_adds(self):
+        """Test a bulk built index keeps working with removes and adds."""
+        rnd = random.Random(7)
+        alerts = [
+            (i, 'BTCUSDT', rnd.choice(['above', 'below', 'cross']), Decimal(rnd.randint(90, 110)))
+            for i in range(300)
+        ]
+        index = AlertIndex.from_alerts(alerts)
+        for alert_id in range(0, 300, 3):
+            index.remove(alert_id)
+        index.add(1000, 'BTCUSDT', 'above', Decimal('95'))
+        kept = [alert for alert in alerts if alert[0] % 3] + [(1000, 'BTCUSDT', 'above', Decimal('95'))]
+
+        triggered, flipped = index.evaluate({'BTCUSDT': Decimal('100')})
+        expected_triggered, expected_flipped = evaluate_loop(kept, {'BTCUSDT': Decimal('100')})
+
+        self.assertEqual(sorted(triggered), sorted(expected_triggered))
+        self.assertEqual(flipped, expected_flipped)
+
+    def test_price_range(self):
+        """Test a spike between updates triggers alerts inside the range."""
+        index = AlertIndex.from_alerts([
+            (1, 'BTCUSDT', 'above', Decimal('26000')),
+            (2, 'BTCUSDT', 'below', Decimal('24000')),
+            (3, 'BTCUSDT', 'above', Decimal('27000')),
+            (4, 'BTCUSDT', 'cross', Decimal('25500')),
+        ])
+
+        triggered, flipped = index.evaluate(
+            {'BTCUSDT': Decimal('25000')},
+            {'BTCUSDT': (Decimal('23500'), Decimal('26500'))},
+        )
+
+        self.assertEqual(sorted(triggered), [1, 2])
+        self.assertEqual(flipped, {4: 'above'})
@@ -0,0 +1,121 @@
+"""
+Tests for vectorized alert evaluation
+"""
+import random
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+
+from core import models
+from core.alert_vector import VectorAlertBook, scaled_expression
+from core.tests.test_alert_index import evaluate_loop
+
+
+class VectorAlertBookTests(SimpleTestCase):
+    """Test vectorized alert evaluation matches one-by-one evaluation."""
+
+    def assert_parity(self, alerts, prices, ranges=None):
+        triggered, flipped = VectorAlertBook.from_alerts(alerts).evaluate(prices, ranges)
+        expected_triggered, expected_flipped = evaluate_loop(alerts, prices, ranges)
+
+        self.assertEqual(sorted(triggered), sorted(expected_triggered))
+        self.assertEqual(flipped, expected_flipped)
+
+    def test_conditions(self):
+        """Test every condition on both sides of and at the price."""
+        alerts = []
+        for i, condition in enumerate(['above', 'below', 'cross']):
+            for j, price in enumerate(['24999.99999999', '25000', '25000.00000001']):
+                alerts.append((i * 3 + j, 'BTCUSDT', condition, Decimal(price)))
+
+        self.assert_parity(alerts, {'BTCUSDT': Decimal('25000')})
+
+    def test_precise_last_price(self):
+        """Test comparisons stay exact for prices with extra decimal places."""
+        alerts = [
+            (1, 'BTCUSDT', 'above', Decimal('1.00000001')),
+            (2, 'BTCUSDT', 'below', Decimal('1.00000001')),
+            (3, 'BTCUSDT', 'above', Decimal('1.00000000')),
+            (4, 'BTCUSDT', 'cross', Decimal('1.00000000')),
+            (5, 'BTCUSDT', 'cross', Decimal('1.00000001')),
+        ]
+
+        self.assert_parity(alerts, {'BTCUSDT': Decimal('1.000000005')})
+
+    def test_symbols_without_price(self):
+        """Test alerts of symbols without a price are not evaluated."""
+        alerts = [
+            (1, 'BTCUSDT', 'above', Decimal('0')),
+            (2, 'ETHUSDT', 'below', Decimal('1600')),
+        ]
+
+        self.assert_parity(alerts, {'ETHUSDT': Decimal('1500'), 'LTCBTC': Decimal('1')})
+
+    def test_random_books(self):
+        """Test parity on random alert books."""
+        rnd = random.Random(7)
+        symbols = [f'SYM{i}USDT' for i in range(20)]
+        for _ in range(20):
+            alerts = [
+                (i, rnd.choice(symbols), rnd.choice(['above', 'below', 'cross']),
+                 Decimal(rnd.randint(9_000_000, 11_000_000)).scaleb(-8))
+                for i in range(2000)
+            ]
+            prices = {
+                symbol: Decimal(rnd.randint(9_000_000, 11_000_000)).scaleb(-8)
+                for symbol in rnd.sample(symbols, 15)
+            }
+
+            self.assert_parity(alerts, prices)
+
+    def test_empty_book(self):
+        """Test empty book evaluates to nothing."""
+        self.assertEqual(VectorAlertBook.from_alerts([]).evaluate({'BTCUSDT': Decimal('1')}), ([], {}))
+
+    def test_price_ranges(self):
+        """Test parity when low and high prices are known."""
+        rnd = random.Random(11)
+        symbols = [f'SYM{i}USDT' for i in range(20)]
+        alerts = [
+            (i, rnd.choice(symbols), rnd.choice(['above', 'below', 'cross']),
+             Decimal(rnd.randint(9_000_000, 11_000_000)).scaleb(-8))
+            for i in range(2000)
+        ]
+        prices = {}
+        ranges = {}
+        for symbol in rnd.sample(symbols, 15):
+            low, last, high = sorted(rnd.randint(9_000_000, 11_000_000) for _ in range(3))
+            prices[symbol] = Decimal(last).scaleb(-8)
+            if rnd.random() < 0.8:
+                ranges[symbol] = (Decimal(low).scaleb(-9), Decimal(high).scaleb(-8))
+
+        self.assert_parity(alerts, prices, ranges)
+
+
+class ScaledColumnsTests(TestCase):
+    """Test books built from prices scaled by the database."""
+
+    def test_from_columns(self):
+        """Test database scaled prices are exact and match a book built from decimals."""
+        user = get_user_model().objects.create_user(email='user@example.com', password='testpass123')
+        symbol = models.Symbol.objects.create(name='BTCUSDT')
+        prices = ['0.1', '0.00000001', '24999.99999999', '25000', '9999999.99999999']
+        for condition in ('above', 'below', 'cross', 'rise'):
+            for price in prices:
+                models.Alert.objects.create(
+                    user=user, symbol=symbol, condition=condition, price=Decimal(price), window=5)
+        alerts = models.Alert.objects.order_by('id')
+
+        columns = zip(*alerts.annotate(scaled_price=scaled_expression('price')).values_list(
+            'id', 'symbol__name', 'condition', 'scaled_price'))
+        book = VectorAlertBook.from_columns(*columns)
+        expected = VectorAlertBook.from_alerts(alerts.values_list('id', 'symbol__name', 'condition', 'price'))
+
+        self.assertEqual(len(book), 15)
+        self.assertEqual(book.prices.tolist(), expected.prices.tolist())
+        self.assertEqual(book.ids.tolist(), expected.ids.tolist())
+        self.assertEqual(
+            book.evaluate({'BTCUSDT': Decimal('25000')}),
+            expected.evaluate({'BTCUSDT': Decimal('25000')}),
+        )
@@ -0,0 +1,254 @@
+"""
+Tests for binance api helpers
+"""
+import asyncio
+from unittest.mock import AsyncMock, patch
+from decimal import Decimal
+
+import redis
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from django.test import SimpleTestCase
+
+from core import binance_api
+from core.tests.mixins import FakeRedisMixin
+
+
+class BinanceApiTests(SimpleTestCase):
+    """Test binance api helpers."""
+
+    async def test_get_last_prices_batched(self):
+        """Test prices are fetched with one request per chunk."""
+        symbols = [f'SYM{i}USDT' for i in range(binance_api.BATCH_SIZE + 1)]
+        client = AsyncMock()
+        client.ticker_price.side_effect = lambda symbols: [
+            {'symbol': symbol, 'price': '1.5'} for symbol in symbols
+        ]
+
+        prices = await binance_api.get_last_prices(client, symbols)
+
+        self.assertEqual(client.ticker_price.call_count, 2)
+        self.assertEqual(len(prices), len(symbols))
+        self.assertEqual(prices['SYM0USDT'], Decimal('1.5'))
+
+    async def test_get_last_prices_fallback(self):
+        """Test a failed batch falls back to per-symbol requests."""
+        def ticker_price(symbol=None, symbols=None):
+            if symbols is not None or symbol == 'BADSYMBOL':
+                raise binance_api.BinanceAPIError(400, -1121, 'Invalid symbol.')
+            return {'symbol': symbol, 'price': '25000'}
+
+        client = AsyncMock()
+        client.ticker_price.side_effect = ticker_price
+
+        invalid = set()
+        prices = await binance_api.get_last_prices(client, ['BTCUSDT', 'BADSYMBOL'], invalid)
+
+        self.assertEqual(prices, {'BTCUSDT': Decimal('25000')})
+        self.assertEqual(invalid, {'BADSYMBOL'})
+
+    async def test_get_price_ranges_fallback(self):
+        """Test a failed range batch falls back to per-symbol requests."""
+        def ticker(symbol=None, symbols=None, window_size='1m'):
+            if symbols is not None or symbol == 'BADSYMBOL':
+                raise binance_api.BinanceAPIError(400, -1121, 'Invalid symbol.')
+            return {'symbol': symbol, 'lastPrice': '1.5', 'lowPrice': '1.2', 'highPrice': '1.9'}
+
+        client = AsyncMock()
+        client.ticker.side_effect = ticker
+
+        invalid = set()
+        ranges = await binance_api.get_price_ranges(client, ['BTCUSDT', 'BADSYMBOL'], invalid)
+
+        self.assertEqual(ranges, {'BTCUSDT': (Decimal('1.5'), Decimal('1.2'), Decimal('1.9'))})
+        self.assertEqual(invalid, {'BADSYMBOL'})
+
+    async def test_get_price_ranges(self):
+        """Test last, low and high prices are fetched in batches."""
+        symbols = [f'SYM{i}USDT' for i in range(binance_api.BATCH_SIZE + 1)]
+        client = AsyncMock()
+        client.ticker.side_effect = lambda symbols, window_size: [
+            {'symbol': symbol, 'lastPrice': '1.5', 'lowPrice': '1.2', 'highPrice': '1.9'}
+            for symbol in symbols
+        ]
+
+        ranges = await binance_api.get_price_ranges(client, symbols, window_size='5m')
+
+        self.assertEqual(client.ticker.call_count, 2)
+        self.assertEqual(client.ticker.call_args.kwargs['window_size'], '5m')
+        self.assertEqual(len(ranges), len(symbols))
+        self.assertEqual(ranges['SYM0USDT'], (Decimal('1.5'), Decimal('1.2'), Decimal('1.9')))
+
+    def test_range_window(self):
+        """Test the range window covers the time since the last poll."""
+        for seconds, window_size in ((0, '1m'), (60, '1m'), (61, '2m'), (300, '5m'), (86400, '59m')):
+            self.assertEqual(binance_api.range_window(seconds), window_size)
+
+
+class RequestWeightTrackerTests(FakeRedisMixin, SimpleTestCase):
+    """Test request weight tracking."""
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.now = 120.0
+        self.tracker = binance_api.RequestWeightTracker(
+            limit=100, budget=0.5, clock=lambda: self.now)
+
+    async def test_acquire_within_budget(self):
+        """Test weight is reserved while it fits into the budget."""
+        for _ in range(5):
+            await self.tracker.acquire(10)
+
+        self.assertEqual(self.tracker.usage()['used'], 50)
+
+    async def test_acquire_waits_for_next_minute(self):
+        """Test request waits for the next minute when budget is spent."""
+        self.now = 150.0
+        await self.tracker.acquire(50)
+
+        async def sleep(seconds):
+            self.assertEqual(seconds, 30)
+            self.now += seconds
+
+        with patch('core.binance_api.asyncio.sleep', side_effect=sleep):
+            await self.tracker.acquire(10)
+
+        self.assertEqual(self.tracker.usage()['used'], 10)
+
+    async def test_used_weight_from_headers(self):
+        """Test used weight reported by the exchange is taken into account."""
+        await self.tracker.acquire(10)
+        self.tracker.update({binance_api.WEIGHT_HEADER: '45'})
+
+        self.assertEqual(self.tracker.usage()['used'], 45)
+
+    async def test_pause(self):
+        """Test requests are refused while paused."""
+        self.tracker.pause(30)
+
+        with self.assertRaises(binance_api.RateLimitError) as cm:
+            await self.tracker.acquire(1)
+        self.assertEqual(cm.exception.retry_after, 30)
+
+        self.now += 30
+        await self.tracker.acquire(1)
+
+    async def test_shared_between_processes(self):
+        """Test used weight and pause are shared through Redis."""
+        other = binance_api.RequestWeightTracker(limit=100, budget=0.5, clock=lambda: self.now)
+        await self.tracker.acquire(40)
+
+        async def sleep(seconds):
+            self.now += seconds
+
+        with patch('core.binance_api.asyncio.sleep', side_effect=sleep) as patched_sleep:
+            await other.acquire(20)
+        patched_sleep.assert_called_once_with(60)
+
+        self.tracker.pause(30)
+        with self.assertRaises(binance_api.RateLimitError):
+            await other.acquire(1)
+        self.assertGreater(other.usage()['paused_for'], 0)
+
+    async def test_without_redis(self):
+        """Test weight is tracked locally when Redis is unavailable."""
+        with patch('core.redis_client.get_redis', side_effect=redis.ConnectionError):
+            await self.tracker.acquire(10)
+            self.tracker.pause(30)
+
+            self.assertEqual(self.tracker.usage()['used'], 10)
+            with self.assertRaises(binance_api.RateLimitError):
+                await self.tracker.acquire(1)
+
+
+class AsyncSpotTests(FakeRedisMixin, SimpleTestCase):
+    """Test async client against a local stand-in server."""
+
+    async def start(self) -> None:
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.delay = 0.05
+        app = web.Application()
+        app.router.add_get('/api/v3/ticker/price', self.ticker_price)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.client = binance_api.AsyncSpot(
+            base_url=str(self.server.make_url('')).rstrip('/'),
+            timeout=1,
+            max_in_flight=3,
+        )
+
+    async def stop(self) -> None:
+        await self.client.close()
+        await self.server.close()
+
+    async def ticker_price(self, request):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        symbol = request.query['symbol']
+        if symbol == 'LIMITED':
+            return web.json_response({}, status=429, headers={'Retry-After': '30'})
+        if symbol == 'BADSYMBOL':
+            return web.json_response({'code': -1121, 'msg': 'Invalid symbol.'}, status=400)
+        return web.json_response(
+            {'symbol': symbol, 'price': '1.00000000'},
+            headers={binance_api.WEIGHT_HEADER: '42'},
+        )
+
+    async def run_test(self, test):
+        await self.start()
+        try:
+            await test()
+        finally:
+            await self.stop()
+
+    async def test_requests_are_bounded(self):
+        """Test requests run concurrently up to the in-flight limit."""
+        async def test():
+            results = await asyncio.gather(*(
+                self.client.ticker_price(f'SYM{i}USDT') for i in range(9)))
+            self.assertEqual(len(results), 9)
+            self.assertEqual(self.max_in_flight, 3)
+
+        await self.run_test(test)
+
+    async def test_request_error(self):
+        """Test error response raises BinanceAPIError."""
+        async def test():
+            with self.assertRaises(binance_api.BinanceAPIError) as cm:
+                await self.client.ticker_price('BADSYMBOL')
+            self.assertEqual(cm.exception.code, -1121)
+
+        await self.run_test(test)
+
+    async def test_request_timeout(self):
+        """Test slow response is cut by timeout."""
+        async def test():
+            self.delay = 2
+            with self.assertRaises(asyncio.TimeoutError):
+                await self.client.ticker_price('BTCUSDT')
+
+        await self.run_test(test)
+
+    async def test_used_weight(self):
+        """Test used weight is taken from response headers."""
+        async def test():
+            await self.client.ticker_price('BTCUSDT')
+            self.assertEqual(self.client.weights.usage()['used'], 42)
+
+        await self.run_test(test)
+
+    async def test_rate_limited(self):
+        """Test 429 response pauses the client."""
+        async def test():
+            with self.assertRaises(binance_api.RateLimitError):
+                await self.client.ticker_price('LIMITED')
+            self.assertGreater(self.client.weights.usage()['paused_for'], 0)
+            with self.assertRaises(binance_api.RateLimitError):
+                await self.client.ticker_price('BTCUSDT')
+
+        await self.run_test(test)
@@ -0,0 +1,119 @@
+"""
+Tests for notification channels
+"""
+import time
+from decimal import Decimal
+from unittest.mock import patch, MagicMock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from core import models, channels
+from core.tasks import send_triggered_alerts, send_notifications, dispatch_notifications
+from core.tests.mixins import FakeRedisMixin
+
+
+class FakeChannel(channels.Channel):
+    name = 'fake'
+    setting = 'send_alert_via_email'
+
+    def __init__(self) -> None:
+        self.sent = []
+
+    def accepts(self, user) -> bool:
+        return user.name == 'fake'
+
+    def send(self, messages):
+        self.sent.extend((user.email, message) for user, message in messages)
+        return [True] * len(messages)
+
+
+class ChannelsTests(FakeRedisMixin, TestCase):
+    """Test notification channels."""
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.core_settings = models.CoreSettings.objects.create(send_alert_via_telegram=False)
+
+    def register(self, channel: channels.Channel) -> channels.Channel:
+        channels.register(channel)
+        self.addCleanup(channels.CHANNELS.pop, channel.name)
+        return channel
+
+    def test_enabled_channels(self):
+        """Test channels are enabled by core settings."""
+        self.assertEqual([channel.name for channel in channels.enabled_channels(self.core_settings)], ['email', 'webhook'])
+
+    def test_incomplete_channel(self):
+        """Test a channel without send() can not be registered."""
+        class IncompleteChannel(channels.Channel):
+            name = 'incomplete'
+
+        with self.assertRaises(TypeError):
+            channels.register(IncompleteChannel())
+        self.assertNotIn('incomplete', channels.CHANNELS)
+
+    def test_custom_channel(self):
+        """Test a registered channel gets notifications of the users it accepts."""
+        fake = self.register(FakeChannel())
+        symbol = models.Symbol.objects.create(name='BTCUSDT', last_price=Decimal('25000'))
+        for name in ('fake', 'other'):
+            models.Alert.objects.create(
+                user=get_user_model().objects.create_user(email=f'{name}@example.com', name=name),
+                symbol=symbol, price=Decimal('24000'), condition='above')
+
+        send_triggered_alerts(list(models.Alert.objects.values_list('id', flat=True)), {})
+        with patch('core.channels.send_mail', return_value=True):
+            self.assertEqual(send_notifications('email'), 2)
+        self.assertEqual(send_notifications('fake'), 1)
+
+        self.assertEqual(fake.sent, [('fake@example.com', 'BTCUSDT is above 24000.00000000')])
+
+    @patch('core.channels.send_webhooks', return_value=[True])
+    def test_webhook_channel(self, patched_send):
+        """Test webhooks are sent to users with an endpoint and a secret."""
+        models.CoreSettings.objects.update(send_alert_via_email=False)
+        symbol = models.Symbol.objects.create(name='BTCUSDT', last_price=Decimal('25000'))
+        for i, (url, secret) in enumerate([
+            ('https://example.com/hook', 'secret'), ('', 'secret'), ('https://example.com/other', ''),
+        ]):
+            models.Alert.objects.create(
+                user=get_user_model().objects.create_user(
+                    email=f'user{i}@example.com', webhook_url=url, webhook_secret=secret),
+                symbol=symbol, price=Decimal('24000'), condition='above')
+
+        send_triggered_alerts(list(models.Alert.objects.values_list('id', flat=True)), {})
+
+        self.assertEqual(send_notifications('webhook'), 1)
+        patched_send.assert_called_once_with(
+            [('https://example.com/hook', 'secret', 'BTCUSDT is above 24000.00000000')])
+
+    @patch('core.tasks.send_notifications.delay')
+    def test_dispatch_notifications(self, patched_delay):
+        """Test a dispatcher is started for every channel."""
+        self.register(FakeChannel())
+
+        dispatch_notifications()
+
+        self.assertEqual(
+            [call.args for call in patched_delay.call_args_list],
+            [('telegram',), ('email',), ('webhook',), ('fake',)],
+        )
+
+    @patch('core.channels.get_pool', return_value=MagicMock(size=4))
+    def test_emails_are_sent_concurrently(self, patched_pool):
+        """Test e-mails use the pooled connections at the same time."""
+        def send_mail(emails, subject, content):
+            time.sleep(0.05)
+            return emails[0] != 'user0@example.com'
+
+        users = [models.User(email=f'user{i}@example.com') for i in range(8)]
+
+        with patch('core.channels.send_mail', side_effect=send_mail):
+            start = time.perf_counter()
+            results = channels.get_channel('email').send([(user, 'alert') for user in users])
+            elapsed = time.perf_counter() - start
+
+        self.assertEqual(results, [False] + [True] * 7)
+        # one by one they would take 0.4 sec
+        self.assertLess(elapsed, 0.3)
@@ -84,4 +84,28 @@ class ModelTests(TestCase):
             name='BTCUSDT',
         )
 
-        self.assertEqual(str(symbol), symbol.name)
\ No newline at end of file
+        self.assertEqual(str(symbol), symbol.name)
+
+    def test_update_last_prices(self):
+        """Test only changed last prices are saved."""
+        symbol = models.Symbol.objects.create(
+            name='BTCUSDT', last_price=Decimal('25000'))
+        symbol2 = models.Symbol.objects.create(
+            name='ETHUSDT', last_price=Decimal('1600'))
+
+        with self.assertNumQueries(1):
+            changed = models.Symbol.objects.update_last_prices({
+                'BTCUSDT': Decimal('25000.00000000'),
+                'ETHUSDT': Decimal('1600'),
+            })
+        self.assertEqual(changed, [])
+
+        changed = models.Symbol.objects.update_last_prices({
+            'BTCUSDT': Decimal('25100'),
+            'ETHUSDT': Decimal('1600'),
+        })
+        self.assertEqual(changed, ['BTCUSDT'])
+        symbol.refresh_from_db()
+        symbol2.refresh_from_db()
+        self.assertEqual(symbol.last_price, Decimal('25100'))
+        self.assertEqual(symbol2.last_price, Decimal('1600'))
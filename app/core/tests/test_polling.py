@@ -0,0 +1,128 @@
+"""
+Tests for the adaptive polling schedule
+"""
+from unittest.mock import patch
+from decimal import Decimal
+
+import redis
+from django.test import TestCase, SimpleTestCase
+from django.contrib.auth import get_user_model
+
+from core import models, polling, price_cache
+from core.tasks import poll_due_prices
+from core.tests.mixins import FakeRedisMixin
+
+
+class PollingIntervalTests(SimpleTestCase):
+    """Test polling interval calculation."""
+
+    def test_close_symbol_polled_often(self):
+        """Test symbols near a threshold are polled more often than far ones."""
+        price = Decimal('25000')
+        close = polling.next_interval(price, [Decimal('25050')], polling.DEFAULT_VARIANCE)
+        far = polling.next_interval(price, [Decimal('30000')], polling.DEFAULT_VARIANCE)
+
+        self.assertEqual(close, polling.MIN_INTERVAL)
+        self.assertEqual(far, polling.MAX_INTERVAL)
+
+    def test_nearest_threshold_is_used(self):
+        """Test interval depends on the nearest threshold."""
+        price = Decimal('25000')
+        one = polling.next_interval(price, [Decimal('25250')], polling.DEFAULT_VARIANCE)
+        many = polling.next_interval(
+            price, [Decimal('10000'), Decimal('24750'), Decimal('40000')], polling.DEFAULT_VARIANCE)
+
+        self.assertEqual(one, many)
+        self.assertGreater(one, polling.MIN_INTERVAL)
+        self.assertLess(one, polling.MAX_INTERVAL)
+
+    def test_volatile_symbol_polled_often(self):
+        """Test higher volatility shortens the interval."""
+        price = Decimal('25000')
+        variance = polling.update_variance(
+            polling.DEFAULT_VARIANCE, Decimal('24000'), 0, price, 10)
+
+        self.assertGreater(variance, polling.DEFAULT_VARIANCE)
+        self.assertLess(
+            polling.next_interval(price, [Decimal('26000')], variance),
+            polling.next_interval(price, [Decimal('26000')], polling.DEFAULT_VARIANCE),
+        )
+
+    def test_no_thresholds(self):
+        """Test symbol without thresholds is polled rarely."""
+        self.assertEqual(
+            polling.next_interval(Decimal('1'), [], polling.DEFAULT_VARIANCE),
+            polling.MAX_INTERVAL,
+        )
+
+
+class PollingScheduleTests(FakeRedisMixin, TestCase):
+    """Test polling schedule."""
+
+    def setUp(self) -> None:
+        super().setUp()
+        models.CoreSettings.objects.create(adaptive_polling=True)
+
+    def test_schedule(self):
+        """Test polled symbols are due again after their interval."""
+        self.assertEqual(polling.get_due(['BTCUSDT', 'ETHUSDT'], now=0), ['BTCUSDT', 'ETHUSDT'])
+
+        intervals = polling.schedule(
+            {'BTCUSDT': Decimal('25000'), 'ETHUSDT': Decimal('1600')},
+            {'BTCUSDT': [Decimal('25010')]},
+            now=0,
+        )
+
+        self.assertEqual(intervals['BTCUSDT'], polling.MIN_INTERVAL)
+        self.assertEqual(intervals['ETHUSDT'], polling.MAX_INTERVAL)
+        self.assertEqual(polling.get_due(['BTCUSDT', 'ETHUSDT'], now=1), [])
+        self.assertEqual(polling.get_due(['BTCUSDT', 'ETHUSDT'], now=polling.MIN_INTERVAL), ['BTCUSDT'])
+
+    def test_unwatched_symbols_unscheduled(self):
+        """Test symbols which are not watched anymore are dropped."""
+        polling.schedule({'BTCUSDT': Decimal('25000')}, {}, now=0)
+
+        polling.get_due([], now=1)
+
+        self.assertEqual(self.redis.zcard(polling.DUE_KEY), 0)
+        self.assertEqual(self.redis.hlen(polling.STATE_KEY), 0)
+
+    def test_alert_change_reschedules_symbol(self):
+        """Test a symbol is due right after its alerts change."""
+        user = get_user_model().objects.create_user(email='user@example.com', password='testpass123')
+        symbol = models.Symbol.objects.create(name='BTCUSDT')
+        polling.schedule({'BTCUSDT': Decimal('25000'), 'ETHUSDT': Decimal('1600')}, {}, now=0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            models.Alert.objects.create(user=user, symbol=symbol, price=Decimal('25010'), condition='above')
+
+        self.assertEqual(polling.get_due(['BTCUSDT', 'ETHUSDT'], now=1), ['BTCUSDT'])
+        self.assertEqual(self.redis.hlen(polling.STATE_KEY), 2)
+
+    def test_redis_errors(self):
+        """Test all symbols are due when Redis is unavailable."""
+        with patch.object(self.redis, 'zrange', side_effect=redis.ConnectionError), \
+                patch.object(self.redis, 'hmget', side_effect=redis.ConnectionError):
+            self.assertEqual(polling.get_due(['BTCUSDT', 'ETHUSDT'], now=0), ['BTCUSDT', 'ETHUSDT'])
+            self.assertEqual(polling.schedule({'BTCUSDT': Decimal('25000')}, {}, now=0), {})
+
+    @patch('core.tasks.evaluate_symbols.delay')
+    @patch('core.tasks.fetch_last_prices')
+    def test_poll_due_prices(self, patched_fetch, patched_evaluate):
+        """Test task fetches only due symbols."""
+        user = get_user_model().objects.create_user(email='user@example.com', password='testpass123')
+        for name in ('BTCUSDT', 'ETHUSDT'):
+            models.Alert.objects.create(
+                user=user,
+                symbol=models.Symbol.objects.create(name=name),
+                price=Decimal('30000'),
+                condition='above',
+            )
+        polling.schedule({'ETHUSDT': Decimal('1600')}, {})
+        patched_fetch.return_value = {'BTCUSDT': Decimal('25000')}
+
+        poll_due_prices()
+
+        patched_fetch.assert_called_once_with(['BTCUSDT'], set())
+        self.assertEqual(price_cache.get_prices(), {'BTCUSDT': Decimal('25000')})
+        self.assertEqual(polling.get_due(['BTCUSDT', 'ETHUSDT']), [])
@@ -0,0 +1,115 @@
+"""
+Tests for the latest prices cache
+"""
+import time
+from unittest.mock import patch
+from decimal import Decimal
+
+import redis
+from django.test import TestCase
+
+from core import models, price_cache
+from core.tests.mixins import FakeRedisMixin
+
+
+class PriceCacheTests(FakeRedisMixin, TestCase):
+    """Test latest prices cache."""
+
+    def setUp(self) -> None:
+        super().setUp()
+
+    def test_set_and_get_prices(self):
+        """Test prices are kept in one hash with update time."""
+        price_cache.set_prices({'BTCUSDT': Decimal('25000.1'), 'ETHUSDT': Decimal('1600')})
+
+        self.assertEqual(self.redis.hlen(price_cache.PRICES_KEY), 2)
+        self.assertEqual(price_cache.get_prices(), {
+            'BTCUSDT': Decimal('25000.1'),
+            'ETHUSDT': Decimal('1600'),
+        })
+        self.assertEqual(
+            price_cache.get_prices(['BTCUSDT', 'LTCBTC']),
+            {'BTCUSDT': Decimal('25000.1')},
+        )
+
+    def test_set_prices_returns_changed(self):
+        """Test names of symbols with new prices are returned."""
+        price_cache.set_prices({'BTCUSDT': Decimal('25000')})
+
+        changed = price_cache.set_prices({
+            'BTCUSDT': Decimal('25000.00000000'),
+            'ETHUSDT': Decimal('1600'),
+        })
+
+        self.assertEqual(changed, ['ETHUSDT'])
+
+    def test_current_prices(self):
+        """Test cached prices replace saved ones and unknown prices are left out."""
+        price_cache.set_prices({'BTCUSDT': Decimal('25000')})
+
+        self.assertEqual(
+            price_cache.current_prices({'BTCUSDT': Decimal('24000'), 'BTCUSTD': Decimal('0')}),
+            {'BTCUSDT': Decimal('25000')},
+        )
+
+    def test_get_prices_max_age(self):
+        """Test stale prices are skipped."""
+        price_cache.set_prices({'BTCUSDT': Decimal('25000')}, timestamp=time.time() - 120)
+        price_cache.set_prices({'ETHUSDT': Decimal('1600')})
+
+        self.assertEqual(price_cache.get_prices(max_age=60), {'ETHUSDT': Decimal('1600')})
+
+    def test_save_prices_without_cache(self):
+        """Test prices are saved to the database if cache is unavailable."""
+        symbol = models.Symbol.objects.create(name='BTCUSDT')
+        with patch.object(self.redis, 'hset', side_effect=redis.ConnectionError):
+            price_cache.save_prices({'BTCUSDT': Decimal('25000')})
+
+        symbol.refresh_from_db()
+        self.assertEqual(symbol.last_price, Decimal('25000'))
+
+    def test_flush_prices(self):
+        """Test cached prices are flushed to the database."""
+        symbol = models.Symbol.objects.create(name='BTCUSDT')
+        price_cache.save_prices({'BTCUSDT': Decimal('25000')})
+        symbol.refresh_from_db()
+        self.assertEqual(symbol.last_price, Decimal('0'))
+
+        self.assertEqual(price_cache.flush_prices(), ['BTCUSDT'])
+        symbol.refresh_from_db()
+        self.assertEqual(symbol.last_price, Decimal('25000'))
+
+    def test_price_ranges(self):
+        """Test ranges are cached and symbols moved within them are changed."""
+        price_cache.set_prices({'BTCUSDT': Decimal('25000'), 'ETHUSDT': Decimal('1600')})
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(price_cache.PRICES_CHANNEL)
+
+        changed = price_cache.set_prices(
+            {'BTCUSDT': Decimal('25000'), 'ETHUSDT': Decimal('1600')},
+            ranges={
+                'BTCUSDT': (Decimal('24900'), Decimal('26100')),
+                'ETHUSDT': (Decimal('1600'), Decimal('1600')),
+            },
+        )
+
+        self.assertEqual(changed, ['BTCUSDT'])
+        self.assertEqual(price_cache.get_ranges(['BTCUSDT', 'LTCBTC']), {
+            'BTCUSDT': (Decimal('24900'), Decimal('26100')),
+        })
+        # the first message read is the ignored subscribe confirmation
+        message = pubsub.get_message(timeout=1) or pubsub.get_message(timeout=1)
+        self.assertEqual(price_cache.parse_prices(message['data']), (
+            {'BTCUSDT': Decimal('25000')},
+            {'BTCUSDT': (Decimal('24900'), Decimal('26100'))},
+        ))
+
+    def test_get_ranges_max_age(self):
+        """Test stale ranges are skipped."""
+        price_cache.set_prices(
+            {'BTCUSDT': Decimal('25000')},
+            timestamp=time.time() - price_cache.RANGE_MAX_AGE - 1,
+            ranges={'BTCUSDT': (Decimal('24900'), Decimal('26100'))},
+        )
+
+        self.assertEqual(price_cache.get_ranges(['BTCUSDT']), {})
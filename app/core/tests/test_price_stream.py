@@ -0,0 +1,178 @@
+"""
+Tests for price streaming against a local stand-in WebSocket server
+"""
+import asyncio
+import json
+from unittest.mock import patch, AsyncMock, MagicMock
+from decimal import Decimal
+
+from aiohttp import web, WSMsgType
+from aiohttp.test_utils import TestServer
+from django.test import SimpleTestCase
+
+from core.price_stream import PriceStream, StreamConnection
+
+
+class StandInServer:
+    """Local stand-in for the exchange combined stream endpoint."""
+
+    def __init__(self, close_after_subscribe: bool = False) -> None:
+        self.close_after_subscribe = close_after_subscribe
+        self.connections = 0
+        self.requests = []
+        app = web.Application()
+        app.router.add_get('/stream', self.handler)
+        self.server = TestServer(app)
+
+    async def handler(self, request):
+        self.connections += 1
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                break
+            payload = json.loads(msg.data)
+            self.requests.append((payload['method'], payload['params']))
+            await ws.send_json({'result': None, 'id': payload['id']})
+            if payload['method'] == 'SUBSCRIBE':
+                for stream in payload['params']:
+                    symbol = stream.split('@')[0].upper()
+                    await ws.send_json({
+                        'stream': stream,
+                        'data': {'e': '24hrMiniTicker', 's': symbol, 'c': '1.25'},
+                    })
+                if self.close_after_subscribe and self.connections == 1:
+                    break
+        await ws.close()
+        return ws
+
+    @property
+    def url(self) -> str:
+        return str(self.server.make_url('/stream'))
+
+
+async def wait_for(condition, timeout: float = 5.0) -> None:
+    """Wait until condition() is true."""
+    async def waiter():
+        while not condition():
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(waiter(), timeout)
+
+
+@patch('core.price_stream.MESSAGE_INTERVAL', 0)
+class PriceStreamTests(SimpleTestCase):
+    """Test price streaming."""
+
+    async def run_stream(self, server, stream, condition) -> None:
+        task = asyncio.create_task(stream.run())
+        try:
+            await wait_for(condition)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await server.server.close()
+
+    async def test_stream_saves_prices(self):
+        """Test prices from subscribed streams are saved."""
+        server = StandInServer()
+        await server.server.start_server()
+        saved = {}
+        stream = PriceStream(
+            get_symbols=lambda: ['BTCUSDT', 'ETHUSDT'],
+            save_prices=saved.update,
+            url=server.url,
+            flush_interval=0.01,
+        )
+
+        await self.run_stream(server, stream, lambda: len(saved) == 2)
+
+        self.assertEqual(saved['BTCUSDT'], Decimal('1.25'))
+        self.assertEqual(server.requests[0], (
+            'SUBSCRIBE', ['btcusdt@miniTicker', 'ethusdt@miniTicker']))
+
+    async def test_stream_follows_symbols(self):
+        """Test subscriptions follow created and deleted symbols."""
+        server = StandInServer()
+        await server.server.start_server()
+        symbols = ['BTCUSDT']
+        stream = PriceStream(
+            get_symbols=lambda: list(symbols),
+            save_prices=lambda prices: None,
+            url=server.url,
+            sync_interval=0.01,
+        )
+
+        task = asyncio.create_task(stream.run())
+        try:
+            await wait_for(lambda: len(server.requests) == 1)
+            symbols[:] = ['ETHUSDT']
+            await wait_for(lambda: len(server.requests) == 3)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await server.server.close()
+
+        self.assertEqual(server.requests[1:], [
+            ('SUBSCRIBE', ['ethusdt@miniTicker']),
+            ('UNSUBSCRIBE', ['btcusdt@miniTicker']),
+        ])
+
+    async def test_stream_reconnects(self):
+        """Test stream reconnects and subscribes again after disconnect."""
+        server = StandInServer(close_after_subscribe=True)
+        await server.server.start_server()
+        stream = PriceStream(
+            get_symbols=lambda: ['BTCUSDT'],
+            save_prices=lambda prices: None,
+            url=server.url,
+            min_backoff=0.01,
+        )
+
+        await self.run_stream(server, stream, lambda: len(server.requests) == 2)
+
+        self.assertEqual(server.connections, 2)
+        self.assertEqual(server.requests[0], server.requests[1])
+
+    @patch('core.price_stream.MAX_STREAMS', 2)
+    async def test_streams_are_split_over_connections(self):
+        """Test symbols over the per-connection stream limit get more connections."""
+        server = StandInServer()
+        await server.server.start_server()
+        symbols = ['ADAUSDT', 'BNBUSDT', 'BTCUSDT', 'ETHUSDT', 'XRPUSDT']
+        saved = {}
+        stream = PriceStream(
+            get_symbols=lambda: symbols,
+            save_prices=saved.update,
+            url=server.url,
+            flush_interval=0.01,
+        )
+
+        await self.run_stream(server, stream, lambda: len(saved) == 5)
+
+        self.assertEqual(server.connections, 3)
+        self.assertEqual(sorted(params for _, params in server.requests), [
+            ['adausdt@miniTicker', 'bnbusdt@miniTicker'],
+            ['btcusdt@miniTicker', 'ethusdt@miniTicker'],
+            ['xrpusdt@miniTicker'],
+        ])
+
+    @patch('core.price_stream.MAX_STREAMS', 2)
+    def test_assign_keeps_symbols_on_their_connection(self):
+        """Test dropped symbols free room for new ones without moving others."""
+        stream = PriceStream(get_symbols=list, save_prices=print)
+        stream.assign(['A', 'B', 'C'])
+        stream.assign(['B', 'C', 'D'])
+
+        self.assertEqual([connection.symbols for connection in stream.connections], [{'B', 'D'}, {'C'}])
+
+    async def test_failed_subscription_closes_socket(self):
+        """Test a socket failing to subscribe is closed to reconnect."""
+        stream = PriceStream(get_symbols=list, save_prices=print)
+        connection = StreamConnection()
+        connection.symbols = {'BTCUSDT'}
+        connection.ws = MagicMock(closed=False, close=AsyncMock())
+        connection.ws.send_json = AsyncMock(side_effect=ConnectionResetError)
+
+        await stream.sync_subscriptions(connection)
+
+        connection.ws.close.assert_awaited_once()
@@ -0,0 +1,88 @@
+"""
+Tests for token buckets
+"""
+from unittest.mock import patch
+
+import redis
+from django.test import SimpleTestCase
+
+from core.rate_limit import TokenBucket, SharedTokenBucket
+from core.tests.mixins import FakeRedisMixin
+
+
+class TokenBucketTests(SimpleTestCase):
+    """Test token bucket."""
+
+    def setUp(self) -> None:
+        self.now = 0.0
+        self.bucket = TokenBucket(rate=10, capacity=2, clock=lambda: self.now)
+
+    def test_burst_and_refill(self):
+        """Test a burst up to capacity and refill at rate."""
+        self.assertEqual(self.bucket.try_acquire(), 0)
+        self.assertEqual(self.bucket.try_acquire(), 0)
+        self.assertAlmostEqual(self.bucket.try_acquire(), 0.1)
+
+        self.now += 0.1
+        self.assertEqual(self.bucket.try_acquire(), 0)
+
+    def test_pause(self):
+        """Test tokens are refused while paused."""
+        self.bucket.pause(5)
+
+        self.assertEqual(self.bucket.try_acquire(), 5)
+        self.assertFalse(self.bucket.idle)
+        self.now += 5
+        self.assertEqual(self.bucket.try_acquire(), 0)
+
+    async def test_acquire_waits(self):
+        """Test acquire sleeps until a token is available."""
+        async def sleep(seconds):
+            self.now += seconds
+
+        with patch('core.rate_limit.asyncio.sleep', side_effect=sleep) as patched_sleep:
+            for _ in range(4):
+                await self.bucket.acquire()
+
+        self.assertEqual(patched_sleep.call_count, 2)
+        self.assertAlmostEqual(self.now, 0.2)
+
+
+class SharedTokenBucketTests(FakeRedisMixin, SimpleTestCase):
+    """Test token bucket shared through Redis."""
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.now = 0.0
+        self.buckets = [
+            SharedTokenBucket('bucket', rate=10, capacity=2, clock=lambda: self.now) for _ in range(2)]
+
+    def test_shared_between_processes(self):
+        """Test buckets with the same key take tokens from one bucket."""
+        first, second = self.buckets
+
+        self.assertEqual(first.try_acquire(), 0)
+        self.assertEqual(second.try_acquire(), 0)
+        self.assertAlmostEqual(first.try_acquire(), 0.1)
+        self.assertAlmostEqual(second.try_acquire(), 0.1)
+
+        self.now += 0.1
+        self.assertEqual(second.try_acquire(), 0)
+        self.assertAlmostEqual(first.try_acquire(), 0.1)
+
+    def test_shared_pause(self):
+        """Test a pause of one bucket stops the others."""
+        first, second = self.buckets
+        first.pause(5)
+
+        self.assertEqual(second.try_acquire(), 5)
+        self.now += 5
+        self.assertEqual(second.try_acquire(), 0)
+
+    def test_without_redis(self):
+        """Test the bucket counts on its own when Redis fails."""
+        bucket = self.buckets[0]
+        with patch.object(self.redis, 'transaction', side_effect=redis.ConnectionError):
+            self.assertEqual(bucket.try_acquire(), 0)
+            self.assertEqual(bucket.try_acquire(), 0)
+            self.assertAlmostEqual(bucket.try_acquire(), 0.1)
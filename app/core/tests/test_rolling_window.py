@@ -0,0 +1,110 @@
+"""
+Tests for rolling window price changes
+"""
+import random
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+
+from core.rolling_window import RollingWindow, ChangeIndex, change_percent
+
+
+class RollingWindowTests(SimpleTestCase):
+    """Test rolling window min and max."""
+
+    def test_matches_brute_force(self):
+        """Test min and max match a scan over the window."""
+        rnd = random.Random(3)
+        window = RollingWindow(60)
+        samples = []
+        timestamp = 0.0
+        for _ in range(2000):
+            timestamp += rnd.choice([0, 0.5, 1, 5, 30])
+            price = Decimal(rnd.randint(900, 1100))
+            window.push(timestamp, price)
+            samples.append((timestamp, price))
+            # a price is in effect until the next sample
+            replaced_at = [t for t, _ in samples[1:]] + [timestamp + 1]
+            in_window = [p for (_, p), end in zip(samples, replaced_at) if end > timestamp - 60]
+
+            self.assertEqual(window.min, min(in_window))
+            self.assertEqual(window.max, max(in_window))
+
+    def test_opening_price(self):
+        """Test a price unchanged since before the window start is in the window."""
+        window = RollingWindow(900)
+        window.push(0.0, Decimal(100))
+        window.push(1200.0, Decimal(90))
+
+        self.assertEqual((window.min, window.max), (Decimal(90), Decimal(100)))
+        self.assertEqual(change_percent('fall', window, Decimal(90)), Decimal(10))
+
+        window.push(1300.0, Decimal(95))
+        window.push(2200.0, Decimal(95))
+        self.assertEqual((window.min, window.max), (Decimal(95), Decimal(95)))
+
+    def test_deques_stay_bounded(self):
+        """Test old samples are dropped from a monotonic series."""
+        window = RollingWindow(10)
+        for i in range(1000):
+            window.push(float(i), Decimal(i))
+
+        self.assertEqual(window.min, Decimal(989))
+        self.assertEqual(len(window._min), 11)
+        self.assertEqual(len(window._max), 1)
+
+
+class ChangeIndexTests(SimpleTestCase):
+    """Test percent change alerts index."""
+
+    def test_conditions(self):
+        """Test rise, fall and move are measured from the window low and high."""
+        index = ChangeIndex.from_alerts([
+            (1, 'BTCUSDT', 'rise', Decimal('3'), 900),
+            (2, 'BTCUSDT', 'fall', Decimal('3'), 900),
+            (3, 'BTCUSDT', 'move', Decimal('3'), 900),
+            (4, 'BTCUSDT', 'rise', Decimal('3'), 60),
+        ])
+
+        self.assertEqual(index.update('BTCUSDT', 0, [Decimal('100')]), [])
+        self.assertEqual(index.update('BTCUSDT', 30, [Decimal('101')]), [])
+        self.assertEqual(sorted(index.update('BTCUSDT', 120, [Decimal('103')])), [1, 3])
+        self.assertEqual(sorted(index.update('BTCUSDT', 180, [Decimal('99.5')])), [2, 3])
+
+    def test_range_samples(self):
+        """Test low and high samples of a range are part of the window."""
+        index = ChangeIndex.from_alerts([(1, 'BTCUSDT', 'fall', Decimal('5'), 300)])
+
+        triggered = index.update('BTCUSDT', 0, [Decimal('99'), Decimal('106'), Decimal('100')])
+
+        self.assertEqual(triggered, [1])
+
+    def test_new_window_is_seeded_from_history(self):
+        """Test a new alert sees prices from before it was added."""
+        index = ChangeIndex()
+        index.update('BTCUSDT', 0, [Decimal('100')])
+        index.add(1, 'BTCUSDT', 'rise', Decimal('2'), 600)
+
+        self.assertEqual(index.update('BTCUSDT', 60, [Decimal('102')]), [1])
+
+    def test_replace_keeps_windows(self):
+        """Test windows of alerts still indexed keep samples the history lost."""
+        index = ChangeIndex.from_alerts([(1, 'BTCUSDT', 'fall', Decimal('5'), 86400)])
+        index.update('BTCUSDT', 0, [Decimal('100')])
+        index.history['BTCUSDT'].clear()
+
+        index.replace([(1, 'BTCUSDT', 'fall', Decimal('5'), 86400), (2, 'BTCUSDT', 'fall', Decimal('5'), 600)])
+
+        self.assertEqual(index.update('BTCUSDT', 3600, [Decimal('94')]), [1])
+
+    def test_remove(self):
+        """Test removed alerts and their windows are dropped."""
+        index = ChangeIndex.from_alerts([
+            (1, 'BTCUSDT', 'rise', Decimal('1'), 600),
+            (2, 'BTCUSDT', 'fall', Decimal('1'), 600),
+        ])
+        index.remove(1)
+        index.remove(2)
+
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.update('BTCUSDT', 0, [Decimal('1')]), [])
@@ -0,0 +1,165 @@
+"""
+Tests for the pooled SMTP sender against a local stand-in server
+"""
+import smtplib
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import SimpleTestCase
+
+from core.send_email import SMTPPool
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Minimal SMTP dialog with optional handshake delay and drops."""
+
+    def reply(self, text: str) -> None:
+        self.wfile.write(f'{text}\r\n'.encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        time.sleep(server.handshake_delay)
+        self.reply('220 stand-in ESMTP')
+        received = 0
+        while line := self.rfile.readline():
+            command = line.decode().strip().upper()
+            if command.startswith('EHLO'):
+                self.reply('250-stand-in')
+                self.reply('250 AUTH PLAIN')
+            elif command.startswith('AUTH'):
+                time.sleep(server.handshake_delay)
+                self.reply('235 Authentication successful')
+            elif command.startswith('RCPT') and 'REFUSED' in command:
+                self.reply('550 No such user')
+            elif command.startswith(('HELO', 'MAIL', 'RCPT', 'NOOP', 'RSET')):
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                while (line := self.rfile.readline()) not in (b'.\r\n', b''):
+                    data.append(line.decode())
+                with server.lock:
+                    server.messages.append(''.join(data))
+                if server.drop_after_data:
+                    return
+                self.reply('250 OK')
+                received += 1
+                if received == server.messages_per_connection:
+                    return
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('500 Unknown command')
+
+
+class StandInSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, handshake_delay: float = 0.0, messages_per_connection: int | None = None,
+                 drop_after_data: bool = False) -> None:
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.handshake_delay = handshake_delay
+        self.messages_per_connection = messages_per_connection
+        self.drop_after_data = drop_after_data
+        self.connections = 0
+        self.messages = []
+        self.lock = threading.Lock()
+
+
+class SMTPPoolTests(SimpleTestCase):
+    """Test pooled SMTP sender."""
+
+    def start_server(self, **kwargs) -> StandInSMTPServer:
+        server = StandInSMTPServer(**kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def create_pool(self, server, **kwargs) -> SMTPPool:
+        pool = SMTPPool(
+            host='127.0.0.1', port=server.server_address[1], user='sender@example.com',
+            password='secret', use_ssl=False, timeout=5, **kwargs)
+        self.addCleanup(pool.close)
+        return pool
+
+    def send(self, pool, count: int, workers: int = 1) -> float:
+        """Send count messages and return elapsed seconds."""
+        start = time.perf_counter()
+        with ThreadPoolExecutor(workers) as executor:
+            list(executor.map(
+                lambda i: pool.sendmail(pool.user, [f'user{i}@example.com'], f'Subject: alert\nmessage {i}'),
+                range(count),
+            ))
+        return time.perf_counter() - start
+
+    def test_connection_is_reused(self):
+        """Test messages share one logged in connection and skip handshakes."""
+        server = self.start_server(handshake_delay=0.02)
+        pool = self.create_pool(server)
+
+        elapsed = self.send(pool, 50)
+
+        self.assertEqual(len(server.messages), 50)
+        self.assertEqual(server.connections, 1)
+        # 50 handshakes with login would take at least 2 seconds
+        self.assertLess(elapsed, 50 * 2 * 0.02)
+
+    def test_connections_are_bounded(self):
+        """Test concurrent senders open at most pool size connections."""
+        server = self.start_server(handshake_delay=0.01)
+        pool = self.create_pool(server, size=3)
+
+        self.send(pool, 60, workers=8)
+
+        self.assertEqual(len(server.messages), 60)
+        self.assertLessEqual(server.connections, 3)
+
+    def test_reconnects_after_disconnect(self):
+        """Test a connection closed by the server is replaced."""
+        server = self.start_server(messages_per_connection=10)
+        pool = self.create_pool(server)
+
+        self.send(pool, 25)
+
+        self.assertEqual(len(server.messages), 25)
+        self.assertEqual(server.connections, 3)
+
+    def test_idle_connection_is_checked(self):
+        """Test idle connections are checked with NOOP before reuse."""
+        server = self.start_server()
+        pool = self.create_pool(server, idle_check=0)
+
+        self.send(pool, 3)
+
+        self.assertEqual(len(server.messages), 3)
+        self.assertEqual(server.connections, 1)
+
+    def test_delivered_message_is_not_sent_again(self):
+        """Test a connection lost after DATA is not retried with the message."""
+        server = self.start_server(drop_after_data=True)
+        pool = self.create_pool(server)
+
+        with self.assertRaises(smtplib.SMTPServerDisconnected):
+            pool.sendmail(pool.user, ['user@example.com'], 'Subject: alert\nmessage')
+
+        self.assertEqual(len(server.messages), 1)
+        self.assertEqual(server.connections, 1)
+
+    def test_refused_recipient_is_not_retried(self):
+        """Test a refused recipient raises without reconnecting."""
+        server = self.start_server()
+        pool = self.create_pool(server)
+
+        with self.assertRaises(smtplib.SMTPRecipientsRefused):
+            pool.sendmail(pool.user, ['refused@example.com'], 'Subject: alert\nmessage')
+        self.send(pool, 1)
+
+        self.assertEqual(len(server.messages), 1)
+        self.assertEqual(server.connections, 1)
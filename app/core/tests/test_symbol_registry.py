@@ -0,0 +1,81 @@
+"""
+Tests for the exchange symbol registry
+"""
+from unittest.mock import patch
+
+import redis
+from django.test import SimpleTestCase
+
+from core import symbol_registry
+from core.tests.mixins import FakeRedisMixin
+
+
+class SymbolRegistryTests(FakeRedisMixin, SimpleTestCase):
+    """Test exchange symbol registry."""
+
+    def setUp(self) -> None:
+        super().setUp()
+
+    @patch('core.symbol_registry.fetch_trading_symbols')
+    def test_refresh(self, patched_fetch):
+        """Test registry is replaced and invalid symbols are forgotten."""
+        self.redis.sadd(symbol_registry.REGISTRY_KEY, 'LUNAUSDT')
+        symbol_registry.mark_invalid(['BTCUSTD'])
+        patched_fetch.return_value = {'BTCUSDT', 'ETHUSDT'}
+
+        self.assertEqual(symbol_registry.refresh(), 2)
+
+        self.assertEqual(self.redis.smembers(symbol_registry.REGISTRY_KEY), {'BTCUSDT', 'ETHUSDT'})
+        self.assertFalse(self.redis.exists(symbol_registry.INVALID_KEY))
+
+    @patch('core.symbol_registry.fetch_trading_symbols')
+    def test_refresh_empty_response(self, patched_fetch):
+        """Test registry is kept if the exchange returns no symbols."""
+        self.redis.sadd(symbol_registry.REGISTRY_KEY, 'BTCUSDT')
+        patched_fetch.return_value = set()
+
+        symbol_registry.refresh()
+
+        self.assertEqual(self.redis.smembers(symbol_registry.REGISTRY_KEY), {'BTCUSDT'})
+
+    def test_filter_known(self):
+        """Test unknown and invalid symbols are filtered out."""
+        self.redis.sadd(symbol_registry.REGISTRY_KEY, 'BTCUSDT', 'ETHUSDT', 'LTCBTC')
+        symbol_registry.mark_invalid(['LTCBTC'])
+
+        self.assertEqual(
+            symbol_registry.filter_known(['BTCUSDT', 'BTCUSTD', 'LTCBTC']),
+            ['BTCUSDT'],
+        )
+        self.assertTrue(symbol_registry.is_known('ETHUSDT'))
+        self.assertFalse(symbol_registry.is_known('BTCUSTD'))
+
+    def test_filter_known_without_registry(self):
+        """Test all symbols but invalid ones are known until registry is loaded."""
+        symbol_registry.mark_invalid(['BTCUSTD'])
+
+        self.assertEqual(
+            symbol_registry.filter_known(['BTCUSDT', 'BTCUSTD']),
+            ['BTCUSDT'],
+        )
+
+    @patch('core.symbol_registry.fetch_trading_symbols')
+    def test_missing_registry_is_loaded(self, patched_fetch):
+        """Test a missing registry is loaded on first use, once per interval."""
+        patched_fetch.return_value = {'BTCUSDT'}
+
+        self.assertFalse(symbol_registry.is_known('BTCUSTD'))
+        self.assertTrue(symbol_registry.is_known('BTCUSDT'))
+        patched_fetch.assert_called_once()
+
+        self.redis.delete(symbol_registry.REGISTRY_KEY)
+        patched_fetch.side_effect = OSError('exchange is down')
+        self.assertTrue(symbol_registry.is_known('BTCUSTD'))
+        self.redis.delete(symbol_registry.LOADING_KEY)
+        self.assertTrue(symbol_registry.is_known('BTCUSTD'))
+        self.assertEqual(patched_fetch.call_count, 2)
+
+    def test_mark_invalid_without_redis(self):
+        """Test invalid symbols are dropped when Redis fails."""
+        with patch.object(self.redis, 'sadd', side_effect=redis.ConnectionError):
+            symbol_registry.mark_invalid(['BTCUSTD'])
@@ -1,17 +1,37 @@
 """
 Tests for tasks
 """
+import threading
+import time
+from datetime import timedelta
 from unittest.mock import patch
 from decimal import Decimal
 
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 
-from core import models
+from core import models, price_cache, symbol_registry
 from core.tasks import (
     get_and_save_last_prices,
+    flush_last_prices,
     send_alerts,
+    poll_due_prices,
+    evaluate_symbols,
+    dispatch_evaluation,
+    log_evaluation,
+    shard_of,
+    send_triggered_alerts,
+    send_notifications,
+    retry_delay,
+    NOTIFICATION_CLAIM_TIMEOUT,
+    NOTIFICATION_MAX_ATTEMPTS,
+    NOTIFICATION_RETRY_DELAY,
+    NOTIFICATION_MAX_RETRY_DELAY,
 )
+from core.tests.mixins import FakeRedisMixin
 
 
 def create_user(email='user@example.com', password='testpass123', **kwargs):
@@ -19,16 +39,24 @@ def create_user(email='user@example.com', password='testpass123', **kwargs):
     return get_user_model().objects.create_user(email=email, password=password, **kwargs)
 
 
-class TasksTest(TestCase):
+class TasksTest(FakeRedisMixin, TestCase):
     """Test tasks."""
     def setUp(self) -> None:
+        super().setUp()
         models.CoreSettings.objects.create()
 
-    def test_get_and_save_last_price(self):
+    @patch('core.tasks.evaluate_symbols.delay')
+    def test_get_and_save_last_price(self, patched_evaluate):
         """Test get and save last price for symbols"""
         symbol = models.Symbol.objects.create(name='BTCUSDT')
         symbol2 = models.Symbol.objects.create(name='CFXBTC')
+        user = create_user()
+        for s in (symbol, symbol2):
+            models.Alert.objects.create(
+                user=user, symbol=s, price=Decimal('1'), condition='above')
         get_and_save_last_prices()
+        self.assertEqual(set(price_cache.get_prices()), {'BTCUSDT', 'CFXBTC'})
+        flush_last_prices()
         symbol.refresh_from_db()
         symbol2.refresh_from_db()
         self.assertNotEqual(symbol.last_price, Decimal('0'))
@@ -84,3 +112,504 @@ class TasksTest(TestCase):
         alert.refresh_from_db()
         self.assertEqual(alert.condition, 'below')
         self.assertEqual(alert.is_active, False)
+
+    def test_send_alerts_numpy_backend(self):
+        """Test both evaluation backends give the same result."""
+        user = create_user(telegram_id='test')
+        symbol = models.Symbol.objects.create(name='BTCUSDT', last_price=Decimal('25000'))
+        params = [
+            ('above', '24000'), ('above', '26000'),
+            ('below', '24000'), ('below', '26000'),
+            ('cross', '24000'), ('cross', '26000'), ('cross', '25000'),
+        ]
+        results = []
+        for backend in ('scan', 'numpy'):
+            models.CoreSettings.objects.update(evaluation_backend=backend)
+            alerts = [
+                models.Alert.objects.create(
+                    user=user, symbol=symbol, condition=condition, price=Decimal(price))
+                for condition, price in params
+            ]
+            send_alerts()
+            results.append(list(
+                models.Alert.objects.filter(id__in=[alert.id for alert in alerts])
+                .order_by('id').values_list('condition', 'is_active')
+            ))
+
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0][0], ('above', False))
+
+    def test_send_alerts_uses_cached_price(self):
+        """Test cached last price takes precedence over the saved one."""
+        symbol = models.Symbol.objects.create(name='BTCUSDT', last_price=Decimal('25000'))
+        user = create_user(telegram_id='test')
+        alert = models.Alert.objects.create(
+            user=user,
+            symbol=symbol,
+            price=Decimal('26000'),
+            condition='above',
+            is_active=True
+        )
+        price_cache.set_prices({'BTCUSDT': Decimal('26500')})
+        send_alerts()
+        alert.refresh_from_db()
+        self.assertEqual(alert.is_active, False)
+
+    def test_send_alerts_skips_unpriced_symbols(self):
+        """Test alerts of a symbol without a real price are not triggered."""
+        symbol = models.Symbol.objects.create(name='BTCUSTD')
+        alert = models.Alert.objects.create(
+            user=create_user(telegram_id='test'), symbol=symbol, price=Decimal('1'), condition='below')
+
+        self.assertEqual(send_alerts()['triggered'], 0)
+
+        alert.refresh_from_db()
+        self.assertTrue(alert.is_active)
+
+    @patch('core.tasks.evaluate_symbols.delay')
+    @patch('core.tasks.fetch_last_prices')
+    def test_get_and_save_last_prices_skips_invalid(self, patched_fetch, patched_evaluate):
+        """Test symbols unknown to the exchange are not fetched again."""
+        user = create_user()
+        for name in ('BTCUSDT', 'BTCUSTD', 'LUNAUSDT'):
+            models.Alert.objects.create(
+                user=user,
+                symbol=models.Symbol.objects.create(name=name),
+                price=Decimal('1'),
+                condition='below',
+            )
+        self.redis.sadd(symbol_registry.REGISTRY_KEY, 'BTCUSDT', 'BTCUSTD')
+
+        def fetch_last_prices(names, invalid):
+            invalid.add('BTCUSTD')
+            return {'BTCUSDT': Decimal('25000')}
+
+        patched_fetch.side_effect = fetch_last_prices
+        get_and_save_last_prices()
+        patched_fetch.assert_called_once_with(['BTCUSDT', 'BTCUSTD'], {'BTCUSTD'})
+        self.assertEqual(price_cache.get_prices(), {'BTCUSDT': Decimal('25000')})
+
+        get_and_save_last_prices()
+        self.assertEqual(patched_fetch.call_args.args[0], ['BTCUSDT'])
+
+    @patch('core.tasks.evaluate_symbols.delay')
+    @patch('core.tasks.fetch_price_ranges')
+    def test_price_range_triggers_alert(self, patched_fetch, patched_evaluate):
+        """Test a spike between polls triggers alerts with range tracking."""
+        models.CoreSettings.objects.update(track_price_range=True)
+        user = create_user(telegram_id='test')
+        symbol = models.Symbol.objects.create(name='BTCUSDT', last_price=Decimal('25000'))
+        spiked = models.Alert.objects.create(
+            user=user, symbol=symbol, price=Decimal('26000'), condition='above')
+        missed = models.Alert.objects.create(
+            user=user, symbol=symbol, price=Decimal('27000'), condition='above')
+        price_cache.set_prices({'BTCUSDT': Decimal('25000')})
+        patched_fetch.return_value = {
+            'BTCUSDT': (Decimal('25000'), Decimal('24800'), Decimal('26500')),
+        }
+
+        get_and_save_last_prices()
+        patched_evaluate.assert_called_once_with(['BTCUSDT'])
+        evaluate_symbols(['BTCUSDT'])
+
+        spiked.refresh_from_db()
+        missed.refresh_from_db()
+        self.assertFalse(spiked.is_active)
+        self.assertTrue(missed.is_active)
+
+    @patch('core.tasks.evaluate_symbols.delay')
+    @patch('core.tasks.fetch_price_ranges', return_value={})
+    def test_price_range_since_last_poll(self, patched_fetch, patched_evaluate):
+        """Test ranges cover the time since the last poll of each symbol."""
+        models.CoreSettings.objects.update(track_price_range=True, adaptive_polling=True)
+        user = create_user(telegram_id='test')
+        for name in ('BTCUSDT', 'ETHUSDT'):
+            models.Alert.objects.create(
+                user=user, symbol=models.Symbol.objects.create(name=name),
+                price=Decimal('1'), condition='above')
+        price_cache.set_prices({'BTCUSDT': Decimal('25000')}, timestamp=time.time() - 230)
+
+        poll_due_prices()
+
+        self.assertEqual(
+            sorted((call.args[0], call.args[2]) for call in patched_fetch.call_args_list),
+            [(['BTCUSDT'], '4m'), (['ETHUSDT'], '1m')],
+        )
+
+    def count_send_alerts_queries(self, alerts_per_symbol: int) -> int:
+        """Create alerts and return number of queries made by send_alerts."""
+        users = [
+            create_user(email=f'user{i}@example.com', telegram_id='test')
+            for i in range(3)
+        ]
+        for i in range(5):
+            symbol = models.Symbol.objects.create(name=f'SYM{i}USDT', last_price=Decimal('100'))
+            for j in range(alerts_per_symbol):
+                models.Alert.objects.create(
+                    user=users[j % len(users)],
+                    symbol=symbol,
+                    price=Decimal(90 + j % 20),
+                    condition=['above', 'below', 'cross'][j % 3],
+                )
+
+        with CaptureQueriesContext(connection) as queries:
+            send_alerts()
+        self.assertFalse(models.Alert.objects.filter(
+            condition='above', price__lt=Decimal('100'), is_active=True).exists())
+        self.assertFalse(models.Alert.objects.filter(condition='cross', is_active=True).exclude(
+            price=Decimal('100')).exists())
+        models.Alert.objects.all().delete()
+        models.Symbol.objects.all().delete()
+        get_user_model().objects.all().delete()
+        # the outbox is written with one bulk insert, which backends with
+        # a low limit of query parameters split into several statements
+        return len([
+            query for query in queries.captured_queries
+            if not query['sql'].startswith('INSERT INTO "core_notification"')
+        ])
+
+    def test_send_alerts_query_budget(self):
+        """Test send_alerts makes a constant number of queries."""
+        few = self.count_send_alerts_queries(alerts_per_symbol=20)
+        many = self.count_send_alerts_queries(alerts_per_symbol=200)
+
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, 12)
+
+    @patch('core.tasks.evaluate_symbols.delay')
+    @patch('core.tasks.fetch_last_prices')
+    def test_changed_prices_are_evaluated(self, patched_fetch, patched_evaluate):
+        """Test alerts are evaluated only for symbols whose price changed."""
+        user = create_user()
+        for name in ('BTCUSDT', 'ETHUSDT'):
+            models.Alert.objects.create(
+                user=user,
+                symbol=models.Symbol.objects.create(name=name),
+                price=Decimal('1'),
+                condition='below',
+            )
+        price_cache.set_prices({'BTCUSDT': Decimal('25000'), 'ETHUSDT': Decimal('1600')})
+        patched_fetch.return_value = {'BTCUSDT': Decimal('25000'), 'ETHUSDT': Decimal('1650')}
+
+        get_and_save_last_prices()
+
+        patched_evaluate.assert_called_once_with(['ETHUSDT'])
+
+    def test_evaluate_symbols(self):
+        """Test only alerts of given symbols are evaluated."""
+        user = create_user(telegram_id='test')
+        alerts = [
+            models.Alert.objects.create(
+                user=user,
+                symbol=models.Symbol.objects.create(name=name, last_price=Decimal('100')),
+                price=Decimal('50'),
+                condition='above',
+            )
+            for name in ('BTCUSDT', 'ETHUSDT')
+        ]
+
+        evaluate_symbols(['ETHUSDT'])
+
+        for alert in alerts:
+            alert.refresh_from_db()
+        self.assertTrue(alerts[0].is_active)
+        self.assertFalse(alerts[1].is_active)
+
+    @patch('core.tasks.log_evaluation.s')
+    @patch('core.tasks.chord')
+    def test_dispatch_evaluation_sharded(self, patched_chord, patched_log):
+        """Test symbols are split into shards evaluated by their own tasks."""
+        models.CoreSettings.objects.update(evaluation_shards=4)
+        symbols = [f'SYM{i}USDT' for i in range(50)]
+
+        dispatch_evaluation(symbols)
+
+        signatures = list(patched_chord.call_args.args[0])
+        parts = [signature.args[0] for signature in signatures]
+        self.assertLessEqual(len(parts), 4)
+        self.assertEqual(sorted(sum(parts, [])), sorted(symbols))
+        for part in parts:
+            self.assertEqual(len({shard_of(symbol, 4) for symbol in part}), 1)
+        patched_chord.return_value.assert_called_once_with(patched_log.return_value)
+
+    @patch('core.tasks.chord')
+    @patch('core.tasks.evaluate_symbols.delay')
+    def test_dispatch_evaluation_single_shard(self, patched_evaluate, patched_chord):
+        """Test symbols are evaluated by one task without sharding."""
+        dispatch_evaluation(['BTCUSDT', 'ETHUSDT'])
+
+        patched_evaluate.assert_called_once_with(['BTCUSDT', 'ETHUSDT'])
+        patched_chord.assert_not_called()
+
+    @patch('core.tasks.dispatch_evaluation')
+    def test_send_alerts_sharded(self, patched_dispatch):
+        """Test the periodic sweep is dispatched over symbols with active alerts."""
+        models.CoreSettings.objects.update(evaluation_shards=2)
+        user = create_user()
+        for name, is_active in (('BTCUSDT', True), ('ETHUSDT', False)):
+            models.Alert.objects.create(
+                user=user,
+                symbol=models.Symbol.objects.create(name=name),
+                price=Decimal('1'),
+                condition='below',
+                is_active=is_active,
+            )
+
+        send_alerts()
+
+        patched_dispatch.assert_called_once_with(['BTCUSDT'])
+
+    def test_log_evaluation(self):
+        """Test results of shards are summed."""
+        total = log_evaluation([
+            {'alerts': 3, 'triggered': 1, 'sent': 1, 'flipped': 0},
+            {'alerts': 2, 'triggered': 0, 'sent': 0, 'flipped': 2},
+        ])
+
+        self.assertEqual(total, {'alerts': 5, 'triggered': 1, 'sent': 1, 'flipped': 2, 'shards': 2})
+
+    @patch('core.tasks.chord')
+    @patch('core.tasks.evaluate_symbols.delay')
+    def test_dispatch_evaluation_alert_engine(self, patched_evaluate, patched_chord):
+        """Test nothing is dispatched while the alert engine is enabled."""
+        models.CoreSettings.objects.update(alert_engine=True, evaluation_shards=4)
+
+        dispatch_evaluation(['BTCUSDT'])
+
+        patched_evaluate.assert_not_called()
+        patched_chord.assert_not_called()
+
+    def test_claimed_alerts_are_not_queued_again(self):
+        """Test an evaluation with stale triggered ids does not queue again."""
+        models.CoreSettings.objects.update(send_alert_via_email=False)
+        user = create_user(telegram_id='123')
+        symbol = models.Symbol.objects.create(name='BTCUSDT', last_price=Decimal('25000'))
+        alert = models.Alert.objects.create(
+            user=user, symbol=symbol, price=Decimal('24000'), condition='above')
+
+        self.assertEqual(send_triggered_alerts([alert.id], {}), [alert])
+        self.assertEqual(send_triggered_alerts([alert.id], {}), [])
+
+        alert.refresh_from_db()
+        self.assertFalse(alert.is_active)
+        notification = models.Notification.objects.get()
+        self.assertEqual(
+            (notification.alert, notification.channel, notification.message),
+            (alert, 'telegram', 'BTCUSDT is above 24000.00000000'),
+        )
+
+    def test_stale_flips_are_ignored(self):
+        """Test a flip does not overwrite an alert changed since it was read."""
+        symbol = models.Symbol.objects.create(name='BTCUSDT', last_price=Decimal('25000'))
+        user = create_user(telegram_id='123')
+        waiting, edited, inactive = (
+            models.Alert.objects.create(
+                user=user, symbol=symbol, price=Decimal('24000'), condition=condition, is_active=is_active)
+            for condition, is_active in (('cross', True), ('below', True), ('cross', False))
+        )
+
+        send_triggered_alerts([], {waiting.id: 'below', edited.id: 'above', inactive.id: 'below'})
+
+        self.assertEqual(
+            list(models.Alert.objects.order_by('id').values_list('condition', flat=True)),
+            ['below', 'below', 'cross'],
+        )
+
+    def test_notifications_per_channel(self):
+        """Test one notification is queued per enabled channel."""
+        symbol = models.Symbol.objects.create(name='BTCUSDT', last_price=Decimal('25000'))
+        alerts = [
+            models.Alert.objects.create(
+                user=create_user(email=f'user{i}@example.com', telegram_id=telegram_id),
+                symbol=symbol, price=Decimal('24000'), condition='above')
+            for i, telegram_id in enumerate(['123', ''])
+        ]
+
+        send_triggered_alerts([alert.id for alert in alerts], {})
+
+        self.assertEqual(sorted(models.Notification.objects.values_list('alert', 'channel')), [
+            (alerts[0].id, 'email'), (alerts[0].id, 'telegram'), (alerts[1].id, 'email'),
+        ])
+
+    def test_alerts_without_channel_stay_active(self):
+        """Test alerts no enabled channel can send are not claimed."""
+        models.CoreSettings.objects.update(send_alert_via_email=False, send_alert_via_webhook=False)
+        symbol = models.Symbol.objects.create(name='BTCUSDT', last_price=Decimal('25000'))
+        alerts = [
+            models.Alert.objects.create(
+                user=create_user(email=f'user{i}@example.com', telegram_id=telegram_id),
+                symbol=symbol, price=Decimal('24000'), condition='above')
+            for i, telegram_id in enumerate(['123', ''])
+        ]
+
+        claimed = send_triggered_alerts([alert.id for alert in alerts], {})
+
+        self.assertEqual(claimed, [alerts[0]])
+        self.assertEqual(list(models.Alert.objects.filter(is_active=True)), [alerts[1]])
+        self.assertEqual(list(models.Notification.objects.values_list('alert', flat=True)), [alerts[0].id])
+
+        models.CoreSettings.objects.update(send_alert_via_telegram=False)
+        self.assertEqual(send_alerts()['claimed'], 0)
+        self.assertTrue(models.Alert.objects.get(id=alerts[1].id).is_active)
+        self.assertEqual(models.Notification.objects.count(), 1)
+
+    @patch('core.channels.send_telegram_messages')
+    def test_send_notifications(self, patched_send):
+        """Test pending notifications are delivered and failures are scheduled for a retry."""
+        user = create_user(telegram_id='123')
+        for message in ('first', 'second'):
+            models.Notification.objects.create(user=user, channel='telegram', message=message)
+        models.Notification.objects.create(user=user, channel='email', message='other')
+        patched_send.side_effect = lambda messages: [text == 'first' for _, text in messages]
+
+        self.assertEqual(send_notifications('telegram'), 1)
+
+        self.assertEqual(dict(models.Notification.objects.values_list('message', 'status')), {
+            'first': 'sent', 'second': 'pending', 'other': 'pending',
+        })
+        failed = models.Notification.objects.get(message='second')
+        self.assertEqual(failed.attempts, 1)
+        self.assertGreater(failed.next_attempt_at, timezone.now())
+        self.assertEqual(send_notifications('telegram'), 0)
+        patched_send.assert_called_once_with([('123', 'first'), ('123', 'second')])
+
+    @patch('core.channels.send_telegram_messages', return_value=[True])
+    def test_stale_claims_are_delivered(self, patched_send):
+        """Test notifications left by a crashed dispatcher are delivered again."""
+        user = create_user(telegram_id='123')
+        fresh = timezone.now()
+        stale = fresh - timedelta(seconds=NOTIFICATION_CLAIM_TIMEOUT + 1)
+        for message, claimed_at in (('stale', stale), ('fresh', fresh)):
+            models.Notification.objects.create(
+                user=user, channel='telegram', message=message,
+                status='sending', claimed_at=claimed_at)
+
+        self.assertEqual(send_notifications('telegram'), 1)
+
+        patched_send.assert_called_once_with([('123', 'stale')])
+
+    @patch('core.channels.send_telegram_messages', return_value=[False])
+    def test_retries_end_in_dead_letters(self, patched_send):
+        """Test failed notifications are retried with backoff and then given up."""
+        user = create_user(telegram_id='123')
+        notification = models.Notification.objects.create(user=user, channel='telegram', message='alert')
+        delays = []
+
+        for attempt in range(1, NOTIFICATION_MAX_ATTEMPTS + 1):
+            start = timezone.now()
+            self.assertEqual(send_notifications('telegram'), 0)
+            notification.refresh_from_db()
+            self.assertEqual(notification.attempts, attempt)
+            if notification.next_attempt_at:
+                delays.append((notification.next_attempt_at - start).total_seconds())
+                # not due yet
+                send_notifications('telegram')
+                self.assertEqual(patched_send.call_count, attempt)
+                models.Notification.objects.update(next_attempt_at=start)
+
+        self.assertEqual(notification.status, 'failed')
+        self.assertIsNone(notification.next_attempt_at)
+        self.assertEqual(len(delays), NOTIFICATION_MAX_ATTEMPTS - 1)
+        for attempt, delay in enumerate(delays, 1):
+            base = NOTIFICATION_RETRY_DELAY * 2 ** (attempt - 1)
+            self.assertTrue(base / 2 <= delay <= base + 1, (attempt, delay))
+
+    @patch('core.channels.send_telegram_messages', side_effect=RuntimeError('Event loop is closed'))
+    def test_channel_error_is_retried(self, patched_send):
+        """Test a channel raising fails its batch, which is retried later."""
+        user = create_user(telegram_id='123')
+        for message in ('first', 'second'):
+            models.Notification.objects.create(user=user, channel='telegram', message=message)
+
+        self.assertEqual(send_notifications('telegram'), 0)
+
+        for notification in models.Notification.objects.all():
+            self.assertEqual(notification.status, 'pending')
+            self.assertEqual(notification.attempts, 1)
+            self.assertGreater(notification.next_attempt_at, timezone.now())
+
+    def test_retry_delay(self):
+        """Test retry delays grow exponentially up to the limit."""
+        for attempts in range(1, 20):
+            delay = min(NOTIFICATION_MAX_RETRY_DELAY, NOTIFICATION_RETRY_DELAY * 2 ** (attempts - 1))
+            self.assertTrue(delay / 2 <= retry_delay(attempts) <= delay)
+
+    @patch('core.channels.send_telegram_messages', return_value=[True])
+    def test_digests(self, patched_send):
+        """Test notifications of a user are sent as one digest after the window."""
+        models.CoreSettings.objects.update(digest_window=60)
+        due, waiting = create_user(telegram_id='123'), create_user(email='other@example.com', telegram_id='456')
+        for user, message in ((due, 'first'), (due, 'second'), (waiting, 'third'), (due, 'fourth')):
+            models.Notification.objects.create(user=user, channel='telegram', message=message)
+        models.Notification.objects.filter(message='first').update(
+            created_at=timezone.now() - timedelta(seconds=61))
+
+        self.assertEqual(send_notifications('telegram'), 3)
+
+        patched_send.assert_called_once_with([('123', '3 alerts triggered:\nfirst\nsecond\nfourth')])
+        self.assertEqual(models.Notification.objects.get(status='pending').message, 'third')
+
+    @patch('core.tasks.send_notifications.apply_async')
+    def test_digest_dispatch_is_delayed(self, patched_dispatch):
+        """Test the dispatcher is scheduled at the end of the digest window."""
+        models.CoreSettings.objects.update(send_alert_via_email=False, digest_window=60)
+        symbol = models.Symbol.objects.create(name='BTCUSDT', last_price=Decimal('25000'))
+        alert = models.Alert.objects.create(
+            user=create_user(telegram_id='123'), symbol=symbol, price=Decimal('24000'), condition='above')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            send_triggered_alerts([alert.id], {})
+
+        patched_dispatch.assert_called_once_with(('telegram',), countdown=60)
+
+
+@skipUnlessDBFeature('has_select_for_update_skip_locked')
+class ConcurrentEvaluationTests(FakeRedisMixin, TransactionTestCase):
+    """Test overlapping evaluations."""
+
+    def setUp(self) -> None:
+        super().setUp()
+        models.CoreSettings.objects.create(send_alert_via_email=False)
+        user = create_user(telegram_id='123')
+        symbol = models.Symbol.objects.create(name='BTCUSDT', last_price=Decimal('25000'))
+        self.alerts = [
+            models.Alert.objects.create(
+                user=user, symbol=symbol, price=Decimal(20000 + i), condition='above')
+            for i in range(50)
+        ]
+
+    @patch('core.tasks.send_notifications.apply_async')
+    def test_concurrent_evaluators_notify_once(self, patched_dispatch):
+        """Test every alert is sent exactly once by concurrent evaluators and dispatchers."""
+        messages = []
+        lock = threading.Lock()
+
+        def send_messages(batch):
+            time.sleep(0.001)
+            with lock:
+                messages.extend(text for _, text in batch)
+            return [True] * len(batch)
+
+        workers = 4
+        barrier = threading.Barrier(workers)
+
+        def work():
+            try:
+                barrier.wait()
+                evaluate_symbols(['BTCUSDT'])
+                send_notifications('telegram')
+            finally:
+                connection.close()
+
+        with patch('core.channels.send_telegram_messages', side_effect=send_messages):
+            threads = [threading.Thread(target=work) for _ in range(workers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(sorted(messages), sorted(
+            f'BTCUSDT is above {price}'
+            for price in models.Alert.objects.values_list('price', flat=True)))
+        self.assertFalse(models.Alert.objects.filter(is_active=True).exists())
+        self.assertEqual(models.Notification.objects.filter(status='sent').count(), len(self.alerts))
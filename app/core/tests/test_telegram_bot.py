@@ -0,0 +1,151 @@
+"""
+Tests for the Telegram dispatcher against a local fake Bot API server
+"""
+import asyncio
+import time
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from django.test import SimpleTestCase
+
+from core.rate_limit import TokenBucket
+from core.telegram_bot import TelegramDispatcher
+from core.tests.mixins import FakeRedisMixin
+
+
+class FakeBotAPI:
+    """Fake Bot API answering 429 when its rate limits are exceeded."""
+
+    def __init__(self, global_rate: float, chat_rate: float, delay: float = 0.0) -> None:
+        self.global_bucket = TokenBucket(global_rate)
+        self.chat_rate = chat_rate
+        self.chat_buckets = {}
+        self.delay = delay
+        self.flood_once = False
+        self.delivered = []
+        self.rejected = 0
+        app = web.Application()
+        app.router.add_post('/botTOKEN/sendMessage', self.send_message)
+        self.server = TestServer(app)
+
+    def limited(self, chat_id) -> bool:
+        chat_bucket = self.chat_buckets.setdefault(chat_id, TokenBucket(self.chat_rate, 2))
+        return bool(chat_bucket.try_acquire() or self.global_bucket.try_acquire())
+
+    async def send_message(self, request):
+        payload = await request.json()
+        await asyncio.sleep(self.delay)
+        if self.flood_once or self.limited(payload['chat_id']):
+            self.flood_once = False
+            self.rejected += 1
+            return web.json_response({
+                'ok': False,
+                'error_code': 429,
+                'description': 'Too Many Requests: retry after 1',
+                'parameters': {'retry_after': 1},
+            }, status=429)
+        if payload['chat_id'] == '0':
+            return web.json_response(
+                {'ok': False, 'error_code': 400, 'description': 'Bad Request: chat not found'},
+                status=400)
+        if payload['chat_id'] == '502':
+            return web.Response(text='<html>Bad Gateway</html>', content_type='text/html', status=502)
+        if payload['chat_id'] == '1':
+            return web.Response(status=200)
+        if payload['chat_id'] == '2':
+            return web.json_response(['ok'])
+        self.delivered.append((payload['chat_id'], payload['text']))
+        return web.json_response({'ok': True, 'result': {}})
+
+
+class TelegramDispatcherTests(FakeRedisMixin, SimpleTestCase):
+    """Test Telegram dispatcher."""
+
+    async def run_dispatcher(self, api, test, **kwargs):
+        await api.server.start_server()
+        dispatcher = TelegramDispatcher(
+            token='TOKEN', api_url=str(api.server.make_url('')).rstrip('/'), **kwargs)
+        try:
+            await test(dispatcher)
+        finally:
+            await dispatcher.close()
+            await api.server.close()
+
+    async def test_burst_drains_at_rate_limit(self):
+        """Test a burst of 1,000 messages drains concurrently within the limits."""
+        # the fake API allows 10% more than the dispatcher uses for jitter
+        api = FakeBotAPI(global_rate=550, chat_rate=11, delay=0.01)
+        messages = [(str(100 + i % 100), f'alert {i}') for i in range(1000)]
+
+        async def test(dispatcher):
+            start = time.perf_counter()
+            results = await dispatcher.send_many(messages)
+            elapsed = time.perf_counter() - start
+
+            self.assertTrue(all(results))
+            self.assertEqual(sorted(api.delivered), sorted(messages))
+            self.assertEqual(api.rejected, 0)
+            # 10 messages per chat at 10 per second take at least 0.9 sec,
+            # sent one by one with 10 ms latency they would take 10 sec
+            self.assertGreaterEqual(elapsed, 0.85)
+            self.assertLess(elapsed, 3)
+
+        await self.run_dispatcher(
+            api, test, global_rate=500, chat_rate=10, max_in_flight=100)
+
+    async def test_retry_after(self):
+        """Test a 429 response pauses sending for retry_after and retries."""
+        api = FakeBotAPI(global_rate=100, chat_rate=10)
+        api.flood_once = True
+
+        async def test(dispatcher):
+            start = time.perf_counter()
+            self.assertTrue(await dispatcher.send('123', 'alert'))
+
+            self.assertGreaterEqual(time.perf_counter() - start, 1)
+            self.assertEqual(api.delivered, [('123', 'alert')])
+
+        await self.run_dispatcher(api, test)
+
+    async def test_error_response(self):
+        """Test a message refused by the API is not delivered."""
+        api = FakeBotAPI(global_rate=100, chat_rate=10)
+
+        async def test(dispatcher):
+            self.assertEqual(await dispatcher.send_many([('0', 'alert'), ('123', 'alert')]), [False, True])
+
+        await self.run_dispatcher(api, test)
+
+    async def test_unexpected_response(self):
+        """Test a reply which is not a JSON object fails only its own message."""
+        api = FakeBotAPI(global_rate=100, chat_rate=10)
+
+        async def test(dispatcher):
+            results = await dispatcher.send_many([('502', 'alert'), ('1', 'alert'), ('2', 'alert'), ('123', 'alert')])
+
+            self.assertEqual(results, [False, False, False, True])
+            self.assertEqual(api.delivered, [('123', 'alert')])
+
+        await self.run_dispatcher(api, test)
+
+    async def test_workers_share_limits(self):
+        """Test dispatchers of several workers stay within one global limit."""
+        api = FakeBotAPI(global_rate=110, chat_rate=11)
+        messages = [(str(100 + i), f'alert {i}') for i in range(150)]
+
+        async def test(dispatcher):
+            other = TelegramDispatcher(token='TOKEN', api_url=dispatcher.url.rsplit('/', 2)[0], global_rate=100)
+            try:
+                start = time.perf_counter()
+                results = await asyncio.gather(
+                    dispatcher.send_many(messages[:75]), other.send_many(messages[75:]))
+                elapsed = time.perf_counter() - start
+            finally:
+                await other.close()
+
+            self.assertTrue(all(results[0] + results[1]))
+            self.assertEqual(api.rejected, 0)
+            # 150 messages at 100 per second after a burst of 100
+            self.assertGreaterEqual(elapsed, 0.45)
+
+        await self.run_dispatcher(api, test, global_rate=100)
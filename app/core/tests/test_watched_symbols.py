@@ -0,0 +1,86 @@
+"""
+Tests for the watched symbols set
+"""
+from decimal import Decimal
+
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+
+from core import models, watched_symbols
+from core.tests.mixins import FakeRedisMixin
+
+
+class WatchedSymbolsTests(FakeRedisMixin, TestCase):
+    """Test watched symbols set."""
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123')
+        self.btc = models.Symbol.objects.create(name='BTCUSDT')
+        self.eth = models.Symbol.objects.create(name='ETHUSDT')
+
+    def create_alert(self, symbol, **params):
+        with self.captureOnCommitCallbacks(execute=True):
+            return models.Alert.objects.create(
+                user=self.user, symbol=symbol, price=Decimal('1'), condition='above', **params)
+
+    def test_built_from_active_alerts(self):
+        """Test the set is built from active alerts on first read."""
+        models.Alert.objects.create(
+            user=self.user, symbol=self.btc, price=Decimal('1'), condition='above')
+        models.Alert.objects.create(
+            user=self.user, symbol=self.eth, price=Decimal('1'), condition='above',
+            is_active=False)
+
+        self.assertEqual(watched_symbols.get_watched(), ['BTCUSDT'])
+
+    def test_empty_set_is_not_rebuilt(self):
+        """Test an empty built set is read without a database query."""
+        watched_symbols.rebuild()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(watched_symbols.get_watched(), [])
+
+    def test_alert_changes_update_set(self):
+        """Test alert create, update and delete update the set."""
+        watched_symbols.rebuild()
+        alert = self.create_alert(self.btc)
+        self.assertEqual(watched_symbols.get_watched(), ['BTCUSDT'])
+
+        alert.symbol = self.eth
+        with self.captureOnCommitCallbacks(execute=True):
+            alert.save()
+        self.assertEqual(watched_symbols.get_watched(), ['ETHUSDT'])
+
+        alert.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            alert.save()
+        self.assertEqual(watched_symbols.get_watched(), [])
+
+        alert.is_active = True
+        with self.captureOnCommitCallbacks(execute=True):
+            alert.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            alert.delete()
+        self.assertEqual(watched_symbols.get_watched(), [])
+
+    def test_symbol_with_other_active_alert_is_kept(self):
+        """Test symbol stays watched while it has another active alert."""
+        self.create_alert(self.btc)
+        alert = self.create_alert(self.btc)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            alert.delete()
+
+        self.assertEqual(watched_symbols.get_watched(), ['BTCUSDT'])
+
+    def test_symbol_rename(self):
+        """Test renamed symbol is replaced in the set."""
+        self.create_alert(self.btc)
+
+        self.btc.name = 'BTCBUSD'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.btc.save()
+
+        self.assertEqual(watched_symbols.get_watched(), ['BTCBUSD'])
@@ -0,0 +1,148 @@
+"""
+Tests for webhook delivery against a local stand-in receiver
+"""
+import asyncio
+import hmac
+import json
+import time
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from django.test import SimpleTestCase
+
+from core.webhook import PublicResolver, WebhookSender, check_url, sign, SIGNATURE_HEADER
+
+
+class StandInReceiver:
+    """Receiver checking signatures and counting connections in use."""
+
+    def __init__(self, secret: str, delay: float = 0.0) -> None:
+        self.secret = secret
+        self.delay = delay
+        self.messages = []
+        self.connections = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        app = web.Application()
+        app.router.add_post('/hook', self.hook)
+        self.server = TestServer(app)
+
+    async def hook(self, request):
+        self.connections.add(id(request.transport))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            body = await request.read()
+            await asyncio.sleep(self.delay)
+            if not hmac.compare_digest(request.headers.get(SIGNATURE_HEADER, ''), sign(self.secret, body)):
+                return web.Response(status=401)
+            self.messages.append(json.loads(body)['message'])
+            return web.Response(status=204)
+        finally:
+            self.in_flight -= 1
+
+
+class WebhookSenderTests(SimpleTestCase):
+    """Test webhook sender."""
+
+    async def run_sender(self, receiver, test, **kwargs):
+        await receiver.server.start_server()
+        # the stand-in receiver listens on http://127.0.0.1
+        sender = WebhookSender(**{'allow_local': True, **kwargs})
+        try:
+            await test(sender, str(receiver.server.make_url('/hook')))
+        finally:
+            await sender.close()
+            await receiver.server.close()
+
+    async def test_burst_is_pooled_per_host(self):
+        """Test a burst reuses at most max_per_host connections concurrently."""
+        receiver = StandInReceiver('secret', delay=0.02)
+
+        async def test(sender, url):
+            start = time.perf_counter()
+            results = await sender.send_many([(url, 'secret', f'alert {i}') for i in range(200)])
+            elapsed = time.perf_counter() - start
+
+            self.assertTrue(all(results))
+            self.assertEqual(sorted(receiver.messages), sorted(f'alert {i}' for i in range(200)))
+            self.assertEqual(receiver.max_in_flight, 10)
+            self.assertLessEqual(len(receiver.connections), 10)
+            # 20 rounds of 20 ms, one by one they would take 4 sec
+            self.assertGreaterEqual(elapsed, 0.4)
+            self.assertLess(elapsed, 2)
+
+        await self.run_sender(receiver, test, max_per_host=10)
+
+    async def test_refused_deliveries(self):
+        """Test unsigned payloads, bad signatures, timeouts and unreachable endpoints are not delivered."""
+        receiver = StandInReceiver('secret', delay=0.5)
+
+        async def test(sender, url):
+            self.assertEqual(await sender.send_many([
+                (url, '', 'alert'),
+                (url, 'wrong', 'alert'),
+                ('http://127.0.0.1:1/hook', 'secret', 'alert'),
+                ('not a url', 'secret', 'alert'),
+            ]), [False, False, False, False])
+            sender.timeout = 0.1
+            await sender.close()
+            self.assertFalse(await sender.send(url, 'secret', 'alert'))
+
+        await self.run_sender(receiver, test)
+
+    async def test_local_endpoints_refused(self):
+        """Test the sender does not call endpoints on internal addresses."""
+        receiver = StandInReceiver('secret')
+
+        async def test(sender, url):
+            port = receiver.server.port
+            self.assertEqual(await sender.send_many([
+                (url, 'secret', 'alert'),
+                (f'https://127.0.0.1:{port}/hook', 'secret', 'alert'),
+                (f'https://localhost:{port}/hook', 'secret', 'alert'),
+            ]), [False, False, False])
+            self.assertEqual(receiver.messages, [])
+
+        await self.run_sender(receiver, test, allow_local=False)
+
+    async def test_public_resolver(self):
+        """Test names resolving to internal addresses are refused."""
+        resolver = PublicResolver()
+        try:
+            with self.assertRaises(OSError):
+                await resolver.resolve('localhost', 443)
+        finally:
+            await resolver.close()
+
+    def test_check_url(self):
+        """Test only https endpoints on public hosts are allowed."""
+        for url in (
+            'https://example.com/hook',
+            'https://8.8.8.8/hook',
+            'https://[2001:4860:4860::8888]/hook',
+        ):
+            check_url(url)
+        for url in (
+            'http://example.com/hook',
+            'ftp://example.com/hook',
+            'https:///hook',
+            'https://localhost/hook',
+            'https://api.localhost/hook',
+            'https://127.0.0.1/hook',
+            'https://10.0.0.1/hook',
+            'https://192.168.1.1/hook',
+            'https://169.254.169.254/latest/meta-data',
+            'https://[::1]/hook',
+            'https://[fe80::1]/hook',
+            'https://[::ffff:10.0.0.1]/hook',
+        ):
+            with self.assertRaises(ValueError, msg=url):
+                check_url(url)
+
+    def test_sign(self):
+        """Test signature is HMAC-SHA256 of the body."""
+        self.assertEqual(
+            sign('key', b'The quick brown fox jumps over the lazy dog'),
+            'sha256=f7bc83f430538424b13298e6aa6fb143ef4d59a14946175997479dbc2d1a3cd8',
+        )
@@ -0,0 +1,92 @@
+"""
+Set of symbols with active alerts.
+
+The set is kept in Redis and maintained by signals on alert changes, so
+ingestion reads it without scanning the alerts table every cycle.
+"""
+from typing import Iterable
+
+import redis
+from celery.utils.log import get_task_logger
+from django.db import transaction
+
+from core import redis_client
+from core.models import Symbol, Alert
+
+
+logger = get_task_logger(__name__)
+
+WATCHED_KEY = 'symbols:watched'
+# Redis drops empty sets, this key tells an empty set from a missing one.
+BUILT_KEY = 'symbols:watched:built'
+
+
+def _watched_queryset():
+    return Symbol.objects.filter(alert__is_active=True).values_list('name', flat=True).distinct()
+
+
+def rebuild() -> set[str]:
+    """Build the set from active alerts."""
+    names = set(_watched_queryset())
+    pipe = redis_client.get_redis().pipeline()
+    pipe.delete(WATCHED_KEY)
+    if names:
+        pipe.sadd(WATCHED_KEY, *names)
+    pipe.set(BUILT_KEY, 1)
+    pipe.execute()
+    return names
+
+
+def refresh(symbol_ids: Iterable[int]) -> None:
+    """Recheck whether symbols have active alerts and update the set."""
+    symbol_ids = set(filter(None, symbol_ids))
+    if not symbol_ids:
+        return
+    names = dict(Symbol.objects.filter(id__in=symbol_ids).values_list('id', 'name'))
+    active = set(Alert.objects.filter(
+        symbol_id__in=symbol_ids, is_active=True).values_list('symbol_id', flat=True))
+    pipe = redis_client.get_redis().pipeline()
+    for symbol_id, name in names.items():
+        if symbol_id in active:
+            pipe.sadd(WATCHED_KEY, name)
+        else:
+            pipe.srem(WATCHED_KEY, name)
+    pipe.execute()
+
+
+def refresh_on_commit(symbol_ids: Iterable[int]) -> None:
+    """Refresh symbols after the current transaction is committed.
+
+    Redis errors are logged, the hourly rebuild heals the set.
+    """
+    symbol_ids = set(symbol_ids)
+
+    def call():
+        try:
+            refresh(symbol_ids)
+        except redis.RedisError as ex:
+            logger.error(ex)
+    transaction.on_commit(call)
+
+
+def rebuild_on_commit() -> None:
+    """Rebuild the set after the current transaction is committed."""
+    def call():
+        try:
+            rebuild()
+        except redis.RedisError as ex:
+            logger.error(ex)
+    transaction.on_commit(call)
+
+
+def get_watched() -> list[str]:
+    """Return names of symbols with active alerts."""
+    try:
+        client = redis_client.get_redis()
+        names = client.smembers(WATCHED_KEY)
+        if not names and not client.exists(BUILT_KEY):
+            names = rebuild()
+    except redis.RedisError as ex:
+        logger.error(ex)
+        names = _watched_queryset()
+    return sorted(names)
@@ -0,0 +1,173 @@
+"""
+Signed webhook delivery to user endpoints.
+"""
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import socket
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+from aiohttp.abc import AbstractResolver
+from celery.utils.log import get_task_logger
+
+from core.event_loop import run
+
+logger = get_task_logger(__name__)
+
+SIGNATURE_HEADER = 'X-Crypto-Alert-Signature'
+MAX_CONNECTIONS = 100
+# Requests in flight to the same endpoint host.
+MAX_PER_HOST = 4
+REQUEST_TIMEOUT = 10
+
+
+def is_public_address(address: str) -> bool:
+    """The IP address is routable on the internet.
+
+    Loopback, private, link-local and other reserved addresses are not,
+    webhooks must not reach the services next to the server.
+    """
+    ip = ipaddress.ip_address(address.split('%')[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def check_url(url: str) -> None:
+    """Raise ValueError if url is not a webhook endpoint users may set.
+
+    Only https is allowed. Hosts given as IP addresses and localhost
+    names are checked here, the addresses of other host names are
+    checked when the sender resolves them.
+    """
+    parts = urlsplit(url)
+    if parts.scheme != 'https':
+        raise ValueError('The webhook has to use https.')
+    host = (parts.hostname or '').rstrip('.')
+    if not host:
+        raise ValueError('The webhook has no host.')
+    if host == 'localhost' or host.endswith('.localhost'):
+        raise ValueError('The webhook host is not public.')
+    try:
+        public = is_public_address(host)
+    except ValueError:
+        return
+    if not public:
+        raise ValueError('The webhook host is not public.')
+
+
+class PublicResolver(AbstractResolver):
+    """Resolver refusing hosts with addresses that are not public.
+
+    The check is done on the addresses the connection is made to, so a
+    name resolving to an internal address is refused as well.
+    """
+
+    def __init__(self) -> None:
+        self._resolver = aiohttp.ThreadedResolver()
+
+    async def resolve(self, host: str, port: int = 0, family: socket.AddressFamily = socket.AF_INET) -> list:
+        hosts = await self._resolver.resolve(host, port, family)
+        if not all(is_public_address(item['host']) for item in hosts):
+            raise OSError(f'{host} resolves to an address which is not public')
+        return hosts
+
+    async def close(self) -> None:
+        await self._resolver.close()
+
+
+def sign(secret: str, body: bytes) -> str:
+    """Return the signature header value of body."""
+    digest = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return f'sha256={digest}'
+
+
+class WebhookSender:
+    """POST signed JSON payloads over a shared keep-alive connection pool.
+
+    The payload carries the message and a unix timestamp, so receivers
+    can reject replays. Its raw body is signed with HMAC-SHA256 using the
+    user's secret. Only public https endpoints are called and redirects
+    are not followed, allow_local lifts this for local test receivers.
+    The sender has to be used from a single event loop.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = MAX_CONNECTIONS,
+        max_per_host: int = MAX_PER_HOST,
+        timeout: float = REQUEST_TIMEOUT,
+        allow_local: bool = False,
+    ) -> None:
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.allow_local = allow_local
+        self._session: aiohttp.ClientSession | None = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.max_connections,
+                    limit_per_host=self.max_per_host,
+                    resolver=None if self.allow_local else PublicResolver(),
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def send(self, url: str, secret: str, message: str) -> bool:
+        """POST message to url. Return True if it answers with 2xx.
+
+        Payloads are always signed, without a secret nothing is sent.
+        """
+        if not secret:
+            logger.error('Webhook %s: no secret to sign the payload.', url)
+            return False
+        body = json.dumps({'message': message, 'timestamp': int(time.time())}).encode()
+        headers = {'Content-Type': 'application/json', SIGNATURE_HEADER: sign(secret, body)}
+        try:
+            if not self.allow_local:
+                check_url(url)
+            async with self._get_session().post(url, data=body, headers=headers, allow_redirects=False) as response:
+                await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as ex:
+            logger.error('Webhook %s: %r', url, ex)
+            return False
+        if response.status >= 300:
+            logger.error('Webhook %s: %s', url, response.status)
+            return False
+        return True
+
+    async def send_many(self, messages: list[tuple[str, str, str]]) -> list[bool]:
+        """Send (url, secret, message) concurrently."""
+        return list(await asyncio.gather(*(self.send(*message) for message in messages)))
+
+    async def close(self) -> None:
+        """Close the connection pool."""
+        if self._session is not None:
+            await self._session.close()
+
+
+_sender: WebhookSender | None = None
+_pid: int | None = None
+
+
+def get_sender() -> WebhookSender:
+    """Return the sender of this process, a forked child gets its own."""
+    global _sender, _pid
+    if _pid != os.getpid():
+        _sender = WebhookSender()
+        _pid = os.getpid()
+    return _sender
+
+
+def send_webhooks(messages: list[tuple[str, str, str]]) -> list[bool]:
+    """Send (url, secret, message) triples, return which ones are delivered."""
+    return run(get_sender().send_many(messages))
@@ -9,14 +9,37 @@ from django.utils.translation import gettext as _
 
 from rest_framework import serializers
 
+from core import webhook
+
 
 class UserSerializer(serializers.ModelSerializer):
     """ Serializer for the user object. """
 
     class Meta:
         model = get_user_model()
-        fields = ['email', 'password', 'name', 'telegram_id']
-        extra_kwargs = {'password': {'write_only': True, 'min_length': 5}}
+        fields = ['email', 'password', 'name', 'telegram_id', 'webhook_url', 'webhook_secret']
+        extra_kwargs = {
+            'password': {'write_only': True, 'min_length': 5},
+            'webhook_secret': {'write_only': True},
+        }
+
+    def validate_webhook_url(self, value):
+        """Allow only public https endpoints."""
+        if value:
+            try:
+                webhook.check_url(value)
+            except ValueError as ex:
+                raise serializers.ValidationError(str(ex))
+        return value
+
+    def validate(self, attrs):
+        """Require a signing secret for the webhook."""
+        url = attrs.get('webhook_url', getattr(self.instance, 'webhook_url', ''))
+        secret = attrs.get('webhook_secret', getattr(self.instance, 'webhook_secret', ''))
+        if url and not secret:
+            raise serializers.ValidationError(
+                {'webhook_secret': _('A webhook needs a secret to sign its payloads.')})
+        return attrs
 
     def create(self, validated_data):
         """Create and return a user with encrypted password"""
@@ -146,3 +146,45 @@ class PrivateUserApiTests(TestCase):
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertTrue(self.user.telegram_id, payload['telegram_id'])
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_update_webhook(self):
+        """Test setting the webhook, its secret is never returned."""
+        payload = {'webhook_url': 'https://example.com/hook', 'webhook_secret': 'secret'}
+        res = self.client.patch(ME_URL, payload)
+
+        self.user.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual((self.user.webhook_url, self.user.webhook_secret), (payload['webhook_url'], 'secret'))
+        self.assertEqual(res.data['webhook_url'], payload['webhook_url'])
+        self.assertNotIn('webhook_secret', res.data)
+
+    def test_update_webhook_not_public(self):
+        """Test the webhook has to be a public https endpoint."""
+        for url in (
+            'http://example.com/hook',
+            'ftp://example.com/hook',
+            'https://localhost/hook',
+            'https://127.0.0.1/hook',
+            'https://192.168.1.1/hook',
+            'https://169.254.169.254/latest/meta-data',
+        ):
+            res = self.client.patch(ME_URL, {'webhook_url': url})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST, url)
+            self.assertIn('webhook_url', res.data)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.webhook_url, '')
+
+    def test_update_webhook_without_secret(self):
+        """Test a webhook is refused without a secret to sign its payloads."""
+        res = self.client.patch(ME_URL, {'webhook_url': 'https://example.com/hook'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('webhook_secret', res.data)
+
+        self.client.patch(ME_URL, {'webhook_url': 'https://example.com/hook', 'webhook_secret': 'secret'})
+        res = self.client.patch(ME_URL, {'webhook_secret': ''})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.client.patch(ME_URL, {'webhook_url': '', 'webhook_secret': ''})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)